@@ -0,0 +1,782 @@
+import json
+import logging
+import queue
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from functools import partial
+
+from chunking import chunk_scenes, count_tokens
+from hedging import AttemptAbandoned, DeadlineExceeded, StopEvent, get_latency_tracker, hedged
+from metrics import record_event, record_usage
+from normalize import normalize_screenplay
+from openai_client import get_openai_client
+from prompts import COMBINED_SECTIONS, DIGEST_PROMPT, combined_template, render_prompt, section_schema
+from rate_limit import get_scheduler
+from response_cache import cache_key, get_response_cache
+from retrieval import RETRIEVAL_TOKENS, SECTION_QUERIES, section_texts
+from screenplay_index import LOCAL_SECTIONS, ScreenplayIndex, local_sections
+from section_executor import DEFAULT_MAX_CONCURRENCY, SectionCancelled, partial_result, run_sections, section_error_message
+from settings import get_setting
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gpt-4o-mini"
+DEFAULT_TEMPERATURE = 0.7
+
+# Digest (map-reduce) mode for long screenplays; each can be overridden in secrets
+ANALYSIS_MODE = "auto"             # "full", "digest", or "auto" (digest above the threshold)
+DIGEST_THRESHOLD_TOKENS = 100_000  # leaves room for instructions and output in a 128k context
+CHUNK_TOKENS = 8_000
+CHUNK_OVERLAP_TOKENS = 400
+DIGEST_TOKENS_PER_CHUNK = 700
+DIGEST_TEMPERATURE = 0.2
+DIGEST_RETRIES = 1                 # reruns of a failed chunk summary before the digest fails
+
+# Tail latency: a deadline per request (base plus max_tokens at a floor
+# generation rate), an optional duplicate request once the primary is slower
+# than most, and a shorter answer, possibly from FALLBACK_MODEL, when the
+# deadline passes. Each can be overridden in secrets.
+SECTION_DEADLINES = True
+DEADLINE_BASE_SECONDS = 30.0
+DEADLINE_TOKENS_PER_SECOND = 20.0
+HEDGE_REQUESTS = False
+HEDGE_PERCENTILE = 95.0
+HEDGE_MIN_SAMPLES = 20
+HEDGE_DELAY = 20.0                 # seconds, until HEDGE_MIN_SAMPLES latencies are known
+FALLBACK_MODEL = ""                # empty: the section's own model
+FALLBACK_TOKEN_SHARE = 0.5
+
+# Sections in retrieval.SECTION_QUERIES are sent the structure summary and
+# their most relevant scenes (at most RETRIEVAL_TOKENS) once the text is
+# longer than RETRIEVAL_MIN_TOKENS
+RETRIEVAL = True
+RETRIEVAL_MIN_TOKENS = 12_000
+
+SYSTEM_PROMPT = (
+    "You are an AI chatbot automating script improvements and "
+    "providing data-driven insights (casting, budget, scheduling, marketing) "
+    "to film producers."
+)
+
+
+def _create(prompt: str, model: str, max_tokens: int, on_admitted=None, stop=None, timeout: float = None,
+            **options):
+    """
+    One chat-completion request through the process-wide scheduler, which
+    admits it against the RPM/TPM limits and retries 429s and 5xx errors
+    until `stop` is set. `timeout` (seconds) bounds each network wait,
+    instead of the SDK's ten minutes.
+    """
+    client = get_openai_client()
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+    # The API counts max_tokens against the TPM limit up front
+    tokens = count_tokens(SYSTEM_PROMPT + prompt, model) + max_tokens
+    if timeout is not None:
+        options["timeout"] = timeout
+    return get_scheduler().call(
+        partial(client.chat.completions.create, model=model, messages=messages, max_tokens=max_tokens, **options),
+        tokens,
+        on_admitted,
+        stop,
+    )
+
+
+def call_openai(prompt: str,
+                model: str = DEFAULT_MODEL,
+                temperature: float = DEFAULT_TEMPERATURE,
+                max_tokens: int = 1000) -> str:
+    """
+    Call the OpenAI Chat Completions API on the shared pooled client.
+    Token usage is charged to the metrics section being measured, if any.
+    """
+    response = _create(prompt, model, max_tokens, temperature=temperature)
+    record_usage(model, response.usage)
+    return response.choices[0].message.content
+
+
+def call_openai_json(prompt: str,
+                     schema: dict,
+                     model: str = DEFAULT_MODEL,
+                     temperature: float = DEFAULT_TEMPERATURE,
+                     max_tokens: int = 1000) -> str:
+    """
+    call_openai constrained to a JSON schema (structured outputs); returns
+    the raw JSON text of the reply.
+    """
+    response = _create(
+        prompt, model, max_tokens, temperature=temperature,
+        response_format={"type": "json_schema", "json_schema": schema},
+    )
+    record_usage(model, response.usage)
+    return response.choices[0].message.content
+
+
+class _StreamAborter:
+    """
+    Shuts down a streaming response's socket when `stop` is set: closing
+    the response does not wake a thread blocked reading it, while shutting
+    the socket down does, and the reader then closes the stream itself.
+    Once the stream is finished the socket may be back in the keep-alive
+    pool, serving another request, so it is left alone from then on.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.live = True
+        self._lock = threading.Lock()
+
+    def abort(self):
+        with self._lock:
+            if not self.live:
+                return
+            network = self.stream.response.extensions.get("network_stream")
+            sock = network.get_extra_info("socket") if network is not None else None
+            if sock is not None:
+                sock.shutdown(socket.SHUT_RDWR)
+
+    def finished(self):
+        with self._lock:
+            self.live = False
+
+
+def stream_openai(prompt: str,
+                  model: str = DEFAULT_MODEL,
+                  temperature: float = DEFAULT_TEMPERATURE,
+                  max_tokens: int = 1000,
+                  on_admitted=None,
+                  stop: StopEvent = None,
+                  timeout: float = None):
+    """
+    Same request as call_openai with stream=True; yields text deltas as
+    they arrive. Usage comes in a final chunk with no choices. Errors are
+    retried only before the first delta, when the response status arrives.
+    `on_admitted()` runs once the rate limiter lets the request through.
+    Setting `stop` drops the connection, even while waiting for a delta;
+    `timeout` bounds the wait for each one.
+    """
+    stream = _create(
+        prompt, model, max_tokens, on_admitted, stop, timeout, temperature=temperature,
+        stream=True, stream_options={"include_usage": True},
+    )
+    aborter = _StreamAborter(stream)
+    if stop is not None:
+        stop.on_set(aborter.abort)
+    # Closing the generator early (a lost hedge, a cancelled section) drops the connection
+    with stream:
+        try:
+            for chunk in stream:
+                if chunk.usage is not None:
+                    record_usage(model, chunk.usage)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            aborter.finished()
+
+
+def section_deadline(max_tokens: int):
+    """
+    Seconds a request for `max_tokens` may take, or None with deadlines off.
+    """
+    if not get_setting("SECTION_DEADLINES", SECTION_DEADLINES):
+        return None
+    base = float(get_setting("DEADLINE_BASE_SECONDS", DEADLINE_BASE_SECONDS))
+    return base + max_tokens / float(get_setting("DEADLINE_TOKENS_PER_SECOND", DEADLINE_TOKENS_PER_SECOND))
+
+
+def _hedge_delay(model: str, max_tokens: int):
+    if not get_setting("HEDGE_REQUESTS", HEDGE_REQUESTS):
+        return None
+    delay = get_latency_tracker().percentile(
+        (model, max_tokens),
+        float(get_setting("HEDGE_PERCENTILE", HEDGE_PERCENTILE)),
+        int(get_setting("HEDGE_MIN_SAMPLES", HEDGE_MIN_SAMPLES)),
+    )
+    return float(get_setting("HEDGE_DELAY", HEDGE_DELAY)) if delay is None else delay
+
+
+def _collect(prompt, model, temperature, max_tokens, timeout, stop, on_admitted) -> str:
+    # One attempt of a guarded call: streamed so a lost race stops promptly
+    parts = []
+    deltas = stream_openai(prompt, model=model, temperature=temperature, max_tokens=max_tokens,
+                           on_admitted=on_admitted, stop=stop, timeout=timeout)
+    try:
+        for delta in deltas:
+            if stop.is_set():
+                raise AttemptAbandoned("another attempt finished first or the deadline passed")
+            parts.append(delta)
+    finally:
+        deltas.close()
+    return "".join(parts)
+
+
+def guarded_call(prompt: str,
+                 model: str = DEFAULT_MODEL,
+                 temperature: float = DEFAULT_TEMPERATURE,
+                 max_tokens: int = 1000) -> str:
+    """
+    call_openai under the section deadline, hedged with a duplicate request
+    when HEDGE_REQUESTS is on. Raises DeadlineExceeded when no attempt
+    finishes in time.
+    """
+    deadline, hedge_after = section_deadline(max_tokens), _hedge_delay(model, max_tokens)
+    if deadline is None and hedge_after is None:
+        return call_openai(prompt, model=model, temperature=temperature, max_tokens=max_tokens)
+    attempt = partial(_collect, prompt, model, temperature, max_tokens, deadline)
+    return hedged(attempt, (model, max_tokens), hedge_after, deadline)
+
+
+def _with_fallback(call, prompt, model, temperature, max_tokens) -> str:
+    """
+    Run `call()`; if it misses its deadline, ask for a shorter answer
+    (from FALLBACK_MODEL when set). The fallback text is not cached.
+    """
+    try:
+        return call()
+    except DeadlineExceeded as exc:
+        fallback_model = get_setting("FALLBACK_MODEL", FALLBACK_MODEL) or model
+        limit = max(1, int(max_tokens * float(get_setting("FALLBACK_TOKEN_SHARE", FALLBACK_TOKEN_SHARE))))
+        record_event("fallbacks")
+        logger.warning("Falling back to %s with %d tokens: %s", fallback_model, limit, exc)
+        deadline = section_deadline(limit)
+        attempt = partial(_collect, prompt, fallback_model, temperature, limit, deadline)
+        text = hedged(attempt, (fallback_model, limit), deadline=deadline)
+        return partial_result(text, f"Shortened answer: the full request {exc}")
+
+
+def analyze_sections(screenplay_text: str,
+                     templates: dict,
+                     max_tokens: dict,
+                     model: str = DEFAULT_MODEL,
+                     temperature: float = DEFAULT_TEMPERATURE,
+                     max_concurrency: int = None,
+                     use_cache: bool = True,
+                     combine_short: bool = None,
+                     metrics=None,
+                     index: ScreenplayIndex = None,
+                     on_section=None,
+                     cancel=None) -> dict:
+    """
+    Render every section template against the screenplay and run them
+    concurrently. Results already in the response cache are returned
+    without an API call.
+
+    With `combine_short` (default: STRUCTURED_SHORT_SECTIONS in secrets),
+    the COMBINED_SECTIONS share a single JSON-schema request, so the
+    screenplay is sent once for all of them instead of once each.
+
+    With a `metrics` (metrics.ReportMetrics), every task is timed and its
+    token usage recorded as one section.
+
+    The LOCAL_SECTIONS are answered from the screenplay `index` (parsed
+    from `screenplay_text` when not given; pass it when the text is a
+    digest) unless LOCAL_SECTIONS is off in secrets. With RETRIEVAL on, the
+    sections in retrieval.SECTION_QUERIES see only their relevant scenes.
+
+    `on_section(section, text)` is called as each section completes, and
+    sections not yet started are skipped once the `cancel` event is set
+    (see run_sections).
+    """
+    if max_concurrency is None:
+        max_concurrency = get_setting("MAX_CONCURRENT_SECTIONS", DEFAULT_MAX_CONCURRENCY)
+    cache = get_response_cache() if use_cache else None
+    retrieved = _retrieved_texts(screenplay_text, templates, index, model)
+    local, remote, screenplay_text = _split_local(screenplay_text, templates, index)
+    combined = _combined_sections(remote, combine_short)
+    if on_section is not None:
+        for section, text in local.items():
+            on_section(section, text)
+
+    tasks = {
+        section: _section_task(retrieved.get(section, screenplay_text), template, model, temperature,
+                               max_tokens[section], cache)
+        for section, template in remote.items()
+        if section not in combined
+    }
+    if combined:
+        tasks[_COMBINED_TASK] = partial(
+            _run_combined, screenplay_text, remote, max_tokens, combined, model, temperature, cache
+        )
+    if metrics is not None:
+        tasks = {name: metrics.measured(name, fn) for name, fn in tasks.items()}
+
+    def done(name, result):
+        if name != _COMBINED_TASK:
+            on_section(name, result)
+            return
+        for section in combined:
+            on_section(section, result[section] if isinstance(result, dict) else result)
+
+    outcomes = run_sections(tasks, max_concurrency=max_concurrency,
+                            on_done=done if on_section is not None else None, cancel=cancel)
+
+    merged = outcomes.pop(_COMBINED_TASK, {})
+    if isinstance(merged, str):     # the whole group failed: run_sections gave an error message
+        merged = dict.fromkeys(combined, merged)
+    outcomes.update(merged)
+    outcomes.update(local)
+    return {section: outcomes[section] for section in templates}
+
+
+_COMBINED_TASK = "Short sections"
+
+
+def _split_local(text: str, templates: dict, index: ScreenplayIndex = None):
+    """
+    Answer the LOCAL_SECTIONS from the screenplay index. Returns the local
+    results, the templates still needing the model, and the text to render
+    them with (the index summary prepended when STRUCTURE_CONTEXT is on).
+    """
+    use_local = get_setting("LOCAL_SECTIONS", True)
+    use_context = get_setting("STRUCTURE_CONTEXT", False)
+    if not use_local and not use_context:
+        return {}, templates, text
+    index = index or ScreenplayIndex(text)
+    local = local_sections(index, [section for section in LOCAL_SECTIONS if section in templates] if use_local else ())
+    remote = {section: template for section, template in templates.items() if section not in local}
+    if use_context and remote:
+        text = index.context() + "\n" + text
+    return local, remote, text
+
+
+def _retrieval_enabled(text_tokens: int) -> bool:
+    return (get_setting("RETRIEVAL", RETRIEVAL)
+            and text_tokens > int(get_setting("RETRIEVAL_MIN_TOKENS", RETRIEVAL_MIN_TOKENS)))
+
+
+def _retrieved_texts(text: str, templates: dict, index: ScreenplayIndex = None, model: str = DEFAULT_MODEL) -> dict:
+    """
+    Texts for the sections answered from retrieved scenes, each scene
+    normalized like the full text; empty when retrieval is off or the text is short enough
+    to send whole. The other sections use the full text.
+    """
+    sections = [section for section in templates if section in SECTION_QUERIES]
+    if not sections or not _retrieval_enabled(count_tokens(text, model)):
+        return {}
+    index = index or ScreenplayIndex(text)
+    return section_texts(index, sections, int(get_setting("RETRIEVAL_TOKENS", RETRIEVAL_TOKENS)), model,
+                         normalize_screenplay if get_setting("NORMALIZE_TEXT", True) else None)
+
+
+def _combined_sections(templates: dict, combine_short: bool = None) -> tuple:
+    """
+    The short sections to request together, or () when combining is off
+    or would save nothing.
+    """
+    if combine_short is None:
+        combine_short = get_setting("STRUCTURED_SHORT_SECTIONS", False)
+    sections = tuple(section for section in COMBINED_SECTIONS if section in templates)
+    return sections if combine_short and len(sections) > 1 else ()
+
+
+def _run_combined(text, templates, max_tokens, sections, model, temperature, cache) -> dict:
+    """
+    Ask for `sections` in one structured response and split it back into
+    per-section texts. If the request fails or the reply does not match
+    the schema, the sections are requested individually instead.
+    """
+    template = combined_template(templates, sections)
+    limit = sum(max_tokens[section] for section in sections)
+    schema = section_schema(sections)
+
+    def request():
+        raw = call_openai_json(render_prompt(template, text), schema, model=model, temperature=temperature, max_tokens=limit)
+        _parse_sections(raw, sections)   # raises before an invalid reply is cached
+        return raw
+
+    try:
+        if cache is None:
+            raw = request()
+        else:
+            raw = cache.get_or_compute(cache_key(text, template, model, temperature, limit), request)
+        return _parse_sections(raw, sections)
+    except Exception:
+        logger.exception("Structured request for %s failed; falling back to one call per section", sections)
+        tasks = {
+            section: _section_task(text, templates[section], model, temperature, max_tokens[section], cache)
+            for section in sections
+        }
+        return run_sections(tasks, max_concurrency=len(tasks))
+
+
+def _parse_sections(raw: str, sections) -> dict:
+    """
+    Validate a structured reply: a JSON object with a non-empty string for
+    every section.
+    """
+    data = json.loads(raw)
+    if not isinstance(data, dict):
+        raise ValueError("Structured reply is not a JSON object")
+    missing = [s for s in sections if not isinstance(data.get(s), str) or not data[s].strip()]
+    if missing:
+        raise ValueError(f"Structured reply is missing sections: {missing}")
+    return {section: data[section].strip() for section in sections}
+
+
+def _stream_section(section, template, text, model, temperature, max_tokens, updates, cancel):
+    """
+    Stream one section's deltas into `updates`. Returns `(text, complete)`;
+    a stream still running at the section deadline is cut off there, with
+    a note, and is incomplete. The deadline is enforced by hedged(), so a
+    stream that stalls is cut off too, not only one that keeps sending.
+    """
+    parts = []
+    prompt = render_prompt(template, text)
+    deadline = section_deadline(max_tokens)
+
+    def attempt(stop, on_admitted):
+        deltas = stream_openai(prompt, model=model, temperature=temperature, max_tokens=max_tokens,
+                               on_admitted=on_admitted, stop=stop, timeout=deadline)
+        try:
+            for delta in deltas:
+                if stop.is_set():
+                    raise AttemptAbandoned("ran past the deadline")
+                if cancel is not None and cancel.is_set():
+                    raise SectionCancelled("cancelled while streaming")
+                parts.append(delta)
+                updates.put((section, delta, False))
+        finally:
+            deltas.close()
+        return "".join(parts)
+
+    if deadline is None:
+        return attempt(StopEvent(), None), True
+    try:
+        # The deadline runs from admission, not from joining the rate-limit queue
+        return hedged(attempt, (model, max_tokens), deadline=deadline), True
+    except DeadlineExceeded:
+        record_event("fallbacks")
+        return partial_result("".join(parts), f"Cut short at the {deadline:.0f}s deadline"), False
+
+
+def _await_flight(flight, cancel, poll: float = 0.5) -> str:
+    """
+    Wait for another caller's in-flight result, giving up once `cancel` is set.
+    """
+    while True:
+        try:
+            return flight.result(timeout=poll)
+        except FutureTimeout:
+            if cancel is not None and cancel.is_set():
+                raise SectionCancelled("cancelled while waiting for an identical request")
+
+
+def _section_task(text, template, model, temperature, max_tokens, cache):
+    """
+    Zero-argument callable for one prompt, served from `cache` when possible
+    and falling back to a shorter answer when it misses its deadline.
+    """
+    prompt = render_prompt(template, text)
+    call = partial(guarded_call, prompt, model=model, temperature=temperature, max_tokens=max_tokens)
+    if cache is not None:
+        key = cache_key(text, template, model, temperature, max_tokens)
+        call = partial(cache.get_or_compute, key, call)
+    return partial(_with_fallback, call, prompt, model, temperature, max_tokens)
+
+
+def _sent_templates(templates: dict, combine_short: bool = None) -> list:
+    """
+    The templates analyze_sections actually sends, after answering the
+    local sections and combining the short sections into one request.
+    """
+    if get_setting("LOCAL_SECTIONS", True):
+        templates = {section: t for section, t in templates.items() if section not in LOCAL_SECTIONS}
+    combined = _combined_sections(templates, combine_short)
+    sent = [template for section, template in templates.items() if section not in combined]
+    if combined:
+        sent.append(combined_template(templates, combined))
+    return sent
+
+
+def _prompt_tokens(text_tokens: int, templates, model: str) -> int:
+    # The screenplay is embedded once per template
+    return sum(text_tokens + count_tokens(template, model) for template in templates)
+
+
+def _retrieval_usage(usage: dict, templates: dict, text_tokens: int):
+    """
+    Add the estimated section input tokens with retrieval: each retrieved
+    section sends at most RETRIEVAL_TOKENS of scenes instead of the text.
+    """
+    sections = [section for section in templates if section in SECTION_QUERIES]
+    if not sections or not _retrieval_enabled(text_tokens):
+        return
+    budget = int(get_setting("RETRIEVAL_TOKENS", RETRIEVAL_TOKENS))
+    usage["retrieved_sections"] = len(sections)
+    usage["retrieval_saved_tokens"] = len(sections) * max(0, text_tokens - budget)
+
+
+class DigestFailed(Exception):
+    """
+    Some chunk summaries could not be generated, so there is no complete
+    digest to analyze.
+    """
+
+
+def summarize_chunks(chunks: list,
+                     model: str = DEFAULT_MODEL,
+                     max_tokens: int = DIGEST_TOKENS_PER_CHUNK,
+                     max_concurrency: int = None,
+                     use_cache: bool = True,
+                     metrics=None) -> str:
+    """
+    Map step: summarize every chunk in parallel and merge the summaries,
+    in screenplay order, into one digest. Failed chunks are retried
+    DIGEST_RETRIES times; if any still fails, DigestFailed is raised
+    rather than analyzing (and caching sections of) a digest with a hole.
+    """
+    if max_concurrency is None:
+        max_concurrency = get_setting("MAP_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)
+    cache = get_response_cache() if use_cache else None
+    errors = {}
+
+    def recorded(part, fn):
+        def run():
+            try:
+                return fn()
+            except Exception as exc:
+                errors[part] = exc
+                raise
+        return run
+
+    tasks = {
+        f"Part {i} of {len(chunks)}": _section_task(chunk, DIGEST_PROMPT, model, DIGEST_TEMPERATURE, max_tokens, cache)
+        for i, chunk in enumerate(chunks, start=1)
+    }
+    if metrics is not None:
+        tasks = {part: metrics.measured(f"Digest {part.lower()}", fn) for part, fn in tasks.items()}
+    tasks = {part: recorded(part, fn) for part, fn in tasks.items()}
+    summaries = run_sections(tasks, max_concurrency=max_concurrency)
+    for _ in range(int(get_setting("DIGEST_RETRIES", DIGEST_RETRIES))):
+        if not errors:
+            break
+        retry = {part: tasks[part] for part in errors}
+        logger.warning("Retrying %d failed chunk summaries", len(retry))
+        errors.clear()
+        summaries.update(run_sections(retry, max_concurrency=max_concurrency))
+    if errors:
+        part, exc = next(iter(errors.items()))
+        raise DigestFailed(f"{len(errors)} of {len(chunks)} chunk summaries failed ({part}: {exc})") from exc
+    return "\n\n".join(f"[{part}]\n{summary.strip()}" for part, summary in summaries.items())
+
+
+def prepare_analysis_input(screenplay_text: str,
+                           templates: dict,
+                           mode: str = None,
+                           model: str = DEFAULT_MODEL,
+                           use_cache: bool = True,
+                           metrics=None):
+    """
+    Choose the text the section prompts are built from.
+
+    The screenplay is first stripped of layout noise (page numbers,
+    CONT'D/MORE markers, running headers, whitespace) unless NORMALIZE_TEXT
+    is off in secrets. In "full" mode that is the screenplay itself. In "digest" mode the
+    screenplay is split at scene boundaries into overlapping chunks, which
+    are summarized in parallel and merged into a digest. "auto" uses the
+    digest only when the screenplay exceeds DIGEST_THRESHOLD_TOKENS.
+
+    Returns `(text, token_usage)`, where token_usage estimates the section
+    input tokens of both modes (digest mode also counts the map step) and
+    the screenplay size before and after normalization. Raises
+    DigestFailed when the digest cannot be completed.
+    """
+    mode = mode or get_setting("ANALYSIS_MODE", ANALYSIS_MODE)
+    if mode not in ("full", "digest", "auto"):
+        raise ValueError(f"Unknown analysis mode: {mode!r}")
+    chunk_tokens = int(get_setting("CHUNK_TOKENS", CHUNK_TOKENS))
+    overlap_tokens = int(get_setting("CHUNK_OVERLAP_TOKENS", CHUNK_OVERLAP_TOKENS))
+    digest_tokens = int(get_setting("DIGEST_TOKENS_PER_CHUNK", DIGEST_TOKENS_PER_CHUNK))
+
+    raw_tokens = count_tokens(screenplay_text, model)
+    if get_setting("NORMALIZE_TEXT", True):
+        screenplay_text = normalize_screenplay(screenplay_text)
+    text_tokens = count_tokens(screenplay_text, model)
+    sent = _sent_templates(templates)
+    # Anchored boundaries keep unchanged parts of a revised draft in the same chunks
+    chunks = chunk_scenes(screenplay_text, chunk_tokens, overlap_tokens, model,
+                          anchored=get_setting("STABLE_CHUNKS", True))
+    map_input = sum(count_tokens(chunk, model) + count_tokens(DIGEST_PROMPT, model) for chunk in chunks)
+
+    usage = {
+        "raw_screenplay_tokens": raw_tokens,
+        "screenplay_tokens": text_tokens,
+        "chunks": len(chunks),
+        "full_text_prompt_tokens": _prompt_tokens(text_tokens, sent, model),
+    }
+
+    threshold = int(get_setting("DIGEST_THRESHOLD_TOKENS", DIGEST_THRESHOLD_TOKENS))
+    if mode == "full" or (mode == "auto" and text_tokens <= threshold):
+        # What the digest would have cost, assuming every summary uses its full budget
+        usage["mode"] = "full"
+        usage["digest_prompt_tokens"] = map_input + _prompt_tokens(len(chunks) * digest_tokens, sent, model)
+        usage["digest_estimated"] = True
+        _retrieval_usage(usage, templates, text_tokens)
+        return screenplay_text, usage
+
+    digest = summarize_chunks(chunks, model=model, max_tokens=digest_tokens, use_cache=use_cache, metrics=metrics)
+    usage["mode"] = "digest"
+    usage["digest_tokens"] = count_tokens(digest, model)
+    usage["digest_prompt_tokens"] = map_input + _prompt_tokens(usage["digest_tokens"], sent, model)
+    usage["digest_estimated"] = False
+    _retrieval_usage(usage, templates, usage["digest_tokens"])
+    return digest, usage
+
+
+def format_token_usage(usage: dict) -> str:
+    """
+    One-line summary of prepare_analysis_input's token report for the UI.
+    """
+    digest_note = " (estimated)" if usage["digest_estimated"] else ""
+    raw, text = usage["raw_screenplay_tokens"], usage["screenplay_tokens"]
+    saved = 1 - text / raw if raw else 0.0
+    line = (
+        f"🔢 Mode: {usage['mode']} · screenplay {raw:,} → {text:,} tokens after normalization (-{saved:.0%}) "
+        f"in {usage['chunks']} chunk(s) · "
+        f"input tokens: full text {usage['full_text_prompt_tokens']:,}, "
+        f"digest {usage['digest_prompt_tokens']:,}{digest_note}"
+    )
+    if usage.get("retrieved_sections"):
+        line += (f" · {usage['retrieved_sections']} section(s) sent only relevant scenes "
+                 f"(about {usage['retrieval_saved_tokens']:,} fewer input tokens)")
+    return line
+
+
+def stream_sections(screenplay_text: str,
+                    templates: dict,
+                    max_tokens: dict,
+                    model: str = DEFAULT_MODEL,
+                    temperature: float = DEFAULT_TEMPERATURE,
+                    max_concurrency: int = None,
+                    use_cache: bool = True,
+                    combine_short: bool = None,
+                    metrics=None,
+                    index: ScreenplayIndex = None,
+                    cancel=None):
+    """
+    Streaming counterpart of analyze_sections.
+
+    Sections stream concurrently on worker threads; this generator runs on
+    the caller's thread (so it may update Streamlit elements) and yields
+    `(section, text_so_far, done)` whenever a section has new text; the
+    `done` update carries the complete section. Cached sections, and the
+    short sections when they share a structured request, arrive in one
+    piece, as do the locally answered sections. Finished sections are
+    stored in the response cache and, with a `metrics`, timed and their
+    token usage recorded. A section already streaming for another caller
+    is not requested again; it arrives in one piece when that stream
+    finishes. A stream that runs past its section deadline is cut off
+    there and not cached. Retrieved sections stream from their relevant
+    scenes, as in analyze_sections. Once the `cancel` event is set, sections that
+    have not started are reported as cancelled and running streams stop
+    at their next delta.
+    """
+    if max_concurrency is None:
+        max_concurrency = get_setting("MAX_CONCURRENT_SECTIONS", DEFAULT_MAX_CONCURRENCY)
+    cache = get_response_cache() if use_cache else None
+    if not templates:
+        return
+    retrieved = _retrieved_texts(screenplay_text, templates, index, model)
+    local, remote, screenplay_text = _split_local(screenplay_text, templates, index)
+    combined = _combined_sections(remote, combine_short)
+
+    updates = queue.Queue()
+    for section, text in local.items():
+        updates.put((section, text, True))
+
+    def combined_worker():
+        try:
+            if cancel is not None and cancel.is_set():
+                raise SectionCancelled("cancelled before it started")
+            results = _run_combined(screenplay_text, remote, max_tokens, combined, model, temperature, cache)
+        except Exception as exc:
+            if not isinstance(exc, SectionCancelled):
+                logger.exception("Sections %s failed", combined)
+            results = {section: section_error_message(section, exc) for section in combined}
+        for section in combined:
+            updates.put((section, results[section], True))
+
+    def fetch(section, template, claimed):
+        if cancel is not None and cancel.is_set():
+            raise SectionCancelled("cancelled before it started")
+        limit = max_tokens[section]
+        section_text = retrieved.get(section, screenplay_text)
+        if cache is None:
+            text, _ = _stream_section(section, template, section_text, model, temperature, limit, updates, cancel)
+            return text
+        key = cache_key(section_text, template, model, temperature, limit)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+        # Another session streaming the same prompt: wait for its text
+        leader, flight = cache.flight.claim(key)
+        if not leader:
+            return _await_flight(flight, cancel)
+        claimed.append((key, flight))
+        cached = cache.get(key, count=False)
+        if cached is not None:
+            return cached
+        text, complete = _stream_section(section, template, section_text, model, temperature, limit, updates, cancel)
+        if complete:
+            cache.put(key, text)
+        return text
+
+    def worker(section, template):
+        # Whatever happens, the section gets its done update and a key this
+        # worker claimed is released; otherwise the consumer below, and other
+        # callers waiting on the key, would block forever
+        claimed, text, error = [], None, None
+        try:
+            text = fetch(section, template, claimed)
+        except BaseException as exc:
+            error = exc
+            text = section_error_message(section, exc)
+            if not isinstance(exc, Exception):
+                raise
+            if not isinstance(exc, SectionCancelled):
+                logger.exception("Section %r failed", section)
+        finally:
+            for key, flight in claimed:
+                cache.flight.release(key, flight, text if error is None else None, exc=error)
+            updates.put((section, text, True))
+
+    texts = {section: [] for section in templates}
+    remaining = len(templates)
+    workers = max(1, min(int(max_concurrency), len(remote)))
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stream")
+    try:
+        if combined:
+            pool.submit(metrics.measured(_COMBINED_TASK, combined_worker) if metrics else combined_worker)
+        for section, template in remote.items():
+            if section not in combined:
+                task = partial(worker, section, template)
+                pool.submit(metrics.measured(section, task) if metrics else task)
+
+        while remaining:
+            # Block for one update, then drain whatever else is queued so a
+            # burst of tokens costs one UI refresh per section
+            batch = [updates.get()]
+            while True:
+                try:
+                    batch.append(updates.get_nowait())
+                except queue.Empty:
+                    break
+
+            changed = {}
+            for section, text, done in batch:
+                # Deltas accumulate; a `done` message carries the full text
+                if done:
+                    texts[section] = [text]
+                else:
+                    texts[section].append(text)
+                changed[section] = changed.get(section, False) or done
+            for section, done in changed.items():
+                if done:
+                    remaining -= 1
+                yield section, "".join(texts[section]), done
+    finally:
+        pool.shutdown(wait=False)
@@ -1,167 +1,56 @@
 import streamlit as st
-import fitz  # pymupdf
-import openai
 import json
-
-# Set your OpenAI API key from Streamlit secrets
-openai.api_key = st.secrets["OPENAI_API_KEY"]
+from functools import partial
+from analysis import analyze_sections, format_token_usage, prepare_analysis_input
+from uploads import UploadRejected, format_upload_report, load_upload
+from prompts import DETAILED_MAX_TOKENS, DETAILED_PROMPTS
+from screenplay_index import ScreenplayIndex
+from jobs import ACTIVE, CANCELLED, FAILED, get_job_runner
+from settings import openai_api_key
+from speculation import cancel_speculation, format_speculation, speculation_savings, start_speculation
+
+# The OpenAI key comes from Streamlit secrets; the SDK itself is imported with the
+# first client (openai_client.py), so check the key here to fail early without it
+openai_api_key()
 
 # Function to extract text from uploaded PDF
 def extract_text_from_pdf(pdf_file):
-    doc = fitz.open(stream=pdf_file.read(), filetype="pdf")
-    text = ""
-    for page in doc:
-        text += page.get_text()
-    return text
-
-# Function to call OpenAI API with a prompt
-# Updated for openai>=1.0.0
-
-def call_openai(prompt, model="gpt-4o-mini", temperature=0.7, max_tokens=1000):
-    client = openai.OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": "You are an AI chatbot automating script improvements and providing data-driven insights (casting, budget, scheduling, marketing) to film producers."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=temperature,
-        max_tokens=max_tokens,
-    )
-    return response.choices[0].message.content
+    # Spooled to disk and opened by path, with byte/page limits checked first;
+    # results are shared across sessions by content hash (see uploads.py)
+    return load_upload(pdf_file)["text"]
 
 # Function to run all analyses
-def get_all_analyses(screenplay_text):
-    results = {}
-
-    # Each prompt uses your exact detailed instructions
-    prompts = {
-    "Logline": f"""Write a Hollywood-style logline for my screenplay. It should only contain the logline, making it engaging and high-concept.
-
-Screenplay:
-\"\"\"{screenplay_text}\"\"\"
-""",
-
-    "Genre": f"""Suggest the genre for the provided screenplay. By genre, we mean a particular type or style of literature, art, film, or music recognizable by its special characteristics.
-
-Screenplay:
-\"\"\"{screenplay_text}\"\"\"
-""",
-
-    "Top Keywords": f"""Give the top 10 keywords of the attached movie screenplay without any explanation.
-
-Screenplay:
-\"\"\"{screenplay_text}\"\"\"
-""",
-
-    "Location Setting": f"""Give the location setting of the attached movie screenplay, considering only the primary location.
-
-Screenplay:
-\"\"\"{screenplay_text}\"\"\"
-""",
-
-    "Synopsis": f"""Give only the synopsis of the attached screenplay.
-
-Screenplay:
-\"\"\"{screenplay_text}\"\"\"
-""",
-
-    "Script Score": f"""Analyze the attached screenplay and give it a script score out of 10, including:
-- Character development score (out of 10) with 1-2 lines explanation
-- Plot construction (out of 10) with 1-2 lines explanation
-- Dialogue (out of 10) with 1-2 lines explanation
-- Originality (out of 10) with 1-2 lines explanation
-- Emotional engagement (out of 10) with 1-2 lines explanation
-- Theme and message (out of 10) with 1-2 lines explanation
-- Overall rating out of 10 with explanation
-
-Screenplay:
-\"\"\"{screenplay_text}\"\"\"
-""",
-
-    "Plot Assessment": f"""Analyze the attached screenplay and give the plot assessment and enhancement, including:
-- 5 points of what is working well (positive aspects)
-- 5 points where the screenplay lacks
-- 5 points of improvements that may be made
-- An overall review of the screenplay
-
-Screenplay:
-\"\"\"{screenplay_text}\"\"\"
-""",
-
-    "Character Profiling": f"""Analyze the attached screenplay and return character profiling for the main characters, including:
-- Brief description of each main character
-- What is working well for each character
-- Areas for improvement
-- The archetype for each
-
-Screenplay:
-\"\"\"{screenplay_text}\"\"\"
-""",
-
-    "Box Office Collection": f"""Analyze the attached screenplay and give its box office prediction  with the following fields:
-- Opening day (global and local)
-- Opening week (global and local)
-- Opening month (global and local)
-
-Screenplay:
-\"\"\"{screenplay_text}\"\"\"
-"""
-}
-
-
-
-    for key, prompt in prompts.items():
-        results[key] = call_openai(prompt, max_tokens=700 if key not in ["Top Keywords", "Location Setting", "Genre"] else 200)
+# Prompts live in prompts.py; repeat runs of the same screenplay are served from the response cache
+# combine_short: ask for Logline/Genre/Top Keywords/Location Setting in one JSON response
+# index: scene/character index of the full screenplay; Top Keywords and Location Setting come from it
+# on_section/cancel: progress callback and cancel event of the background job
+def get_all_analyses(screenplay_text, max_concurrency=None, combine_short=None, index=None,
+                     on_section=None, cancel=None):
+    return analyze_sections(
+        screenplay_text, DETAILED_PROMPTS, DETAILED_MAX_TOKENS,
+        max_concurrency=max_concurrency, combine_short=combine_short, index=index,
+        on_section=on_section, cancel=cancel,
+    )
 
-    return results
+# Background job body (jobs.py): runs outside the script run, so no st.* calls here
+# speculation_id: the upload's speculative analysis, whose short sections come back from the cache
+def run_report(job, screenplay_text, index, speculation_id=None):
+    # Long scripts are condensed into a scene digest first
+    prompt_text, token_usage = prepare_analysis_input(screenplay_text, DETAILED_PROMPTS)
+    all_results = get_all_analyses(prompt_text, index=index, on_section=job.update, cancel=job.cancel_event)
+    if job.cancelled:
+        return None
+    return {"token_usage": token_usage, "pdf": create_pdf_report(all_results).getvalue(),
+            "speculation": speculation_savings(speculation_id, job.created, all_results)}
 
 # PDF generation function
-from fpdf import FPDF
-from io import BytesIO
+# clean_markdown is shared with the batch runner (batch.py)
+from report import clean_markdown, render_report
 import os
 
-def clean_markdown(text):
-    # Remove common Markdown characters
-    text = re.sub(r"(\*\*|__)", "", text)         # bold
-    text = re.sub(r"(#+\s*)", "", text)           # headings like #, ##, ###
-    text = re.sub(r"`", "", text)                 # inline code
-    text = re.sub(r"\n{3,}", "\n\n", text)        # excessive line breaks
-    return text.strip()
-
 def create_pdf_report(data):
-    pdf = FPDF()
-    pdf.add_page()
-
-    font_regular = "DejaVuSans.ttf"
-    font_bold = "DejaVuSans-Bold.ttf"
-
-    if not os.path.isfile(font_regular) or not os.path.isfile(font_bold):
-        raise FileNotFoundError("Font files not found.")
-
-    pdf.add_font("DejaVu", "", font_regular, uni=True)
-    pdf.add_font("DejaVu", "B", font_bold, uni=True)
-
-    pdf.set_font("DejaVu", 'B', 16)
-    pdf.cell(0, 10, "Screenplay Analysis Report", ln=True, align="C")
-    pdf.ln(10)
-
-    for section, content in data.items():
-        pdf.set_font("DejaVu", 'B', 14)
-        pdf.cell(0, 10, section, ln=True)
-        pdf.ln(2)
-
-        pdf.set_font("DejaVu", '', 12)
-        cleaned_content = clean_markdown(content)
-        pdf.multi_cell(0, 8, cleaned_content)
-
-        pdf.ln(10)
-
-    # Save to BytesIO
-    pdf_buffer = BytesIO()
-    pdf.output(pdf_buffer)
-    pdf_buffer.seek(0)
-    return pdf_buffer
+    # Fonts and the title block come from a per-process template (report.py)
+    return render_report(data, clean_markdown)
 import re
 
 
@@ -177,23 +66,67 @@ uploaded_file = st.file_uploader("Upload a movie screenplay (PDF)", type=["pdf"]
 if uploaded_file is not None:
     movie_name = os.path.splitext(uploaded_file.name)[0]
 if uploaded_file is not None:
-    if "screenplay_text" not in st.session_state:
-        with st.spinner("Extracting screenplay..."):
-            st.session_state["screenplay_text"] = extract_text_from_pdf(uploaded_file)
+    # Each new upload is spooled and hashed once; identical content reuses cached text
+    if st.session_state.get("upload_id") != uploaded_file.file_id:
+        try:
+            with st.spinner("Extracting screenplay..."):
+                upload = load_upload(uploaded_file)
+        except UploadRejected as exc:
+            st.error(f"❌ {exc}")
+            st.stop()
+        st.session_state["screenplay_text"] = upload["text"]
+        st.session_state["screenplay_hash"] = upload["digest"]
+        st.session_state["upload_id"] = uploaded_file.file_id
+        st.session_state["screenplay_index"] = ScreenplayIndex(upload["text"])
+        st.session_state["job_id"] = None
+        # Opt-in (SPECULATIVE_ANALYSIS): start the short sections before the button is pressed
+        cancel_speculation(st.session_state.get("speculation_id"))
+        st.session_state["speculation_id"] = start_speculation(
+            upload["text"], DETAILED_PROMPTS, DETAILED_MAX_TOKENS,
+            index=st.session_state["screenplay_index"], label=movie_name,
+        )
         st.success("✅ Screenplay extracted and ready!")
+        st.caption(format_upload_report(upload))
 
+    jobs = get_job_runner()
     if st.button("Generate Report"):
-        with st.spinner("Analyzing screenplay (this may take a while)..."):
-            all_results = get_all_analyses(st.session_state["screenplay_text"])
-
-        # Generate PDF report
-        pdf_file = create_pdf_report(all_results)
+        # Runs in the background and survives reruns; the session keeps only the job id
+        st.session_state["job_id"] = jobs.submit(
+            partial(run_report, screenplay_text=st.session_state["screenplay_text"],
+                    index=st.session_state["screenplay_index"],
+                    speculation_id=st.session_state.get("speculation_id")),
+            DETAILED_PROMPTS,
+            label=movie_name,
+        )
 
+    @st.fragment(run_every=1.0)
+    def job_progress(job_id):
+        # Polled once a second; a full rerun shows the download button when the job ends
+        job = jobs.get(job_id)
+        if job is None or job.status not in ACTIVE:
+            st.rerun()
+        snapshot = job.snapshot()
+        st.progress(snapshot["done"] / snapshot["total"],
+                    text=f"Analyzing screenplay: {snapshot['done']} of {snapshot['total']} sections done...")
+        if st.button("Cancel"):
+            jobs.cancel(job_id)
+
+    job = jobs.get(st.session_state.get("job_id"))
+    if job is not None and job.status in ACTIVE:
+        job_progress(job.id)
+    elif job is not None and job.status == CANCELLED:
+        st.warning("Analysis cancelled.")
+    elif job is not None and job.status == FAILED:
+        st.error(f"❌ Analysis failed: {job.error}")
+    elif job is not None and job.result:
         st.success("Analysis complete!")
+        st.caption(format_token_usage(job.result["token_usage"]))
+        if job.result["speculation"]:
+            st.caption(format_speculation(job.result["speculation"]))
         st.download_button(
             label="📄 Download Analysis Report as PDF",
-            data=pdf_file,
-            file_name=f"{movie_name}-report.pdf",
+            data=job.result["pdf"],
+            file_name=f"{job.label}-report.pdf",
             mime="application/pdf"
         )
 else:
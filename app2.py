@@ -1,18 +1,26 @@
 # app.py
 import streamlit as st
-import fitz  # PyMuPDF
-import openai
 import json
 import os
 import re
-from fpdf import FPDF
+from functools import partial
 from io import BytesIO
+from analysis import analyze_sections, format_token_usage, prepare_analysis_input
+from uploads import UploadRejected, format_upload_report, load_upload
+from prompts import DETAILED_MAX_TOKENS, DETAILED_PROMPTS
+from report import render_report
+from screenplay_index import ScreenplayIndex
+from jobs import ACTIVE, CANCELLED, FAILED, get_job_runner
+from settings import openai_api_key
+from speculation import cancel_speculation, format_speculation, speculation_savings, start_speculation
+from styles import style_block
 
 # ────────────────────────────────────────────────────────────────────────────────
 # 1) OPENAI API KEY
 # ────────────────────────────────────────────────────────────────────────────────
-# Make sure you've set OPENAI_API_KEY in your Streamlit secrets
-openai.api_key = st.secrets["OPENAI_API_KEY"]
+# Make sure you've set OPENAI_API_KEY in your Streamlit secrets; the client
+# (openai_client.py) reads it on first use, this only fails early when it's missing
+openai_api_key()
 
 
 # ────────────────────────────────────────────────────────────────────────────────
@@ -24,9 +32,8 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-st.markdown(
-    """
-    <style>
+# Minified once per process (styles.py); each rerun only re-sends the small block
+PAGE_CSS = """
     /* Hide default Streamlit header, footer, and menu */
     header, footer, #MainMenu { visibility: hidden; }
 
@@ -96,10 +103,8 @@ st.markdown(
       padding: 0 1rem !important;
       font-size: 1rem !important;
     }
-    </style>
-    """,
-    unsafe_allow_html=True,
-)
+"""
+st.markdown(style_block(PAGE_CSS), unsafe_allow_html=True)
 
 # ────────────────────────────────────────────────────────────────────────────────
 # 3) FUNCTIONS
@@ -110,129 +115,46 @@ st.markdown(
 #    - PDF report creation
 # ────────────────────────────────────────────────────────────────────────────────
 
-def extract_text_from_pdf(pdf_file):
+def extract_text_from_pdf(pdf_file) -> str:
     """
-    Read an uploaded PDF (as a stream) and extract all text.
+    Read an uploaded PDF and extract all text. See uploads.load_upload for
+    spooling, limits and the content-hash cache.
     """
-    doc = fitz.open(stream=pdf_file.read(), filetype="pdf")
-    all_text = []
-    for page in doc:
-        all_text.append(page.get_text())
-    return "\n".join(all_text)
+    return load_upload(pdf_file, separator="\n")["text"]
 
 
-def call_openai(prompt: str,
-                model: str = "gpt-4o-mini",
-                temperature: float = 0.7,
-                max_tokens: int = 1000) -> str:
+def get_all_analyses(screenplay_text: str, max_concurrency: int = None, combine_short: bool = None,
+                     index: ScreenplayIndex = None, on_section=None, cancel=None) -> dict:
     """
-    Call the OpenAI Chat Completions API.
+    Run a suite of analyses on the screenplay text and return a dict of results.
+    Sections are sent concurrently (capped by MAX_CONCURRENT_SECTIONS in secrets)
+    and cached results are reused (see response_cache.py). With combine_short
+    (default: STRUCTURED_SHORT_SECTIONS in secrets) the short sections share
+    one JSON-schema response. Top Keywords and Location Setting are computed
+    from `index`, the scene/character index of the full screenplay.
+    `on_section` and `cancel` connect the run to a background job.
     """
-    client = openai.OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    "You are an AI chatbot automating script improvements and "
-                    "providing data-driven insights (casting, budget, scheduling, marketing) "
-                    "to film producers."
-                )
-            },
-            {"role": "user", "content": prompt}
-        ],
-        temperature=temperature,
-        max_tokens=max_tokens
+    return analyze_sections(
+        screenplay_text, DETAILED_PROMPTS, DETAILED_MAX_TOKENS,
+        max_concurrency=max_concurrency, combine_short=combine_short, index=index,
+        on_section=on_section, cancel=cancel,
     )
-    return response.choices[0].message.content
 
 
-def get_all_analyses(screenplay_text: str) -> dict:
+def run_report(job, screenplay_text: str, index: ScreenplayIndex, speculation_id: str = None) -> dict:
     """
-    Run a suite of analyses on the screenplay text and return a dict of results.
+    Background job body (see jobs.py): analyze and render the PDF. Runs
+    outside the Streamlit script run, so it must not call st.* functions.
+    Sections the upload's speculative analysis already ran come from the
+    cache; the latency that saved is part of the result.
     """
-    prompts = {
-        "Logline": f"""Write a Hollywood-style logline for my screenplay. It should only contain the logline, making it engaging and high-concept.
-
-Screenplay:
-\"\"\"{screenplay_text}\"\"\"
-""",
-
-        "Genre": f"""Suggest the genre for the provided screenplay. By genre, we mean a particular type or style of literature, art, film, or music recognizable by its special characteristics.
-
-Screenplay:
-\"\"\"{screenplay_text}\"\"\"
-""",
-
-        "Top Keywords": f"""Give the top 10 keywords of the attached movie screenplay without any explanation.
-
-Screenplay:
-\"\"\"{screenplay_text}\"\"\"
-""",
-
-        "Location Setting": f"""Give the location setting of the attached movie screenplay, considering only the primary location.
-
-Screenplay:
-\"\"\"{screenplay_text}\"\"\"
-""",
-
-        "Synopsis": f"""Give only the synopsis of the attached screenplay.
-
-Screenplay:
-\"\"\"{screenplay_text}\"\"\"
-""",
-
-        "Script Score": f"""Analyze the attached screenplay and give it a script score out of 10, including:
-- Character development score (out of 10) with 1-2 lines explanation
-- Plot construction (out of 10) with 1-2 lines explanation
-- Dialogue (out of 10) with 1-2 lines explanation
-- Originality (out of 10) with 1-2 lines explanation
-- Emotional engagement (out of 10) with 1-2 lines explanation
-- Theme and message (out of 10) with 1-2 lines explanation
-- Overall rating out of 10 with explanation
-
-Screenplay:
-\"\"\"{screenplay_text}\"\"\"
-""",
-
-        "Plot Assessment": f"""Analyze the attached screenplay and give the plot assessment and enhancement, including:
-- 5 points of what is working well (positive aspects)
-- 5 points where the screenplay lacks
-- 5 points of improvements that may be made
-- An overall review of the screenplay
-
-Screenplay:
-\"\"\"{screenplay_text}\"\"\"
-""",
-
-        "Character Profiling": f"""Analyze the attached screenplay and return character profiling for the main characters, including:
-- Brief description of each main character
-- What is working well for each character
-- Areas for improvement
-- The archetype for each
-
-Screenplay:
-\"\"\"{screenplay_text}\"\"\"
-""",
-
-        "Box Office Collection": f"""Analyze the attached screenplay and give its box office prediction with the following fields:
-- Opening day (global and local)
-- Opening week (global and local)
-- Opening month (global and local)
-
-Screenplay:
-\"\"\"{screenplay_text}\"\"\"
-"""
-    }
-
-    results = {}
-    for section, prompt in prompts.items():
-        # Use shorter token limit for small answers
-        limit = 200 if section in ["Genre", "Top Keywords", "Location Setting"] else 700
-        results[section] = call_openai(prompt, max_tokens=limit)
-
-    return results
+    # Long scripts are condensed into a scene digest first
+    prompt_text, token_usage = prepare_analysis_input(screenplay_text, DETAILED_PROMPTS)
+    analyses = get_all_analyses(prompt_text, index=index, on_section=job.update, cancel=job.cancel_event)
+    if job.cancelled:
+        return None
+    return {"token_usage": token_usage, "pdf": create_pdf_report(analyses).getvalue(),
+            "speculation": speculation_savings(speculation_id, job.created, analyses)}
 
 
 def clean_markdown(text: str) -> str:
@@ -250,39 +172,9 @@ def clean_markdown(text: str) -> str:
 def create_pdf_report(data: dict) -> BytesIO:
     """
     Generate a PDF report from the analysis dict and return a BytesIO buffer.
+    DejaVu fonts are parsed once per process (see report.py).
     """
-    pdf = FPDF()
-    pdf.add_page()
-
-    # Load fonts (make sure these .ttf files are in your working directory)
-    font_regular = "DejaVuSans.ttf"
-    font_bold = "DejaVuSans-Bold.ttf"
-    if not os.path.isfile(font_regular) or not os.path.isfile(font_bold):
-        raise FileNotFoundError("DejaVu font files not found in working directory.")
-
-    pdf.add_font("DejaVu", "", font_regular, uni=True)
-    pdf.add_font("DejaVu", "B", font_bold, uni=True)
-
-    # Title
-    pdf.set_font("DejaVu", "B", 16)
-    pdf.cell(0, 10, "Screenplay Analysis Report", ln=True, align="C")
-    pdf.ln(10)
-
-    # Sections
-    for section, content in data.items():
-        pdf.set_font("DejaVu", "B", 14)
-        pdf.cell(0, 10, section, ln=True)
-        pdf.ln(2)
-
-        pdf.set_font("DejaVu", "", 12)
-        cleaned = clean_markdown(content)
-        pdf.multi_cell(0, 8, cleaned)
-        pdf.ln(8)
-
-    buffer = BytesIO()
-    pdf.output(buffer)
-    buffer.seek(0)
-    return buffer
+    return render_report(data, clean_markdown, section_gap=8)
 
 
 # ────────────────────────────────────────────────────────────────────────────────
@@ -326,23 +218,68 @@ movie_name = None
 if uploaded_file:
     movie_name = os.path.splitext(uploaded_file.name)[0]
 
-    if "screenplay_text" not in st.session_state:
-        with st.spinner("Extracting screenplay…"):
-            text = extract_text_from_pdf(uploaded_file)
-            st.session_state["screenplay_text"] = text
+    # Each new upload is spooled and hashed once; identical content reuses cached text
+    if st.session_state.get("upload_id") != uploaded_file.file_id:
+        try:
+            with st.spinner("Extracting screenplay…"):
+                upload = load_upload(uploaded_file, separator="\n")
+        except UploadRejected as exc:
+            st.error(f"❌ {exc}")
+            st.stop()
+        st.session_state["screenplay_text"] = upload["text"]
+        st.session_state["screenplay_hash"] = upload["digest"]
+        st.session_state["upload_id"] = uploaded_file.file_id
+        st.session_state["screenplay_index"] = ScreenplayIndex(upload["text"])
+        st.session_state["job_id"] = None
+        # Opt-in (SPECULATIVE_ANALYSIS): start the short sections before the button is pressed
+        cancel_speculation(st.session_state.get("speculation_id"))
+        st.session_state["speculation_id"] = start_speculation(
+            upload["text"], DETAILED_PROMPTS, DETAILED_MAX_TOKENS,
+            index=st.session_state["screenplay_index"], label=movie_name,
+        )
         st.success("✅ Screenplay extracted and ready!")
+        st.caption(format_upload_report(upload))
 
-    # 5.3 Generate analysis report
+    # 5.3 Generate analysis report (in the background, so reruns don't interrupt it)
+    jobs = get_job_runner()
     if st.button("Generate Report"):
-        with st.spinner("Analyzing screenplay (this may take a while)…"):
-            analyses = get_all_analyses(st.session_state["screenplay_text"])
-        pdf_buf = create_pdf_report(analyses)
+        st.session_state["job_id"] = jobs.submit(
+            partial(run_report, screenplay_text=st.session_state["screenplay_text"],
+                    index=st.session_state["screenplay_index"],
+                    speculation_id=st.session_state.get("speculation_id")),
+            DETAILED_PROMPTS,
+            label=movie_name,
+        )
+
+    @st.fragment(run_every=1.0)
+    def job_progress(job_id):
+        # Polled once a second; a full rerun shows the download button when the job ends
+        job = jobs.get(job_id)
+        if job is None or job.status not in ACTIVE:
+            st.rerun()
+        snapshot = job.snapshot()
+        st.progress(snapshot["done"] / snapshot["total"],
+                    text=f"Analyzing screenplay: {snapshot['done']} of {snapshot['total']} sections done…")
+        if st.button("Cancel"):
+            jobs.cancel(job_id)
+
+    job = jobs.get(st.session_state.get("job_id"))
+    if job is not None and job.status in ACTIVE:
+        job_progress(job.id)
+    elif job is not None and job.status == CANCELLED:
+        st.warning("Analysis cancelled.")
+    elif job is not None and job.status == FAILED:
+        st.error(f"❌ Analysis failed: {job.error}")
+    elif job is not None and job.result:
         st.success("📝 Analysis complete!")
+        st.caption(format_token_usage(job.result["token_usage"]))
+        if job.result["speculation"]:
+            st.caption(format_speculation(job.result["speculation"]))
 
         st.download_button(
             label="📄 Download Analysis Report as PDF",
-            data=pdf_buf,
-            file_name=f"{movie_name}-report.pdf",
+            data=job.result["pdf"],
+            file_name=f"{job.label}-report.pdf",
             mime="application/pdf"
         )
 else:
@@ -1,10 +1,26 @@
 import streamlit as st
-import fitz  # pymupdf
-import openai
 import os
-from fpdf import FPDF
 from io import BytesIO
 import re
+import time
+from datetime import datetime
+from functools import partial
+from analysis import analyze_sections, format_token_usage, prepare_analysis_input, stream_sections
+from uploads import UploadRejected, format_upload_report, load_upload
+from metrics import ReportMetrics, export_metrics
+from history import SHARED_HISTORY, get_history_store
+from screenplay_index import ScreenplayIndex
+from scores import SCORE_FIELDS, SCORE_LABELS
+from openai_client import get_connection_stats
+from rate_limit import format_scheduler_stats, get_scheduler
+from hedging import get_latency_tracker
+from prompts import BRIEF_MAX_TOKENS, BRIEF_PROMPTS
+from report import render_report
+from settings import get_setting, openai_api_key
+from styles import style_block
+from jobs import ACTIVE, CANCELLED, FAILED, QUEUED, get_job_runner
+from drafts import diff_drafts, format_draft_report, reusable_sections, scene_fingerprints
+from speculation import cancel_speculation, format_speculation, speculation_savings, start_speculation
 
 # ─── 1) Page Configuration ────────────────────────────────────────────────
 st.set_page_config(page_title="RAIN-CHECK")
@@ -12,39 +28,23 @@ st.set_page_config(page_title="RAIN-CHECK")
 # ─── 2) Initialize session state ──────────────────────────────────────────
 if "current_movie" not in st.session_state:
     st.session_state["current_movie"] = None
-if "history" not in st.session_state:
-    st.session_state["history"] = {}  # maps movie_name -> analysis dict
+if "uploaded_hashes" not in st.session_state:
+    st.session_state["uploaded_hashes"] = set()
+# Past analyses live in a SQLite store shared across sessions (see history.py);
+# unless SHARED_HISTORY is set, a session sees only the screenplays it uploaded
+history = get_history_store()
+shared_history = get_setting("SHARED_HISTORY", SHARED_HISTORY)
+visible_hashes = None if shared_history else st.session_state["uploaded_hashes"]
 
-# ─── 3) Set your OpenAI API key from Streamlit secrets ─────────────────────
-openai.api_key = st.secrets["OPENAI_API_KEY"]
+# ─── 3) Check the OpenAI API key in Streamlit secrets ──────────────────────
+# The SDK is imported with the first client (openai_client.py), not at start-up
+openai_api_key()
 
 # ─── 4) Extract text from uploaded PDF ─────────────────────────────────────
 def extract_text_from_pdf(pdf_file):
-    doc = fitz.open(stream=pdf_file.read(), filetype="pdf")
-    text = ""
-    for page in doc:
-        text += page.get_text()
-    return text
-
-# ─── 5) Call OpenAI for a single prompt ────────────────────────────────────
-def call_openai_single(prompt: str, model="gpt-4o-mini", temperature=0.7, max_tokens=1500):
-    client = openai.OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    "You are an AI chatbot automating script improvements and providing "
-                    "data-driven insights (casting, budget, scheduling, marketing) to film producers."
-                ),
-            },
-            {"role": "user", "content": prompt},
-        ],
-        temperature=temperature,
-        max_tokens=max_tokens,
-    )
-    return response.choices[0].message.content
+    # Spooled to disk and opened by path, with byte/page limits checked first;
+    # results are shared across sessions by content hash (see uploads.py)
+    return load_upload(pdf_file)["text"]
 
 # ─── 6) Markdown-cleaning helper ───────────────────────────────────────────
 def clean_markdown(text):
@@ -56,74 +56,89 @@ def clean_markdown(text):
 
 # ─── 7) Generate PDF report ────────────────────────────────────────────────
 def create_pdf_report(data: dict) -> BytesIO:
-    pdf = FPDF()
-    pdf.add_page()
+    # Parsed fonts and the title block are reused from report.py's template
+    return render_report(data, clean_markdown)
 
-    font_regular = "DejaVuSans.ttf"
-    font_bold = "DejaVuSans-Bold.ttf"
-
-    if not os.path.isfile(font_regular) or not os.path.isfile(font_bold):
-        raise FileNotFoundError("Font files not found. Make sure DejaVu fonts are in the app folder.")
-
-    pdf.add_font("DejaVu", "", font_regular, uni=True)
-    pdf.add_font("DejaVu", "B", font_bold, uni=True)
-
-    pdf.set_font("DejaVu", "B", 16)
-    pdf.cell(0, 10, "Screenplay Analysis Report", ln=True, align="C")
-    pdf.ln(10)
-
-    for section, content in data.items():
-        pdf.set_font("DejaVu", "B", 14)
-        pdf.cell(0, 10, section, ln=True)
-        pdf.ln(2)
+# ─── 8) Generate all analyses ──────────────────────────────────────────────
+def get_all_analyses_single(screenplay_text: str, max_concurrency: int = None, metrics=None, index=None,
+                            on_section=None, cancel=None, templates=BRIEF_PROMPTS) -> dict:
+    # Prompts live in prompts.py; cached sections are returned without an API call,
+    # and Top Keywords / Location Setting are computed from the screenplay index
+    return analyze_sections(screenplay_text, templates, BRIEF_MAX_TOKENS,
+                            max_concurrency=max_concurrency, metrics=metrics, index=index,
+                            on_section=on_section, cancel=cancel)
 
-        pdf.set_font("DejaVu", "", 12)
-        cleaned_content = clean_markdown(content)
-        pdf.multi_cell(0, 8, cleaned_content)
-        pdf.ln(10)
+def run_analysis(job, screenplay_text, index, movie_name, screenplay_hash, extract_seconds, streaming,
+                 speculation_id=None, draft_hashes=None):
+    # Runs on the shared job runner (jobs.py), outside the script run: no st.* calls here.
+    # Progress goes to the job, which the UI polls on every rerun.
+    metrics = ReportMetrics(movie_name)
+    metrics.add_stage("extract", extract_seconds)
 
-    buffer = BytesIO()
-    pdf.output(buffer)
-    buffer.seek(0)
-    return buffer
+    # A revised draft of a title analyzed before (among `draft_hashes`, if
+    # given) keeps the sections its edits don't affect
+    scenes = scene_fingerprints(screenplay_text)
+    reused, drift, draft = {}, {}, None
+    previous = None
+    if get_setting("INCREMENTAL_DRAFTS", True):
+        previous = history.previous_draft(movie_name, screenplay_hash, among=draft_hashes)
+    if previous is not None:
+        diff = diff_drafts(previous["scenes"], scenes)
+        kept = reusable_sections(diff, history.load(previous["id"]), history.drift(previous["id"]), BRIEF_PROMPTS)
+        reused = {section: text for section, (text, _) in kept.items()}
+        drift = {section: accumulated for section, (_, accumulated) in kept.items()}
+        draft = {
+            **diff,
+            "previous": f"{datetime.fromtimestamp(previous['created']):%Y-%m-%d %H:%M}",
+            "reused": list(reused),
+            "recomputed": [section for section in BRIEF_PROMPTS if section not in reused],
+        }
+        for section, text in reused.items():
+            job.update(section, text)
+    templates = {section: t for section, t in BRIEF_PROMPTS.items() if section not in reused}
 
-# ─── 8) Generate all analyses ──────────────────────────────────────────────
-def get_all_analyses_single(screenplay_text: str) -> dict:
-    prompts = {
-        "Logline": f"""Write a Hollywood-style logline for my screenplay.\n\nScreenplay:\n\"\"\"{screenplay_text}\"\"\"""",
-        "Genre": f"""Suggest the genre for the provided screenplay.\n\nScreenplay:\n\"\"\"{screenplay_text}\"\"\"""",
-        "Top Keywords": f"""Give the top 10 keywords of the attached movie screenplay without any explanation.\n\nScreenplay:\n\"\"\"{screenplay_text}\"\"\"""",
-        "Location Setting": f"""Give the location setting of the attached movie screenplay.\n\nScreenplay:\n\"\"\"{screenplay_text}\"\"\"""",
-        "Synopsis": f"""Give only the synopsis of the attached screenplay.\n\nScreenplay:\n\"\"\"{screenplay_text}\"\"\"""",
-        "Script Score": f"""Analyze the screenplay and give it a script score out of 10, including multiple components.\n\nScreenplay:\n\"\"\"{screenplay_text}\"\"\"""",
-        "Plot Assessment": f"""Analyze the screenplay and give the plot assessment and enhancements.\n\nScreenplay:\n\"\"\"{screenplay_text}\"\"\"""",
-        "Character Profiling": f"""Analyze the screenplay and return character profiling for the main characters.\n\nScreenplay:\n\"\"\"{screenplay_text}\"\"\"""",
-        "Box Office Collection": f"""Analyze the screenplay and give its box office prediction.\n\nScreenplay:\n\"\"\"{screenplay_text}\"\"\"""",
-    }
+    with metrics.stage("prepare"):
+        # Long scripts are condensed into a scene digest first
+        prompt_text, token_usage = prepare_analysis_input(screenplay_text, templates, metrics=metrics)
 
-    results = {}
-    for section_name, prompt_text in prompts.items():
-        ai_response = call_openai_single(prompt_text, max_tokens=1200)
-        results[section_name] = ai_response
+    with metrics.stage("analyze"):
+        if streaming:
+            fresh = {}
+            for section, text, done in stream_sections(
+                prompt_text, templates, BRIEF_MAX_TOKENS, metrics=metrics, index=index, cancel=job.cancel_event
+            ):
+                job.update(section, text, done)
+                if done:
+                    fresh[section] = text
+        else:
+            fresh = get_all_analyses_single(
+                prompt_text, metrics=metrics, index=index, on_section=job.update, cancel=job.cancel_event,
+                templates=templates,
+            )
+    if job.cancelled:
+        return None
+    all_results = {section: reused[section] if section in reused else fresh[section] for section in BRIEF_PROMPTS}
+    # Short sections analyzed since the upload came from the cache; credit the time they had
+    metrics.add_speculation(speculation_savings(speculation_id, job.created, all_results))
 
-    return results
+    history.save(movie_name, screenplay_hash, all_results, scenes=scenes, drift=drift)  # Save to history
+    with metrics.stage("render"):
+        pdf_bytes = create_pdf_report(all_results).getvalue()
+    export_metrics(metrics)
+    return {"results": all_results, "token_usage": token_usage, "pdf": pdf_bytes, "metrics": metrics, "draft": draft}
 
 # ─── 9) App UI Styling ─────────────────────────────────────────────────────
-st.markdown(
-    """
-    <style>
-        .reportview-container .main { padding: 2rem; }
-        .stButton>button, .stDownloadButton>button {
-            background-color: #4CAF50;
-            color: white;
-            font-size: 1.05rem;
-            border-radius: 8px;
-            padding: 0.5rem 1.2rem;
-        }
-    </style>
-    """,
-    unsafe_allow_html=True,
-)
+PAGE_CSS = """
+    .reportview-container .main { padding: 2rem; }
+    .stButton>button, .stDownloadButton>button {
+        background-color: #4CAF50;
+        color: white;
+        font-size: 1.05rem;
+        border-radius: 8px;
+        padding: 0.5rem 1.2rem;
+    }
+"""
+st.markdown(style_block(PAGE_CSS), unsafe_allow_html=True)
 
 # ─── 10) Title and History Section ─────────────────────────────────────────
 st.markdown("<h1>🎬 RAIN-CHECK: Script Analyzer</h1>", unsafe_allow_html=True)
@@ -131,19 +146,45 @@ st.markdown("Upload your screenplay and get detailed insights instantly.")
 st.divider()
 
 with st.expander("🕓 View Past Analyses"):
-    if st.session_state["history"]:
+    past_analyses = history.recent(among=visible_hashes)  # metadata only; sections are read when shown
+    if past_analyses:
         selected = st.selectbox(
             "Select a previous screenplay to view results:",
-            options=list(st.session_state["history"].keys())
+            options=past_analyses,
+            format_func=lambda entry: f"{entry['movie']} · {datetime.fromtimestamp(entry['created']):%Y-%m-%d %H:%M}",
         )
         if selected:
-            past_result = st.session_state["history"][selected]
-            st.markdown(f"<h3>📜 Analysis for: {selected}</h3>", unsafe_allow_html=True)
-            for section, content in past_result.items():
+            st.markdown(f"<h3>📜 Analysis for: {selected['movie']}</h3>", unsafe_allow_html=True)
+            for section in history.sections(selected["id"]):
+                content = history.section(selected["id"], section) or ""
                 st.markdown(f"<h4>{section}</h4>", unsafe_allow_html=True)
                 st.markdown(f"<div style='margin-bottom: 1rem;'>{clean_markdown(content)}</div>", unsafe_allow_html=True)
     else:
-        st.info("No past analyses found in this session.")
+        st.info("No past analyses found." if shared_history else "No past analyses found in this session.")
+
+with st.expander("📊 Compare Script Scores"):
+    # Built (and numpy loaded) only when asked for, not on every rerun
+    if st.toggle("Show the score comparison"):
+        scores = history.score_table()  # columnar; filtered and sorted in memory
+        if visible_hashes is not None:
+            # Other sessions' screenplays are neither listed nor counted
+            scores = scores.filter(hashes=visible_hashes)
+        if len(scores):
+            col1, col2, col3 = st.columns(3)
+            sort_field = col1.selectbox("Sort by", SCORE_FIELDS, index=SCORE_FIELDS.index("overall"),
+                                        format_func=SCORE_LABELS.get)
+            minimum = col2.slider(f"Minimum {SCORE_LABELS[sort_field].lower()}", 0.0, 10.0, 0.0, 0.5)
+            name_filter = col3.text_input("Screenplay name contains")
+            started = time.perf_counter()
+            slate = scores.filter({sort_field: minimum} if minimum else None, name_filter).sort(sort_field)
+            summary = slate.percentile_records()
+            elapsed = time.perf_counter() - started
+            st.caption(f"{len(slate):,} of {len(scores):,} screenplays · filtered, sorted and summarized in {elapsed * 1000:.1f} ms")
+            st.dataframe(slate.records(limit=500, rank_by=sort_field), use_container_width=True, hide_index=True)
+            st.markdown("**Score percentiles across these screenplays**")
+            st.dataframe(summary, use_container_width=True, hide_index=True)
+        else:
+            st.info("No script scores yet; they are recorded with each new analysis.")
 
 # ─── 11) File Upload and New Analysis ──────────────────────────────────────
 uploaded_file = st.file_uploader("📄 Upload your movie screenplay (PDF only)", type=["pdf"])
@@ -151,30 +192,122 @@ uploaded_file = st.file_uploader("📄 Upload your movie screenplay (PDF only)",
 if uploaded_file is not None:
     movie_name = os.path.splitext(uploaded_file.name)[0]
 
-    if "screenplay_text" not in st.session_state or st.session_state["current_movie"] != movie_name:
-        with st.spinner("📃 Extracting screenplay..."):
-            st.session_state["screenplay_text"] = extract_text_from_pdf(uploaded_file)
+    # Each new upload is spooled and hashed once; same-named drafts still get re-extracted
+    if st.session_state.get("upload_id") != uploaded_file.file_id:
+        try:
+            with st.spinner("📃 Extracting screenplay..."):
+                upload = load_upload(uploaded_file)
+        except UploadRejected as exc:
+            st.error(f"❌ {exc}")
+            st.stop()
+        st.session_state["screenplay_text"] = upload["text"]
+        st.session_state["screenplay_hash"] = upload["digest"]
+        st.session_state["uploaded_hashes"].add(upload["digest"])
+        st.session_state["upload_id"] = uploaded_file.file_id
+        st.session_state["extract_seconds"] = upload["seconds"]
+        st.session_state["screenplay_index"] = ScreenplayIndex(upload["text"])
         st.session_state["current_movie"] = movie_name
+        st.session_state["job_id"] = None
+        # Opt-in: the short sections start now, since the report is almost always requested
+        cancel_speculation(st.session_state.get("speculation_id"))
+        st.session_state["speculation_id"] = start_speculation(
+            upload["text"], BRIEF_PROMPTS, BRIEF_MAX_TOKENS,
+            index=st.session_state["screenplay_index"], label=movie_name,
+        )
         st.success("✅ Screenplay extracted and ready!")
+        st.caption(format_upload_report(upload))
 
+    jobs = get_job_runner()
     if st.button("🚀 Generate Full Analysis"):
-        with st.spinner("🤖 Analyzing screenplay…"):
-            all_results = get_all_analyses_single(st.session_state["screenplay_text"])
-
-        if all_results:
-            st.success("✅ Analysis complete!")
-            st.session_state["history"][movie_name] = all_results  # Save to history
-
-            for section, content in all_results.items():
-                st.markdown(f"<h3>{section}</h3>", unsafe_allow_html=True)
-                st.markdown(f"<div style='margin-bottom: 1.5rem;'>{clean_markdown(content)}</div>", unsafe_allow_html=True)
-
-            pdf_file = create_pdf_report(all_results)
-            st.download_button(
-                label="📥 Download Report as PDF",
-                data=pdf_file,
-                file_name=f"{movie_name}-report.pdf",
-                mime="application/pdf"
+        # The analysis runs in the background and survives reruns; this session keeps only the job id
+        st.session_state["job_id"] = jobs.submit(
+            partial(
+                run_analysis,
+                screenplay_text=st.session_state["screenplay_text"],
+                index=st.session_state["screenplay_index"],
+                movie_name=movie_name,
+                screenplay_hash=st.session_state["screenplay_hash"],
+                extract_seconds=st.session_state.get("extract_seconds", 0.0),
+                streaming=get_setting("STREAM_SECTIONS", True),
+                speculation_id=st.session_state.get("speculation_id"),
+                draft_hashes=None if visible_hashes is None else set(visible_hashes),
+            ),
+            BRIEF_PROMPTS,
+            label=movie_name,
+        )
+
+    @st.fragment(run_every=1.0)
+    def job_progress(job_id):
+        # Polls the job once a second; a full rerun shows the results when it ends
+        job = jobs.get(job_id)
+        if job is None or job.status not in ACTIVE:
+            st.rerun()
+        snapshot = job.snapshot()
+        if snapshot["status"] == QUEUED:
+            st.info("⏳ Waiting for a free analysis worker…")
+        st.progress(
+            snapshot["done"] / snapshot["total"],
+            text=f"🤖 Analyzing {snapshot['label']}: {snapshot['done']} of {snapshot['total']} sections "
+                 f"({snapshot['elapsed']:.0f}s)",
+        )
+        if st.button("✖️ Cancel analysis"):
+            jobs.cancel(job_id)
+        # Sections appear as they complete (or, when streaming, as tokens arrive)
+        for section, done in snapshot["sections"].items():
+            st.markdown(f"<h3>{section}{'' if done else ' ⏳'}</h3>", unsafe_allow_html=True)
+            text = snapshot["texts"].get(section)
+            if text:
+                st.markdown(f"<div style='margin-bottom: 1.5rem;'>{clean_markdown(text)}</div>", unsafe_allow_html=True)
+            else:
+                st.caption("⏳ Waiting for the model…")
+
+    job = jobs.get(st.session_state.get("job_id"))
+    if job is not None and job.status in ACTIVE:
+        job_progress(job.id)
+    elif job is not None and job.status == CANCELLED:
+        st.warning("✖️ Analysis cancelled.")
+    elif job is not None and job.status == FAILED:
+        st.error(f"❌ Analysis failed: {job.error}")
+    elif job is not None and job.result:
+        all_results, metrics = job.result["results"], job.result["metrics"]
+        st.success("✅ Analysis complete!")
+        if job.result["draft"]:
+            st.caption(format_draft_report(job.result["draft"]))
+        st.caption(format_token_usage(job.result["token_usage"]))
+        conn = get_connection_stats()
+        st.caption(
+            f"🔌 API connections: {conn['reused']} of {conn['requests']} requests "
+            f"reused a pooled connection ({conn['reuse_ratio']:.0%})"
+        )
+
+        for section, content in all_results.items():
+            st.markdown(f"<h3>{section}</h3>", unsafe_allow_html=True)
+            st.markdown(f"<div style='margin-bottom: 1.5rem;'>{clean_markdown(content)}</div>", unsafe_allow_html=True)
+
+        st.download_button(
+            label="📥 Download Report as PDF",
+            data=job.result["pdf"],
+            file_name=f"{job.label}-report.pdf",
+            mime="application/pdf"
+        )
+
+        # Per-stage and per-section timings, tokens and cost; also appended to the metrics file
+        totals = metrics.totals()
+        with st.expander("⏱️ Performance breakdown"):
+            st.caption(
+                f"{totals['seconds']:.1f}s total · {totals['calls']} API calls · "
+                f"{totals['prompt_tokens']:,} prompt / {totals['completion_tokens']:,} completion tokens · "
+                f"~${totals['cost_usd']:.4f} · slowest section: {totals['slowest_section']} · "
+                f"{totals['queued_seconds']:.1f}s waiting for rate limits"
+            )
+            if metrics.speculation:
+                st.caption(format_speculation(metrics.speculation))
+            st.caption(format_scheduler_stats(get_scheduler().snapshot()))
+            tail = get_latency_tracker().snapshot()
+            st.caption(
+                f"🐢 Tail latency: {tail['hedges']} hedged duplicates sent, {tail['hedges_won']} answered first, "
+                f"{tail['deadlines']} deadlines missed"
             )
+            st.dataframe(metrics.breakdown(), use_container_width=True, hide_index=True)
 else:
     st.info("📌 Upload a PDF to begin screenplay analysis.")
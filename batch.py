@@ -0,0 +1,310 @@
+"""
+Headless batch runner: analyze every screenplay PDF in a directory and
+write one report per screenplay plus a summary index, without the UI.
+
+Extraction, LLM analysis and PDF rendering run as a pipeline of worker
+pools joined by bounded queues, so a few screenplays are extracted ahead
+of the analysis workers but hundreds are never held in memory at once.
+Each finished screenplay is appended to a checkpoint in the output
+directory; a rerun skips screenplays whose content was already done
+(under any file name, so renamed files and duplicate submissions are not
+paid for twice) and retries failed ones, including "partial" ones where
+some sections failed. Sections analyzed before a
+crash come back from the response cache.
+
+    python batch.py submissions/ --out reports/
+    python batch.py submissions/ --out reports/ --recursive --analysis-workers 4
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from analysis import analyze_sections, prepare_analysis_input
+from drafts import scene_fingerprints
+from extraction import extract_text, file_hash
+from history import get_history_store
+from metrics import ReportMetrics, export_metrics
+from prompts import DETAILED_MAX_TOKENS, DETAILED_PROMPTS
+from report import clean_markdown, render_report
+from scores import SCORE_FIELDS, SCORE_SECTION, parse_script_score
+from screenplay_index import ScreenplayIndex
+
+CHECKPOINT_FILE = "checkpoint.jsonl"
+INDEX_FILE = "index.csv"
+INDEX_FIELDS = ("file", "status", "report", "seconds", "calls", "prompt_tokens", "completion_tokens",
+                "cost_usd", "failed_sections", "logline", "genre",
+                *(f"score_{field}" for field in SCORE_FIELDS), "error")
+
+_STOP = object()   # end-of-input marker passed down the pipeline
+
+# Logger -> text of the notice Streamlit logs there for a cached resource
+# used outside `streamlit run`
+BARE_MODE_NOTICES = {
+    "streamlit.runtime.scriptrunner_utils.script_run_context": "missing ScriptRunContext",
+}
+
+
+def find_screenplays(directory: str, recursive: bool = False) -> list:
+    """
+    Paths of the PDFs under `directory`, in a stable order.
+    """
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        paths += [os.path.join(root, name) for name in sorted(files) if name.lower().endswith(".pdf")]
+        if not recursive:
+            break
+    return paths
+
+
+class Checkpoint:
+    """
+    Append-only JSONL log of finished screenplays; the last record per
+    file wins. Every record is flushed and synced before the next one.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue   # a line cut off by a crash
+                    self.records[record["file"]] = record
+
+    def done(self, digest: str) -> bool:
+        """
+        Whether a screenplay with this content already has a complete
+        report; failed and partial ones are run again.
+        """
+        with self._lock:
+            return any(r["status"] == "done" and r["digest"] == digest for r in self.records.values())
+
+    def add(self, record: dict):
+        with self._lock:
+            self.records[record["file"]] = record
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def _first_line(text: str, limit: int = 200) -> str:
+    line = next((line.strip(" *#") for line in clean_markdown(text).splitlines() if line.strip()), "")
+    return line[:limit]
+
+
+def write_index(checkpoint: Checkpoint, path: str):
+    """
+    Rewrite the summary index (CSV, one row per screenplay) from the checkpoint.
+    """
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=INDEX_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for name in sorted(checkpoint.records):
+            writer.writerow(checkpoint.records[name])
+    os.replace(tmp, path)
+
+
+class BatchRunner:
+    """
+    Three-stage pipeline over a list of PDFs. Each stage is a pool of
+    threads reading from a bounded queue; a full queue blocks the stage
+    before it, which bounds the texts and results in memory.
+    """
+
+    def __init__(self, directory: str, out: str, extract_workers: int = 2, analysis_workers: int = 3,
+                 render_workers: int = 1, queue_size: int = 4, history: bool = True, log=print):
+        self.directory = directory
+        self.out = out
+        self.workers = {"extract": extract_workers, "analyze": analysis_workers, "render": render_workers}
+        self.queues = {stage: queue.Queue(maxsize=queue_size) for stage in self.workers}
+        self.history = get_history_store() if history else None
+        self.log = log
+        os.makedirs(out, exist_ok=True)
+        self.checkpoint = Checkpoint(os.path.join(out, CHECKPOINT_FILE))
+        self.counts = {"done": 0, "partial": 0, "failed": 0, "skipped": 0}
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def run(self, paths: list) -> dict:
+        self.total = len(paths)
+        started = time.perf_counter()
+        threads = {
+            stage: [threading.Thread(target=self._worker, args=(stage,), name=f"batch-{stage}-{i}", daemon=True)
+                    for i in range(count)]
+            for stage, count in self.workers.items()
+        }
+        for pool in threads.values():
+            for thread in pool:
+                thread.start()
+
+        for path in paths:
+            self.queues["extract"].put({"path": path, "file": os.path.relpath(path, self.directory)})
+        # Close each stage once the one before it has drained
+        for stage, following in (("extract", "analyze"), ("analyze", "render"), ("render", None)):
+            self.queues[stage].put(_STOP)
+            for thread in threads[stage]:
+                thread.join()
+            if following is not None:
+                self.queues[following].put(_STOP)
+
+        write_index(self.checkpoint, os.path.join(self.out, INDEX_FILE))
+        return {**self.counts, "seconds": time.perf_counter() - started}
+
+    def _worker(self, stage: str):
+        inbox = self.queues[stage]
+        step = getattr(self, f"_{stage}")
+        while True:
+            item = inbox.get()
+            if item is _STOP:
+                inbox.put(_STOP)   # let the stage's other workers see it too
+                return
+            try:
+                item = step(item)
+            except Exception as exc:
+                self._finish(item, "failed", error=f"{type(exc).__name__}: {exc}")
+                continue
+            if item is not None and stage != "render":
+                self.queues["analyze" if stage == "extract" else "render"].put(item)
+
+    def _extract(self, item: dict):
+        item["started"] = time.perf_counter()
+        item["digest"] = file_hash(item["path"])
+        if self.checkpoint.done(item["digest"]):
+            self._count("skipped")
+            return None
+        item["metrics"] = ReportMetrics(item["file"])
+        with item["metrics"].stage("extract"):
+            item["text"] = extract_text(item["path"])
+        if not item["text"].strip():
+            raise ValueError("no extractable text (scanned PDF?)")
+        return item
+
+    def _analyze(self, item: dict):
+        metrics, text = item["metrics"], item.pop("text")
+        with metrics.stage("prepare"):
+            index = ScreenplayIndex(text)
+            prompt_text, _ = prepare_analysis_input(text, DETAILED_PROMPTS, metrics=metrics)
+        with metrics.stage("analyze"):
+            item["results"] = analyze_sections(prompt_text, DETAILED_PROMPTS, DETAILED_MAX_TOKENS,
+                                               metrics=metrics, index=index)
+        if self.history is not None:
+            movie = os.path.splitext(os.path.basename(item["path"]))[0]
+            self.history.save(movie, item["digest"], item["results"], scenes=scene_fingerprints(text))
+        return item
+
+    def _render(self, item: dict):
+        metrics, results = item["metrics"], item["results"]
+        report = os.path.splitext(item["file"])[0].replace(os.sep, "__") + "-report.pdf"
+        with metrics.stage("render"):
+            buffer = render_report(results, clean_markdown)
+        tmp = os.path.join(self.out, report + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(buffer.getvalue())
+        os.replace(tmp, os.path.join(self.out, report))
+        export_metrics(metrics)
+        totals = metrics.totals()
+        # Failed sections come back as warning text; such a report is not done
+        failed = sum(1 for text in results.values() if text.startswith("⚠️"))
+        status = "done" if not failed else "partial" if failed < len(results) else "failed"
+        self._finish(
+            item, status,
+            report=report,
+            calls=totals["calls"],
+            prompt_tokens=totals["prompt_tokens"],
+            completion_tokens=totals["completion_tokens"],
+            cost_usd=round(totals["cost_usd"], 6),
+            failed_sections=failed,
+            logline=_first_line(results.get("Logline", "")),
+            genre=_first_line(results.get("Genre", "")),
+            **{f"score_{field}": score for field, score in parse_script_score(results.get(SCORE_SECTION, "")).items()},
+        )
+
+    def _finish(self, item: dict, status: str, **fields):
+        seconds = time.perf_counter() - item.get("started", time.perf_counter())
+        self.checkpoint.add({
+            "file": item["file"], "digest": item.get("digest"), "status": status,
+            "seconds": round(seconds, 2), "finished": time.time(), **fields,
+        })
+        position = self._count(status)
+        detail = fields.get("error") or f"{fields.get('failed_sections', 0)} failed sections"
+        self.log(f"[{position}/{self.total}] {item['file']}: {status} in {seconds:.1f}s ({detail})")
+
+    def _count(self, status: str) -> int:
+        with self._lock:
+            self.counts[status] += 1
+            return sum(self.counts.values())
+
+
+class _MessageFilter(logging.Filter):
+    def __init__(self, text: str):
+        super().__init__()
+        self.text = text
+
+    def filter(self, record) -> bool:
+        return self.text not in record.getMessage()
+
+
+@contextmanager
+def _bare_mode_notices_hidden():
+    """
+    Drop the notices Streamlit logs (they are log records, not warnings)
+    when a cached resource is used outside `streamlit run`, as every
+    shared resource is here. Everything else is still reported.
+    """
+    filters = [(logging.getLogger(name), _MessageFilter(text)) for name, text in BARE_MODE_NOTICES.items()]
+    for logger, message_filter in filters:
+        logger.addFilter(message_filter)
+    try:
+        yield
+    finally:
+        for logger, message_filter in filters:
+            logger.removeFilter(message_filter)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", help="folder of screenplay PDFs")
+    parser.add_argument("--out", default="reports", help="folder for reports, checkpoint and index")
+    parser.add_argument("--recursive", action="store_true", help="include PDFs in subfolders")
+    parser.add_argument("--extract-workers", type=int, default=2)
+    parser.add_argument("--analysis-workers", type=int, default=3, help="screenplays analyzed at once")
+    parser.add_argument("--render-workers", type=int, default=1)
+    parser.add_argument("--queue-size", type=int, default=4, help="screenplays buffered between stages")
+    parser.add_argument("--no-history", action="store_true", help="do not add results to the app's history")
+    args = parser.parse_args()
+
+    directory, out = os.path.abspath(args.directory), os.path.abspath(args.out)
+    # Fonts and the response cache are looked up relative to the app folder
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    paths = find_screenplays(directory, args.recursive)
+    if not paths:
+        sys.exit(f"No PDFs found in {args.directory}")
+    with _bare_mode_notices_hidden():
+        runner = BatchRunner(
+            directory, out,
+            extract_workers=args.extract_workers, analysis_workers=args.analysis_workers,
+            render_workers=args.render_workers, queue_size=args.queue_size, history=not args.no_history,
+        )
+        summary = runner.run(paths)
+    print(f"{summary['done']} done, {summary['partial']} partial, {summary['failed']} failed, "
+          f"{summary['skipped']} already done "
+          f"in {summary['seconds']:.1f}s; index: {os.path.join(args.out, INDEX_FILE)}")
+
+
+if __name__ == "__main__":
+    main()
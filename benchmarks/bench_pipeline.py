@@ -0,0 +1,179 @@
+"""
+Offline end-to-end benchmark: extraction, section analysis and PDF
+rendering against the local mock chat-completions server.
+
+Synthetic screenplay PDFs of several lengths are generated, then `--reports`
+reports are produced with `--concurrency` running at once. Reports per-stage
+wall time (p50/p95/p99), end-to-end latency and throughput.
+
+    python benchmarks/bench_pipeline.py --pages 30 90 150 --reports 12 --concurrency 3
+    python benchmarks/bench_pipeline.py --error-rate 0.05 --tokens-per-second 40
+
+Tail latency with and without hedged requests (same stalls, compare p99):
+
+    python benchmarks/bench_pipeline.py --slow-rate 0.05 --slow-factor 40
+    python benchmarks/bench_pipeline.py --slow-rate 0.05 --slow-factor 40 --hedge
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # fonts are looked up relative to the app folder
+
+import fitz  # noqa: E402  pymupdf
+
+from hedging import get_latency_tracker  # noqa: E402
+from mock_openai_server import add_mock_arguments, start_mock_server  # noqa: E402
+
+STAGES = ("extract", "analyze", "render", "total")
+
+CHARACTERS = ["MAYA", "DANIEL", "ROSE", "OFFICER PIKE", "GRANDPA JOE", "LENA"]
+PLACES = ["KITCHEN", "ROOFTOP", "POLICE STATION", "DINER", "CAR", "HOSPITAL CORRIDOR", "BEACH"]
+LINES = [
+    "We don't have time for this.",
+    "You knew. You knew all along and you said nothing.",
+    "Get in the car. Now.",
+    "I kept the letter. I never opened it.",
+    "Whatever happens tonight, it stays between us.",
+]
+
+
+def make_screenplay_pdf(path: str, pages: int, seed: int = 0):
+    """
+    Write a screenplay-like PDF: scene headings, action and dialogue blocks.
+    """
+    rng = random.Random(seed)
+    doc = fitz.open()
+    scene = 1
+    for page_number in range(1, pages + 1):
+        lines = [f"{page_number}."]
+        while len(lines) < 48:
+            if rng.random() < 0.25:
+                lines += ["", f"{scene}  {rng.choice(['INT.', 'EXT.'])} {rng.choice(PLACES)} - {rng.choice(['DAY', 'NIGHT'])}", ""]
+                scene += 1
+            lines += [f"{rng.choice(CHARACTERS).title()} crosses the room and stops at the window.", ""]
+            lines += [f"                    {rng.choice(CHARACTERS)}", f"          {rng.choice(LINES)}", ""]
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(54, 54, 560, 760), "\n".join(lines[:48]), fontname="cour", fontsize=10)
+    doc.save(path)
+    doc.close()
+
+
+def percentile(samples, q: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return float("nan")
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def run_report(path: str, use_cache: bool) -> dict:
+    from analysis import analyze_sections, prepare_analysis_input
+    from extraction import extract_text
+    from prompts import DETAILED_MAX_TOKENS, DETAILED_PROMPTS
+    from report import render_report
+
+    timings = {}
+    start = time.perf_counter()
+    text = extract_text(path)
+    timings["extract"] = time.perf_counter() - start
+
+    mark = time.perf_counter()
+    prompt_text, _ = prepare_analysis_input(text, DETAILED_PROMPTS, use_cache=use_cache)
+    results = analyze_sections(prompt_text, DETAILED_PROMPTS, DETAILED_MAX_TOKENS, use_cache=use_cache)
+    timings["analyze"] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    render_report(results, str.strip)
+    timings["render"] = time.perf_counter() - mark
+    timings["total"] = time.perf_counter() - start
+    timings["failed_sections"] = sum(1 for v in results.values() if v.startswith("⚠️"))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[30, 90, 150], help="screenplay lengths to generate")
+    parser.add_argument("--reports", type=int, default=12, help="total reports to produce")
+    parser.add_argument("--concurrency", type=int, default=3, help="reports in flight at once")
+    parser.add_argument("--cache", action="store_true", help="use the on-disk response cache")
+    parser.add_argument("--hedge", action="store_true", help="send hedged duplicates of slow requests")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore", DeprecationWarning)
+
+    mock_options = {name: getattr(args, name) for name in
+                    ("ttft", "jitter", "prompt_tokens_per_second", "tokens_per_second",
+                     "completion_ratio", "error_rate", "rate_limit_rate", "retry_after",
+                     "slow_rate", "slow_factor")}
+    server = start_mock_server(**mock_options)
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    os.environ["OPENAI_API_KEY"] = "mock-key"
+    os.environ["HEDGE_REQUESTS"] = "1" if args.hedge else "0"
+    # The mock has no account limits; keep the scheduler from imposing the default ones
+    os.environ.setdefault("OPENAI_RPM", "1000000")
+    os.environ.setdefault("OPENAI_TPM", "1000000000")
+
+    with tempfile.TemporaryDirectory(prefix="rain-check-bench-") as workdir:
+        pdfs = []
+        for i, pages in enumerate(args.pages):
+            path = os.path.join(workdir, f"screenplay-{pages}p.pdf")
+            make_screenplay_pdf(path, pages, seed=i)
+            pdfs.append(path)
+
+        jobs = [pdfs[i % len(pdfs)] for i in range(args.reports)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            runs = list(pool.map(lambda p: run_report(p, args.cache), jobs))
+        wall = time.perf_counter() - started
+
+    summary = {
+        "reports": len(runs),
+        "concurrency": args.concurrency,
+        "wall_seconds": wall,
+        "reports_per_minute": len(runs) / wall * 60,
+        "failed_sections": sum(r["failed_sections"] for r in runs),
+        "hedging": {"enabled": args.hedge, **get_latency_tracker().snapshot()},
+        "mock": {**mock_options, **server.stats.snapshot()},
+        "stages": {
+            stage: {
+                "mean": statistics.mean(r[stage] for r in runs),
+                "p50": percentile([r[stage] for r in runs], 50),
+                "p95": percentile([r[stage] for r in runs], 95),
+                "p99": percentile([r[stage] for r in runs], 99),
+            }
+            for stage in STAGES
+        },
+    }
+    server.shutdown()
+
+    print(f"{summary['reports']} reports, {args.concurrency} concurrent, pages {args.pages}")
+    print(f"{'stage':<10}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}   (seconds)")
+    for stage, values in summary["stages"].items():
+        print(f"{stage:<10}" + "".join(f"{values[k]:>10.3f}" for k in ("mean", "p50", "p95", "p99")))
+    print(f"throughput: {summary['reports_per_minute']:.1f} reports/min over {wall:.1f}s")
+    mock = summary["mock"]
+    print(f"mock server: {mock['requests']} requests, {mock['errors']} errors, {mock['rate_limited']} rate-limited, "
+          f"{mock['prompt_tokens']:,} prompt / {mock['completion_tokens']:,} completion tokens; "
+          f"failed sections: {summary['failed_sections']}")
+    hedging = summary["hedging"]
+    print(f"hedging {'on' if args.hedge else 'off'}: {hedging['hedges']} duplicates sent, "
+          f"{hedging['hedges_won']} answered first, {hedging['deadlines']} deadlines missed")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Per-report PDF rendering time: the original create_pdf_report (fonts parsed
+on every call) against report.render_report (cached font/template).
+
+    python benchmarks/bench_report.py [--reports 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import warnings
+from datetime import datetime, timezone
+from io import BytesIO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # fonts are looked up relative to the app folder
+
+from fpdf import FPDF  # noqa: E402
+
+import report  # noqa: E402
+
+FIXED_DATE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def clean(text):
+    return text.strip()
+
+
+def legacy_report(data):
+    # create_pdf_report as it was before report.py
+    pdf = FPDF()
+    pdf.add_page()
+    if not os.path.isfile("DejaVuSans.ttf") or not os.path.isfile("DejaVuSans-Bold.ttf"):
+        raise FileNotFoundError("Font files not found.")
+    pdf.add_font("DejaVu", "", "DejaVuSans.ttf", uni=True)
+    pdf.add_font("DejaVu", "B", "DejaVuSans-Bold.ttf", uni=True)
+    pdf.set_font("DejaVu", "B", 16)
+    pdf.cell(0, 10, "Screenplay Analysis Report", ln=True, align="C")
+    pdf.ln(10)
+    for section, content in data.items():
+        pdf.set_font("DejaVu", "B", 14)
+        pdf.cell(0, 10, section, ln=True)
+        pdf.ln(2)
+        pdf.set_font("DejaVu", "", 12)
+        pdf.multi_cell(0, 8, clean(content))
+        pdf.ln(10)
+    pdf.set_creation_date(FIXED_DATE)
+    buffer = BytesIO()
+    pdf.output(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def sample_report(paragraphs):
+    text = "The protagonist’s arc is clear, but the second act drags – tighten it. " * 6
+    sections = ["Logline", "Genre", "Top Keywords", "Location Setting", "Synopsis",
+                "Script Score", "Plot Assessment", "Character Profiling", "Box Office Collection"]
+    return {section: "\n\n".join([text] * paragraphs) for section in sections}
+
+
+def timed(fn, data, reports):
+    samples = []
+    for _ in range(reports):
+        start = time.perf_counter()
+        fn(data)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=20, help="reports rendered per variant")
+    parser.add_argument("--paragraphs", type=int, default=1, help="paragraphs per section")
+    args = parser.parse_args()
+    warnings.simplefilter("ignore", DeprecationWarning)  # uni=True, ln=True
+
+    data = sample_report(args.paragraphs)
+
+    # Same bytes once the creation date is pinned
+    original_new_report = report.new_report
+
+    def pinned_new_report():
+        pdf = original_new_report()
+        pdf.set_creation_date(FIXED_DATE)
+        return pdf
+
+    report.new_report = pinned_new_report
+    identical = legacy_report(data).getvalue() == report.render_report(data, clean).getvalue()
+    report.new_report = original_new_report
+
+    before = timed(legacy_report, data, args.reports)
+    after = timed(lambda d: report.render_report(d, clean), data, args.reports)
+
+    print(f"reports per variant : {args.reports}")
+    print(f"byte-identical      : {identical}")
+    print(f"before (ms/report)  : mean {statistics.mean(before) * 1e3:8.1f}  median {statistics.median(before) * 1e3:8.1f}")
+    print(f"after  (ms/report)  : mean {statistics.mean(after) * 1e3:8.1f}  median {statistics.median(after) * 1e3:8.1f}")
+    print(f"saved per report    : {(statistics.median(before) - statistics.median(after)) * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Scene retrieval benchmark: how much smaller the retrieved section prompts
+are than the full text, and how much of the screenplay they still cover.
+
+For every screenplay (the PDFs given, or generated ones of `--pages`) and
+every retrieved section, reports the input tokens with the full text and
+with the excerpt, and the recall of the excerpt: the share of the main
+characters and the most used locations it still mentions.
+
+With `--compare`, each section is also requested both ways and the two
+answers compared: latency, and the recall of the retrieved answer against
+the full-text one (the screenplay's characters and locations named in the
+full-text answer that the retrieved answer names too). Requests go to the
+local mock server unless `--live` is given, which uses the OpenAI key in
+the environment; mock answers are random words, so only the latency is
+meaningful there.
+
+    python benchmarks/bench_retrieval.py --pages 90 150
+    python benchmarks/bench_retrieval.py scripts/*.pdf --compare --live
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from bench_pipeline import make_screenplay_pdf  # noqa: E402
+from mock_openai_server import add_mock_arguments, start_mock_server  # noqa: E402
+
+MAIN_CHARACTERS = 8
+MAIN_LOCATIONS = 5
+
+
+def _mentions(text: str, names) -> set:
+    upper = text.upper()
+    return {name for name in names if name in upper}
+
+
+def measure(path: str, budget: int, compare: bool) -> list:
+    from analysis import call_openai
+    from chunking import count_tokens
+    from extraction import extract_text
+    from normalize import normalize_screenplay
+    from prompts import DETAILED_MAX_TOKENS, DETAILED_PROMPTS, render_prompt
+    from retrieval import SECTION_QUERIES, excerpt
+    from screenplay_index import ScreenplayIndex
+
+    with open(path, "rb") as f:
+        text = extract_text(f.read())
+    index = ScreenplayIndex(text)
+    full = normalize_screenplay(text)
+    full_tokens = count_tokens(full)
+    characters = [name for name, _ in index.dialogue.most_common(MAIN_CHARACTERS)]
+    locations = [location for location, *_ in index.locations(MAIN_LOCATIONS)]
+    entities = set(index.dialogue) | {s["location"] for s in index.scenes if s["location"]}
+
+    rows = []
+    for section in SECTION_QUERIES:
+        started = time.perf_counter()
+        retrieved = excerpt(index, section, budget, normalize=normalize_screenplay)
+        row = {
+            "screenplay": os.path.basename(path),
+            "section": section,
+            "full_tokens": full_tokens,
+            "retrieved_tokens": count_tokens(retrieved),
+            "retrieval_seconds": time.perf_counter() - started,
+            # The structure summary names them all; count only the scenes
+            "character_recall": len(_mentions(retrieved.split("\nExcerpt:", 1)[1], characters)) / max(1, len(characters)),
+            "location_recall": len(_mentions(retrieved.split("\nExcerpt:", 1)[1], locations)) / max(1, len(locations)),
+        }
+        if compare:
+            answers = {}
+            for name, body in (("full", full), ("retrieved", retrieved)):
+                started = time.perf_counter()
+                answers[name] = call_openai(render_prompt(DETAILED_PROMPTS[section], body),
+                                            max_tokens=DETAILED_MAX_TOKENS[section], temperature=0)
+                row[f"{name}_seconds"] = time.perf_counter() - started
+            expected = _mentions(answers["full"], entities)
+            row["answer_recall"] = len(expected & _mentions(answers["retrieved"], entities)) / len(expected) if expected else None
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*", help="screenplay PDFs (default: generated ones)")
+    parser.add_argument("--pages", type=int, nargs="+", default=[90, 150], help="generated screenplay lengths")
+    parser.add_argument("--budget", type=int, help="scene tokens per section (default: RETRIEVAL_TOKENS)")
+    parser.add_argument("--compare", action="store_true", help="request each section with both texts")
+    parser.add_argument("--live", action="store_true", help="compare against the OpenAI API, not the mock")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    from retrieval import RETRIEVAL_TOKENS
+
+    server = None
+    if args.compare and not args.live:
+        server = start_mock_server(**{name: getattr(args, name) for name in
+                                      ("ttft", "jitter", "prompt_tokens_per_second", "tokens_per_second",
+                                       "completion_ratio", "error_rate", "rate_limit_rate", "retry_after")})
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ["OPENAI_API_KEY"] = "mock-key"
+        os.environ.setdefault("OPENAI_RPM", "1000000")
+        os.environ.setdefault("OPENAI_TPM", "1000000000")
+
+    budget = args.budget or RETRIEVAL_TOKENS
+    with tempfile.TemporaryDirectory(prefix="rain-check-bench-") as workdir:
+        pdfs = list(args.pdfs)
+        if not pdfs:
+            for i, pages in enumerate(args.pages):
+                pdfs.append(os.path.join(workdir, f"screenplay-{pages}p.pdf"))
+                make_screenplay_pdf(pdfs[-1], pages, seed=i)
+        rows = [row for path in pdfs for row in measure(path, budget, args.compare)]
+    if server is not None:
+        server.shutdown()
+
+    print(f"scene budget {budget:,} tokens per section")
+    print(f"{'screenplay':<24}{'section':<24}{'full':>9}{'retrieved':>11}{'saved':>7}{'chars':>7}{'locs':>6}{'ms':>7}"
+          + (f"{'full s':>8}{'retr s':>8}{'recall':>8}" if args.compare else ""))
+    for r in rows:
+        line = (f"{r['screenplay'][:23]:<24}{r['section']:<24}{r['full_tokens']:>9,}{r['retrieved_tokens']:>11,}"
+                f"{1 - r['retrieved_tokens'] / r['full_tokens']:>7.0%}{r['character_recall']:>7.0%}"
+                f"{r['location_recall']:>6.0%}{r['retrieval_seconds'] * 1000:>7.1f}")
+        if args.compare:
+            recall = "n/a" if r["answer_recall"] is None else f"{r['answer_recall']:.0%}"
+            line += f"{r['full_seconds']:>8.2f}{r['retrieved_seconds']:>8.2f}{recall:>8}"
+        print(line)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
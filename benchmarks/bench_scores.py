@@ -0,0 +1,89 @@
+"""
+Script score comparison benchmark: how long the history store takes to
+load the score table, and the comparison view to filter, sort and
+summarize it, for slates of `--rows` analyzed screenplays.
+
+Rows are synthetic scores written straight into a temporary history
+store; the parser is timed separately on a typical Script Score section.
+
+    python benchmarks/bench_scores.py --rows 1000 10000 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SAMPLE_SECTION = """**Script Score: 7.4/10**
+
+- **Character Development (8/10):** The leads are layered and change believably.
+- **Plot Construction (7/10):** A tight second act; the ending is rushed.
+- **Dialogue (6.5/10):** Sharp banter, sometimes on the nose.
+- **Originality (7/10):** A familiar premise with a fresh setting.
+- **Emotional Engagement (8/10):** The finale lands.
+- **Theme and Message (7/10):** Clear, if stated twice.
+- **Overall Rating: 7.3/10** – a strong draft that needs a polish pass.
+"""
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per operation (median reported)")
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    from history import HistoryStore
+    from scores import SCORE_FIELDS, parse_script_score
+
+    parse = timed(lambda: parse_script_score(SAMPLE_SECTION), args.repeat * 50)
+    print(f"parse one Script Score section: {parse * 1e6:.0f} µs -> {parse_script_score(SAMPLE_SECTION)}")
+    print(f"{'rows':>9}{'load':>10}{'filter':>10}{'sort':>10}{'pctiles':>10}{'ranks':>10}{'view':>10}   (ms)")
+
+    rng = random.Random(0)
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory(prefix="rain-check-bench-") as workdir:
+            store = HistoryStore(os.path.join(workdir, "history.sqlite3"))
+            store._conn.executemany(
+                f"INSERT INTO scores (content_hash, movie, created, {', '.join(SCORE_FIELDS)}) "
+                f"VALUES (?, ?, ?, {', '.join('?' * len(SCORE_FIELDS))})",
+                [(f"{i:064x}", f"Screenplay {i}", float(i),
+                  *(None if rng.random() < 0.02 else round(rng.uniform(2, 10), 1) for _ in SCORE_FIELDS))
+                 for i in range(rows)],
+            )
+
+            def load():
+                store._scores = None
+                return store.score_table()
+
+            load()   # warm-up: imports numpy
+            load_time = timed(load, max(1, args.repeat // 4))
+            table = store.score_table()
+            results = {
+                "filter": timed(lambda: table.filter({"overall": 7.0, "dialogue": 6.0}, "screenplay 1"), args.repeat),
+                "sort": timed(lambda: table.sort("overall"), args.repeat),
+                "pctiles": timed(lambda: table.percentiles(), args.repeat),
+                "ranks": timed(lambda: table.percentile_ranks("overall"), args.repeat),
+                # What one rerun of the comparison view computes
+                "view": timed(lambda: table.filter({"overall": 7.0}).sort("overall").percentile_records(), args.repeat),
+            }
+        print(f"{rows:>9,}{load_time * 1000:>10.2f}" + "".join(f"{v * 1000:>10.2f}" for v in results.values()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Speculative analysis benchmark: how much sooner the short sections, and
+the whole report, are ready when they start at upload time, for several
+delays between the upload and the "Generate Report" click.
+
+Each run uploads a fresh synthetic screenplay, waits `--think` seconds,
+then requests the report the way app.py does and times, from the click,
+the short sections and the full report. Runs use the local mock server
+and a response cache in a temporary directory.
+
+    python benchmarks/bench_speculation.py --think 0 2 5 --tokens-per-second 60
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_pipeline import make_screenplay_pdf  # noqa: E402
+from mock_openai_server import add_mock_arguments, start_mock_server  # noqa: E402
+
+
+def run(path: str, think: float, speculate: bool) -> dict:
+    from analysis import analyze_sections, prepare_analysis_input
+    from extraction import extract_text
+    from jobs import Job
+    from prompts import DETAILED_MAX_TOKENS, DETAILED_PROMPTS
+    from screenplay_index import ScreenplayIndex
+    from speculation import speculation_savings, speculative_templates, start_speculation
+
+    with open(path, "rb") as f:
+        text = extract_text(f.read())
+    index = ScreenplayIndex(text)
+    os.environ["SPECULATIVE_ANALYSIS"] = "1" if speculate else "0"
+    speculation_id = start_speculation(text, DETAILED_PROMPTS, DETAILED_MAX_TOKENS, index=index)
+    time.sleep(think)
+
+    job = Job(DETAILED_PROMPTS)   # stands in for the report job, for its click time
+    short = set(speculative_templates(DETAILED_PROMPTS))
+    ready = {}
+    started = time.perf_counter()
+    prompt_text, _ = prepare_analysis_input(text, DETAILED_PROMPTS)
+    results = analyze_sections(prompt_text, DETAILED_PROMPTS, DETAILED_MAX_TOKENS, index=index,
+                               on_section=lambda section, _: ready.setdefault(section, time.perf_counter()))
+    total = time.perf_counter() - started
+    saved = speculation_savings(speculation_id, job.created, results)
+    return {
+        "short": max(ready[section] for section in short) - started,
+        "total": total,
+        "saved": max(saved.values(), default=0.0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--think", type=float, nargs="+", default=[0.0, 2.0, 5.0],
+                        help="seconds between upload and click")
+    parser.add_argument("--pages", type=int, default=60)
+    parser.add_argument("--runs", type=int, default=3, help="runs per setting")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    server = start_mock_server(**{name: getattr(args, name) for name in
+                                  ("ttft", "jitter", "prompt_tokens_per_second", "tokens_per_second",
+                                   "completion_ratio", "error_rate", "rate_limit_rate", "retry_after")})
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    os.environ["OPENAI_API_KEY"] = "mock-key"
+    os.environ.setdefault("OPENAI_RPM", "1000000")
+    os.environ.setdefault("OPENAI_TPM", "1000000000")
+
+    print(f"{'think (s)':>10}{'speculative':>13}{'short ready':>13}{'report':>9}{'saved':>8}   (seconds after the click, median)")
+    with tempfile.TemporaryDirectory(prefix="rain-check-bench-") as workdir:
+        os.chdir(workdir)   # a fresh response cache
+        seed = 0
+        for think in args.think:
+            for speculate in (False, True):
+                runs = []
+                for _ in range(args.runs):
+                    path = os.path.join(workdir, f"screenplay-{seed}.pdf")
+                    make_screenplay_pdf(path, args.pages, seed=seed)
+                    seed += 1
+                    runs.append(run(path, think, speculate))
+                print(f"{think:>10.1f}{'on' if speculate else 'off':>13}"
+                      + "".join(f"{statistics.median(r[key] for r in runs):>{width}.2f}"
+                                for key, width in (("short", 13), ("total", 9), ("saved", 8))))
+        os.chdir(ROOT)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
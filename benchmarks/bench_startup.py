@@ -0,0 +1,92 @@
+"""
+Cold-start and rerun benchmark for the Streamlit apps: time until the
+script has rendered the upload widget, with no file uploaded.
+
+Each cold sample runs the app in a fresh Python process (Streamlit itself
+already imported, as it is in a running server), so every module the
+script imports is loaded from scratch. Reruns are measured in the same
+process, the way a widget interaction re-executes the script.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --apps app4.py --cold 10 --reruns 50
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in the child process: one cold run, then `reruns` reruns
+CHILD = """
+import json, sys, time, warnings
+warnings.simplefilter("ignore")
+from streamlit.testing.v1 import AppTest
+
+app, reruns = sys.argv[1], int(sys.argv[2])
+at = AppTest.from_file(app, default_timeout=60)
+at.secrets["OPENAI_API_KEY"] = "bench-key"
+start = time.perf_counter()
+at.run()
+cold = time.perf_counter() - start
+if at.exception or not at.get("file_uploader"):
+    sys.exit(f"{app} did not render the uploader: {at.exception}")
+times = []
+for _ in range(reruns):
+    start = time.perf_counter()
+    at.run()
+    times.append(time.perf_counter() - start)
+heavy = sorted(m for m in ("fitz", "openai", "fpdf", "numpy") if m in sys.modules)
+print(json.dumps({"cold": cold, "reruns": times, "loaded": heavy}))
+"""
+
+
+def percentile(samples, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def measure(app: str, cold: int, reruns: int) -> dict:
+    colds, warm, loaded = [], [], []
+    for i in range(cold):
+        # Reruns are only sampled in the first process; the others measure cold runs
+        out = subprocess.run(
+            [sys.executable, "-c", CHILD, app, str(reruns if i == 0 else 0)],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        colds.append(result["cold"])
+        warm += result["reruns"]
+        loaded = result["loaded"]
+    return {
+        "app": app,
+        "cold_p50": statistics.median(colds),
+        "cold_max": max(colds),
+        "rerun_p50": statistics.median(warm) if warm else float("nan"),
+        "rerun_p95": percentile(warm, 95) if warm else float("nan"),
+        "heavy_modules_loaded": loaded,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--apps", nargs="+", default=["app.py", "app2.py", "app4.py"])
+    parser.add_argument("--cold", type=int, default=5, help="fresh-process runs per app")
+    parser.add_argument("--reruns", type=int, default=20, help="reruns measured per app")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    results = [measure(app, args.cold, args.reruns) for app in args.apps]
+    print(f"{'app':<10}{'cold p50':>10}{'cold max':>10}{'rerun p50':>11}{'rerun p95':>11}   (seconds until the uploader renders)")
+    for r in results:
+        print(f"{r['app']:<10}{r['cold_p50']:>10.3f}{r['cold_max']:>10.3f}{r['rerun_p50']:>11.3f}{r['rerun_p95']:>11.3f}"
+              f"   heavy modules loaded: {', '.join(r['heavy_modules_loaded']) or 'none'}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Local stand-in for the OpenAI chat-completions endpoint, for benchmarking
+the pipeline without spending API credits.
+
+Each request sleeps for a simulated time to first token (prefill scales with
+prompt size), then produces `completion_ratio * max_tokens` tokens at
+`tokens_per_second`. Errors (HTTP 500) and rate limits (HTTP 429 with
+Retry-After) are injected at the configured rates, as are stalls (a
+`slow_factor` times longer time to first token) for tail latency. Streaming (SSE) and
+json_schema response formats are supported.
+
+    python benchmarks/mock_openai_server.py --port 8765 --ttft 0.4 --tokens-per-second 80
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=mock streamlit run app4.py
+"""
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "the hero confronts a choice that tests loyalty while the city burns and "
+    "an old friend returns with a secret that changes everything for the family"
+).split()
+CHARS_PER_TOKEN = 4
+
+DEFAULTS = {
+    "ttft": 0.4,                          # seconds before the first token
+    "jitter": 0.25,                       # +/- fraction applied to every delay
+    "prompt_tokens_per_second": 50_000,   # prefill rate
+    "tokens_per_second": 80.0,            # generation rate
+    "completion_ratio": 0.8,              # share of max_tokens produced
+    "error_rate": 0.0,                    # share of requests answered with 500
+    "rate_limit_rate": 0.0,               # share answered with 429
+    "retry_after": 1.0,                   # Retry-After for 429s, seconds
+    "slow_rate": 0.0,                     # share of requests that stall (tail latency)
+    "slow_factor": 10.0,                  # how many times longer a stalled request's first token takes
+}
+
+
+class MockStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def add(self, **counts):
+        with self.lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {name: getattr(self, name) for name in
+                    ("requests", "errors", "rate_limited", "prompt_tokens", "completion_tokens")}
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _words(count: int, rng: random.Random) -> list:
+    return [rng.choice(WORDS) for _ in range(count)]
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, like the real API
+    server_version = "MockOpenAI/1.0"
+    ids = itertools.count(1)
+
+    def log_message(self, *args):
+        pass
+
+    def _delay(self, seconds: float):
+        jitter = self.server.config["jitter"]
+        time.sleep(max(0.0, seconds * random.uniform(1 - jitter, 1 + jitter)))
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        config, stats = self.server.config, self.server.stats
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+            return
+
+        roll = random.random()
+        if roll < config["rate_limit_rate"]:
+            stats.add(requests=1, rate_limited=1)
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit reached (mock)", "type": "rate_limit_error", "code": "rate_limit_exceeded"}},
+                {"Retry-After": str(config["retry_after"])},
+            )
+            return
+        if roll < config["rate_limit_rate"] + config["error_rate"]:
+            stats.add(requests=1, errors=1)
+            self._send_json(500, {"error": {"message": "Injected server error (mock)", "type": "server_error"}})
+            return
+
+        prompt = "".join(m.get("content") or "" for m in request.get("messages", []))
+        prompt_tokens = _tokens(prompt)
+        max_tokens = request.get("max_tokens") or request.get("max_completion_tokens") or 500
+        completion_tokens = max(1, int(max_tokens * config["completion_ratio"]))
+        rng = random.Random(hash(prompt) ^ completion_tokens)
+        content = self._content(request, completion_tokens, rng)
+        stats.add(requests=1, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+        ttft = config["ttft"] * (config["slow_factor"] if random.random() < config["slow_rate"] else 1)
+        self._delay(ttft + prompt_tokens / config["prompt_tokens_per_second"])
+        meta = {
+            "id": f"chatcmpl-mock-{next(self.ids)}",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "system_fingerprint": "mock",
+        }
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+        if request.get("stream"):
+            try:
+                self._stream(meta, content, usage, request)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client gave up (a lost hedge, a cancelled section)
+                self.close_connection = True
+        else:
+            self._delay(completion_tokens / config["tokens_per_second"])
+            self._send_json(200, {
+                **meta,
+                "object": "chat.completion",
+                "choices": [{"index": 0, "finish_reason": "stop", "logprobs": None,
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": usage,
+            })
+
+    def _content(self, request: dict, completion_tokens: int, rng: random.Random) -> str:
+        response_format = request.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            fields = response_format["json_schema"]["schema"].get("required", [])
+            per_field = max(1, completion_tokens // max(1, len(fields)))
+            return json.dumps({field: " ".join(_words(per_field, rng)) for field in fields})
+        return " ".join(_words(completion_tokens, rng))
+
+    def _stream(self, meta: dict, content: str, usage: dict, request: dict):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send(payload):
+            data = f"data: {payload}\n\n".encode()
+            self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        per_token = 1 / self.server.config["tokens_per_second"]
+        for word in content.split(" "):
+            self._delay(per_token)
+            send(json.dumps({**meta, "object": "chat.completion.chunk", "choices": [
+                {"index": 0, "delta": {"role": "assistant", "content": word + " "}, "finish_reason": None}]}))
+        final = {**meta, "object": "chat.completion.chunk",
+                 "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        if (request.get("stream_options") or {}).get("include_usage"):
+            final["usage"] = usage
+        send(json.dumps(final))
+        send("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def start_mock_server(host: str = "127.0.0.1", port: int = 0, **config) -> ThreadingHTTPServer:
+    """
+    Start the mock server on a daemon thread. Keyword arguments override
+    DEFAULTS. The base URL for the OpenAI client is `server.base_url`;
+    request counters are in `server.stats`.
+    """
+    unknown = set(config) - set(DEFAULTS)
+    if unknown:
+        raise TypeError(f"Unknown mock server options: {sorted(unknown)}")
+    server = ThreadingHTTPServer((host, port), MockHandler)
+    server.daemon_threads = True
+    server.config = {**DEFAULTS, **config}
+    server.stats = MockStats()
+    server.base_url = f"http://{host}:{server.server_address[1]}/v1"
+    threading.Thread(target=server.serve_forever, name="mock-openai", daemon=True).start()
+    return server
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser):
+    for name, default in DEFAULTS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=float, default=default, dest=name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_mock_arguments(parser)
+    args = vars(parser.parse_args())
+    host, port = args.pop("host"), args.pop("port")
+
+    server = start_mock_server(host, port, **args)
+    print(f"Mock OpenAI server listening on {server.base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(json.dumps(server.stats.snapshot()))
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import re
+import zlib
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # optional; fall back to a character-based estimate
+    tiktoken = None
+
+# Scene headings ("INT. KITCHEN - NIGHT", "EXT./INT. CAR", "I/E ...", optionally
+# preceded by a scene number) mark the boundaries we prefer to split at.
+SCENE_HEADING = re.compile(
+    r"^[ \t]*(?:\d+[A-Z]?\.?[ \t]+)?(?:INT\.?/EXT\.?|EXT\.?/INT\.?|I/E\.?|INT\.|EXT\.)",
+    re.MULTILINE,
+)
+
+CHARS_PER_TOKEN = 4  # rough average for English prose when tiktoken is missing
+ANCHOR_EVERY = 8     # with anchored chunking, about one scene in 8 may end a chunk early
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """
+    Number of tokens `text` costs as model input (estimated when tiktoken
+    is not installed).
+    """
+    if tiktoken is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(_encoding(model).encode(text, disallowed_special=()))
+
+
+def split_scenes(text: str) -> list:
+    """
+    Split screenplay text at scene headings. Text before the first heading
+    (title page, cast list) becomes its own leading piece.
+    """
+    starts = [m.start() for m in SCENE_HEADING.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    bounds = zip(starts, starts[1:] + [len(text)])
+    return [text[a:b] for a, b in bounds if text[a:b].strip()]
+
+
+def _split_oversized(scene: str, max_tokens: int, model: str):
+    """
+    Break a scene longer than `max_tokens` at line boundaries (or hard-split
+    a single overlong line).
+    """
+    if count_tokens(scene, model) <= max_tokens:
+        yield scene
+        return
+    piece, piece_tokens = [], 0
+    for line in scene.splitlines(keepends=True):
+        n = count_tokens(line, model)
+        if n > max_tokens:
+            width = max_tokens * CHARS_PER_TOKEN
+            parts = [line[i:i + width] for i in range(0, len(line), width)]
+        else:
+            parts = [line]
+        for part in parts:
+            n = count_tokens(part, model)
+            if piece and piece_tokens + n > max_tokens:
+                yield "".join(piece)
+                piece, piece_tokens = [], 0
+            piece.append(part)
+            piece_tokens += n
+    if piece:
+        yield "".join(piece)
+
+
+def _is_anchor(piece: str) -> bool:
+    return zlib.crc32(piece.encode("utf-8")) % ANCHOR_EVERY == 0
+
+
+def chunk_scenes(text: str, chunk_tokens: int, overlap_tokens: int = 0, model: str = "gpt-4o-mini",
+                 anchored: bool = False) -> list:
+    """
+    Group consecutive scenes into chunks of at most about `chunk_tokens`.
+    Each chunk after the first starts with the trailing scenes of the
+    previous one, up to `overlap_tokens`, so events spanning a boundary
+    are seen whole by at least one chunk.
+
+    With `anchored`, a chunk that is at least half full also ends after an
+    anchor scene (chosen by content hash). Boundaries then depend on the
+    scenes themselves rather than on everything before them, so an edit
+    to one scene changes only the chunks around it, and the rest of a
+    revised draft hits the response cache.
+    """
+    if chunk_tokens <= 0:
+        raise ValueError("chunk_tokens must be positive")
+    if not 0 <= overlap_tokens < chunk_tokens:
+        raise ValueError("overlap_tokens must be in [0, chunk_tokens)")
+
+    chunks = []
+    current, current_tokens = [], 0   # current: list of (piece, tokens)
+    fresh = False                     # current holds more than the carried overlap
+
+    def close():
+        chunks.append("".join(p for p, _ in current))
+        carry, carry_tokens = [], 0
+        for prev, prev_tokens in reversed(current):
+            if carry_tokens + prev_tokens > overlap_tokens:
+                break
+            carry.insert(0, (prev, prev_tokens))
+            carry_tokens += prev_tokens
+        return carry, carry_tokens
+
+    for scene in split_scenes(text):
+        for piece in _split_oversized(scene, chunk_tokens, model):
+            n = count_tokens(piece, model)
+            if current and current_tokens + n > chunk_tokens:
+                current, current_tokens = close()
+            current.append((piece, n))
+            current_tokens += n
+            fresh = True
+            if anchored and current_tokens >= chunk_tokens // 2 and _is_anchor(piece):
+                current, current_tokens = close()
+                fresh = False
+    if fresh:
+        chunks.append("".join(p for p, _ in current))
+    return chunks
@@ -0,0 +1,95 @@
+import hashlib
+import re
+from difflib import SequenceMatcher
+
+from chunking import split_scenes
+from normalize import normalize_screenplay
+from section_executor import is_complete
+
+# Share of the screenplay (by characters of changed scenes) a section's
+# output tolerates before it is recomputed. Broad sections survive small
+# revisions; sections that summarize the story closely do not. Sections
+# not listed (including the locally computed ones) are always recomputed.
+SECTION_TOLERANCE = {
+    "Logline": 0.10,
+    "Genre": 0.15,
+    "Box Office Collection": 0.10,
+    "Script Score": 0.05,
+    "Character Profiling": 0.03,
+    "Synopsis": 0.02,
+    "Plot Assessment": 0.02,
+}
+
+_SPACE = re.compile(r"\s+")
+
+
+def scene_fingerprints(text: str) -> list:
+    """
+    One `[hash, characters]` pair per scene of the normalized screenplay.
+    Whitespace differences do not change a scene's hash.
+    """
+    fingerprints = []
+    for scene in split_scenes(normalize_screenplay(text)):
+        flat = _SPACE.sub(" ", scene).strip()
+        digest = hashlib.blake2b(flat.encode("utf-8"), digest_size=8).hexdigest()
+        fingerprints.append([digest, len(flat)])
+    return fingerprints
+
+
+def diff_drafts(old: list, new: list) -> dict:
+    """
+    Compare two drafts' scene fingerprints. Returns the number of scenes in
+    the new draft, the indices of its added or rewritten scenes, the number
+    of removed scenes, and `changed_share`: characters in changed scenes
+    (both drafts) over the size of the larger draft.
+    """
+    matcher = SequenceMatcher(None, [h for h, _ in old], [h for h, _ in new], autojunk=False)
+    changed, unmatched_old, changed_chars = [], 0, 0
+    for op, a0, a1, b0, b1 in matcher.get_opcodes():
+        if op == "equal":
+            continue
+        changed.extend(range(b0, b1))
+        unmatched_old += a1 - a0
+        changed_chars += sum(n for _, n in old[a0:a1]) + sum(n for _, n in new[b0:b1])
+    # A rewritten scene shows up as one old and one new unmatched scene
+    removed = max(unmatched_old - len(changed), 0)
+    total = max(sum(n for _, n in old), sum(n for _, n in new), 1)
+    return {
+        "scenes": len(new),
+        "changed_scenes": changed,
+        "removed_scenes": removed,
+        "changed_share": min(changed_chars / total, 1.0),
+    }
+
+
+def reusable_sections(diff: dict, previous: dict, drift: dict, sections) -> dict:
+    """
+    Sections of the previous analysis that can be kept for the new draft,
+    as section -> (text, new drift). A section's drift is the change
+    accumulated since its text was last computed, so a run of small edits
+    cannot keep an old answer forever. Failed, cut-off and shortened
+    answers are never kept.
+    """
+    reuse = {}
+    for section in sections:
+        text = previous.get(section)
+        if text is None or not is_complete(text):
+            continue
+        accumulated = drift.get(section, 0.0) + diff["changed_share"]
+        if accumulated <= SECTION_TOLERANCE.get(section, 0.0):
+            reuse[section] = (text, accumulated)
+    return reuse
+
+
+def format_draft_report(report: dict) -> str:
+    """
+    One-line summary of an incremental re-analysis for the UI.
+    """
+    changed = len(report["changed_scenes"])
+    line = (
+        f"📝 Compared with the draft analyzed {report['previous']}: {changed} of {report['scenes']} scenes "
+        f"added or changed, {report['removed_scenes']} removed ({report['changed_share']:.1%} of the text)"
+    )
+    if report["reused"]:
+        line += f" · reused: {', '.join(report['reused'])}"
+    return line + f" · recomputed: {', '.join(report['recomputed']) or 'none'}"
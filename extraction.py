@@ -0,0 +1,146 @@
+import hashlib
+import multiprocessing
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import streamlit as st
+
+from pdf_pages import extract_page_range, open_pdf
+
+# Below this many pages a process pool costs more than it saves
+PARALLEL_MIN_PAGES = 48
+# Serial by default: PyMuPDF reads a 150-page screenplay in about 0.2 s,
+# while the first pooled extraction waits seconds for spawned workers to
+# start. EXTRACTION_WORKERS in secrets opts into the pool.
+DEFAULT_WORKERS = 1
+HASH_CHUNK_BYTES = 1024 * 1024
+# Memory budget for extracted texts kept across sessions
+DEFAULT_TEXT_CACHE_BYTES = 256 * 1024 * 1024
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _process_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Process pool shared by all extractions, resized if `workers` changes.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # spawn: forking the multi-threaded Streamlit server is unsafe
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def _page_ranges(page_count: int, workers: int) -> list:
+    step = -(-page_count // workers)  # ceil division
+    return [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+
+
+def iter_page_text(source, workers: int = 1, min_parallel_pages: int = PARALLEL_MIN_PAGES):
+    """
+    Yield the text of each page in order.
+
+    With `workers` > 1 and enough pages, page ranges are extracted in a
+    process pool; pages are yielded as soon as their range is done, so a
+    consumer can start on the first pages while later ones are parsed.
+    """
+    with open_pdf(source) as doc:
+        page_count = doc.page_count
+        if workers <= 1 or page_count < min_parallel_pages:
+            for page in doc:
+                yield page.get_text()
+            return
+
+    pool = _process_pool(workers)
+    futures = [pool.submit(extract_page_range, source, start, stop) for start, stop in _page_ranges(page_count, workers)]
+    try:
+        for future in futures:
+            yield from future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def extract_text(source, separator: str = "", workers: int = None, min_parallel_pages: int = PARALLEL_MIN_PAGES) -> str:
+    """
+    Extract the text of every page of a PDF (path or bytes) and join the
+    pages with `separator`. Pages are collected in a list and joined once.
+    """
+    if workers is None:
+        workers = DEFAULT_WORKERS
+    return separator.join(iter_page_text(source, workers, min_parallel_pages))
+
+
+def content_hash(data: bytes) -> str:
+    """
+    SHA-256 of the uploaded PDF bytes; identifies an upload regardless of
+    its file name.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path: str) -> str:
+    """
+    content_hash() of a PDF on disk, read in fixed-size blocks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class TextCache:
+    """
+    In-memory LRU of extracted texts keyed by upload content hash, bounded
+    by the total memory size of the stored strings.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_TEXT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (text, size)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, text: str):
+        size = sys.getsizeof(text)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+            self._entries[key] = (text, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= evicted
+
+
+@st.cache_resource(show_spinner=False)
+def get_text_cache(max_bytes: int = DEFAULT_TEXT_CACHE_BYTES) -> TextCache:
+    """
+    Process-wide text cache shared by every session.
+    """
+    return TextCache(max_bytes)
+
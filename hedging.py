@@ -0,0 +1,184 @@
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import streamlit as st
+
+# Attempts (primary, hedge, fallback) running at once across all sessions
+MAX_ATTEMPTS_IN_FLIGHT = 32
+LATENCY_WINDOW = 200   # recent latencies kept per request shape
+ADMISSION_POLL = 0.1   # seconds between checks while the primary waits for the rate limiter
+
+
+class DeadlineExceeded(Exception):
+    """
+    No attempt finished before the section's deadline.
+    """
+
+
+class AttemptAbandoned(Exception):
+    """
+    Raised inside an attempt that lost the race or ran past the deadline.
+    """
+
+
+class StopEvent(threading.Event):
+    """
+    Set when an attempt should give up. Callbacks registered with
+    on_set() run once it is set, so an attempt blocked on a slow response
+    can have that response closed instead of waiting for its next step.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._callbacks = []
+        self._callbacks_lock = threading.Lock()
+
+    def on_set(self, callback):
+        with self._callbacks_lock:
+            if not self.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def set(self):
+        with self._callbacks_lock:
+            super().set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass   # closing an already finished response
+
+
+class LatencyTracker:
+    """
+    Recent completion latencies per request shape (model, max_tokens), used
+    to pick the delay after which a duplicate request is sent.
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self.window = window
+        self.hedges = 0       # duplicates sent
+        self.hedges_won = 0   # duplicates that answered first
+        self.deadlines = 0    # requests that missed their deadline
+
+    def record(self, key, seconds: float):
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, key, q: float, min_samples: int):
+        """
+        The `q`th percentile latency for `key`, or None with too few samples.
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q / 100 * len(samples)))]
+
+    def count(self, **events):
+        with self._lock:
+            for name, n in events.items():
+                setattr(self, name, getattr(self, name) + n)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"hedges": self.hedges, "hedges_won": self.hedges_won, "deadlines": self.deadlines}
+
+
+@st.cache_resource(show_spinner=False)
+def get_latency_tracker() -> LatencyTracker:
+    return LatencyTracker()
+
+
+@st.cache_resource(show_spinner=False)
+def _attempt_pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=MAX_ATTEMPTS_IN_FLIGHT, thread_name_prefix="attempt")
+
+
+def hedged(attempt, key, hedge_after: float = None, deadline: float = None):
+    """
+    Run `attempt(stop, on_admitted)` and return its result. If it has not
+    finished `hedge_after` seconds after it was sent, an identical attempt
+    is started and whichever finishes first wins; `stop` (a StopEvent) is
+    then set so the other gives up, closing its response if it registered
+    that. Raises DeadlineExceeded once `deadline` seconds pass, or the
+    first error when every attempt failed. Both clocks run from when the
+    rate limiter admits the primary (it calls `on_admitted`), so time
+    spent queued for the limits neither triggers a hedge nor counts against
+    the deadline; time spent waiting for a free attempt thread does.
+    Attempts run with a copy of the caller's context, so their token usage
+    is charged to its section.
+    """
+    tracker = get_latency_tracker()
+    pool = _attempt_pool()
+    stop = StopEvent()
+    sent = []      # admission time of each attempt
+    running = []   # when the primary got an attempt thread
+
+    def timed():
+        running.append(time.monotonic())
+        if stop.is_set():
+            raise AttemptAbandoned("no longer needed when a thread was free")
+        began = []
+
+        def admitted():
+            began.append(time.monotonic())
+            sent.append(began[0])
+
+        result = attempt(stop, admitted)
+        tracker.record(key, time.monotonic() - began[0])
+        return result
+
+    def launch():
+        return pool.submit(contextvars.copy_context().run, timed)
+
+    launched = time.monotonic()
+    primary = launch()
+    pending, error, hedge = {primary}, None, None
+    try:
+        while pending:
+            if not sent and not primary.done():
+                if not running and deadline is not None and time.monotonic() - launched >= deadline:
+                    tracker.count(deadlines=1)
+                    raise DeadlineExceeded(f"no free attempt thread within the {deadline:.0f}s deadline")
+                # Waiting for a thread (counted) or for admission (not counted)
+                wait(pending, ADMISSION_POLL, return_when=FIRST_COMPLETED)
+                continue
+            start = sent[0] if sent else time.monotonic()
+            if running:
+                start -= running[0] - launched   # time spent waiting for a thread
+            limits = []
+            if deadline is not None:
+                limits.append(start + deadline)
+            if hedge is None and hedge_after is not None:
+                limits.append(start + hedge_after)
+            timeout = max(0.0, min(limits) - time.monotonic()) if limits else None
+            done, pending = wait(pending, timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        tracker.count(hedges_won=1)
+                    return future.result()
+                error = error or future.exception()
+            if not pending:
+                break
+            elapsed = time.monotonic() - start
+            if deadline is not None and elapsed >= deadline:
+                tracker.count(deadlines=1)
+                raise DeadlineExceeded(f"missed the {deadline:.0f}s deadline")
+            if hedge is None and hedge_after is not None and elapsed >= hedge_after:
+                hedge = launch()
+                pending.add(hedge)
+                tracker.count(hedges=1)
+        raise error
+    finally:
+        stop.set()
+        for future in pending:
+            future.cancel()   # attempts still waiting for a thread never start
@@ -0,0 +1,283 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import streamlit as st
+
+from extraction import TextCache
+from scores import SCORE_FIELDS, SCORE_SECTION, ScoreTable, parse_script_score
+
+DEFAULT_HISTORY_PATH = os.path.join(".cache", "history.sqlite3")
+DEFAULT_MAX_ENTRIES = 500                # past analyses kept on disk
+DEFAULT_MEMORY_BYTES = 32 * 1024 * 1024  # decompressed sections kept in memory
+COMPRESSION_LEVEL = 6
+# Whether every visitor sees every stored analysis; off, a session sees
+# only the screenplays it uploaded (see the apps)
+SHARED_HISTORY = False
+
+
+def _among(hashes) -> tuple:
+    # WHERE clauses and parameters limiting a query to the given content hashes
+    if hashes is None:
+        return [], []
+    hashes = list(hashes)
+    return [f"content_hash IN ({', '.join('?' * len(hashes))})" if hashes else "0"], hashes
+
+
+class HistoryStore:
+    """
+    Persistent SQLite store of past analyses.
+
+    Each analysis is indexed by screenplay content hash, movie name and
+    timestamp; its sections are stored as separate zlib-compressed blobs so
+    the history list never touches them and a section is only read (and
+    decompressed) when it is displayed. Decompressed sections are kept in
+    a byte-bounded in-memory LRU. Beyond `max_entries` analyses, the
+    oldest are deleted. One analysis is kept per (content hash, movie).
+
+    For incremental re-analysis (drafts.py), an analysis can also carry
+    the draft's scene fingerprints and, per section, the change drift
+    accumulated since the section was last computed.
+
+    The numbers of each analysis's Script Score section are kept in a
+    separate table that eviction does not touch, so the score comparison
+    covers every screenplay ever analyzed, not just the retained ones.
+    """
+
+    def __init__(self, path: str = DEFAULT_HISTORY_PATH,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 memory_bytes: int = DEFAULT_MEMORY_BYTES):
+        self.path = path
+        self.max_entries = max_entries
+        self.memory = TextCache(memory_bytes)   # (analysis id, section) -> text
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS analyses (
+                id           INTEGER PRIMARY KEY AUTOINCREMENT,
+                content_hash TEXT NOT NULL,
+                movie        TEXT NOT NULL,
+                created      REAL NOT NULL,
+                size         INTEGER NOT NULL,
+                scenes       BLOB,
+                UNIQUE (content_hash, movie)
+            );
+            CREATE INDEX IF NOT EXISTS analyses_movie ON analyses (movie);
+            CREATE INDEX IF NOT EXISTS analyses_created ON analyses (created);
+            CREATE TABLE IF NOT EXISTS sections (
+                analysis_id INTEGER NOT NULL REFERENCES analyses (id) ON DELETE CASCADE,
+                position    INTEGER NOT NULL,
+                name        TEXT NOT NULL,
+                body        BLOB NOT NULL,
+                drift       REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (analysis_id, name)
+            );
+            CREATE TABLE IF NOT EXISTS scores (
+                content_hash TEXT NOT NULL,
+                movie        TEXT NOT NULL,
+                created      REAL NOT NULL,
+                %s,
+                PRIMARY KEY (content_hash, movie)
+            );
+            """ % ",\n                ".join(f"{field} REAL" for field in SCORE_FIELDS)
+        )
+        # Stores created before scene fingerprints were recorded
+        for table, column, ddl in (("analyses", "scenes", "BLOB"), ("sections", "drift", "REAL NOT NULL DEFAULT 0")):
+            columns = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+        self._scores = None   # ScoreTable, reloaded after a change
+        self._backfill_scores()
+
+    def save(self, movie: str, content_hash: str, results: dict, scenes: list = None, drift: dict = None) -> int:
+        """
+        Store `results` (section -> text) for a screenplay, replacing an
+        earlier analysis of the same content under the same name. `scenes`
+        are the draft's scene fingerprints and `drift` maps reused sections
+        to their accumulated change. Returns the analysis id.
+        """
+        drift = drift or {}
+        blobs = [
+            (position, section, zlib.compress(text.encode("utf-8"), COMPRESSION_LEVEL), drift.get(section, 0.0))
+            for position, (section, text) in enumerate(results.items())
+        ]
+        size = sum(len(blob) for _, _, blob, _ in blobs)
+        scenes_blob = zlib.compress(json.dumps(scenes).encode("utf-8")) if scenes is not None else None
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(
+                    "DELETE FROM analyses WHERE content_hash = ? AND movie = ?", (content_hash, movie)
+                )
+                analysis_id = self._conn.execute(
+                    "INSERT INTO analyses (content_hash, movie, created, size, scenes) VALUES (?, ?, ?, ?, ?)",
+                    (content_hash, movie, time.time(), size, scenes_blob),
+                ).lastrowid
+                self._conn.executemany(
+                    "INSERT INTO sections (analysis_id, position, name, body, drift) VALUES (?, ?, ?, ?, ?)",
+                    [(analysis_id, *blob) for blob in blobs],
+                )
+                self._save_scores(content_hash, movie, results.get(SCORE_SECTION, ""))
+                self._evict()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        for section, text in results.items():
+            self.memory.put((analysis_id, section), text)
+        return analysis_id
+
+    def recent(self, movie: str = None, content_hash: str = None, limit: int = 200, among=None) -> list:
+        """
+        Newest-first metadata of stored analyses (no section texts), as
+        dicts with id, movie, content_hash, created and size. With `among`,
+        only analyses of those content hashes.
+        """
+        query = "SELECT id, movie, content_hash, created, size FROM analyses"
+        clauses, params = _among(among)
+        if movie is not None:
+            clauses.append("movie = ?")
+            params.append(movie)
+        if content_hash is not None:
+            clauses.append("content_hash = ?")
+            params.append(content_hash)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY created DESC LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(query, (*params, limit)).fetchall()
+        return [
+            {"id": row[0], "movie": row[1], "content_hash": row[2], "created": row[3], "size": row[4]}
+            for row in rows
+        ]
+
+    def previous_draft(self, movie: str, content_hash: str, among=None):
+        """
+        The latest analysis of `movie` made for different content that has
+        scene fingerprints, as a dict with id, created and scenes; or None.
+        With `among`, only analyses of those content hashes are considered.
+        """
+        clauses, params = _among(among)
+        clauses += ["movie = ?", "content_hash != ?", "scenes IS NOT NULL"]
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT id, created, scenes FROM analyses WHERE {' AND '.join(clauses)} "
+                "ORDER BY created DESC LIMIT 1",
+                (*params, movie, content_hash),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"id": row[0], "created": row[1], "scenes": json.loads(zlib.decompress(row[2]))}
+
+    def drift(self, analysis_id: int) -> dict:
+        """
+        Section -> change accumulated since the section was last computed.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, drift FROM sections WHERE analysis_id = ?", (analysis_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def sections(self, analysis_id: int) -> list:
+        """
+        Section names of an analysis, in their original order.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name FROM sections WHERE analysis_id = ? ORDER BY position", (analysis_id,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def section(self, analysis_id: int, name: str):
+        """
+        Text of one section, or None if the analysis or section is gone.
+        """
+        text = self.memory.get((analysis_id, name))
+        if text is not None:
+            return text
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body FROM sections WHERE analysis_id = ? AND name = ?", (analysis_id, name)
+            ).fetchone()
+        if row is None:
+            return None
+        text = zlib.decompress(row[0]).decode("utf-8")
+        self.memory.put((analysis_id, name), text)
+        return text
+
+    def load(self, analysis_id: int) -> dict:
+        """
+        All sections of an analysis as section -> text.
+        """
+        return {name: self.section(analysis_id, name) for name in self.sections(analysis_id)}
+
+    def score_table(self) -> ScoreTable:
+        """
+        Script scores of every analyzed screenplay as a columnar table,
+        read from disk once and again only after a save.
+        """
+        with self._lock:
+            if self._scores is None:
+                rows = self._conn.execute(
+                    f"SELECT movie, content_hash, created, {', '.join(SCORE_FIELDS)} FROM scores ORDER BY created"
+                ).fetchall()
+                self._scores = ScoreTable.from_rows(rows)
+            return self._scores
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM analyses")
+            self._conn.execute("DELETE FROM scores")
+            self._scores = None
+        self.memory = TextCache(self.memory.max_bytes)
+
+    def _save_scores(self, content_hash: str, movie: str, text: str, created: float = None):
+        # A failed or unparseable section keeps the screenplay's earlier scores
+        scores = parse_script_score(text)
+        if not scores:
+            return
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO scores (content_hash, movie, created, {', '.join(SCORE_FIELDS)}) "
+            f"VALUES (?, ?, ?, {', '.join('?' * len(SCORE_FIELDS))})",
+            (content_hash, movie, created or time.time(), *(scores.get(field) for field in SCORE_FIELDS)),
+        )
+        self._scores = None
+
+    def _backfill_scores(self):
+        # Analyses stored before scores were recorded
+        rows = self._conn.execute(
+            "SELECT a.content_hash, a.movie, a.created, s.body FROM analyses a "
+            "JOIN sections s ON s.analysis_id = a.id AND s.name = ? "
+            "WHERE NOT EXISTS (SELECT 1 FROM scores c WHERE c.content_hash = a.content_hash AND c.movie = a.movie)",
+            (SCORE_SECTION,),
+        ).fetchall()
+        for content_hash, movie, created, body in rows:
+            self._save_scores(content_hash, movie, zlib.decompress(body).decode("utf-8"), created)
+
+    def _evict(self):
+        self._conn.execute(
+            "DELETE FROM analyses WHERE id NOT IN (SELECT id FROM analyses ORDER BY created DESC LIMIT ?)",
+            (self.max_entries,),
+        )
+
+
+@st.cache_resource(show_spinner=False)
+def get_history_store(path: str = DEFAULT_HISTORY_PATH,
+                      max_entries: int = DEFAULT_MAX_ENTRIES,
+                      memory_bytes: int = DEFAULT_MEMORY_BYTES) -> HistoryStore:
+    """
+    Process-wide history store, opened once and shared by all sessions.
+    """
+    return HistoryStore(path, max_entries, memory_bytes)
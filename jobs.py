@@ -0,0 +1,147 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from settings import get_setting
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_WORKERS = 2       # reports analyzed at once across all sessions
+FINISHED_JOBS_KEPT = 100      # finished jobs kept for polling before they are dropped
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+ACTIVE = (QUEUED, RUNNING)
+
+
+class Job:
+    """
+    One background analysis. The job function reports per-section progress
+    through `update`, and the UI reads it with `snapshot` on every rerun.
+    """
+
+    def __init__(self, sections, label: str = ""):
+        self.id = uuid.uuid4().hex
+        self.label = label
+        self.sections = list(sections)
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_event = threading.Event()
+        self._texts = {}
+        self._done = {}   # section -> time.time() it completed
+        self._lock = threading.Lock()
+
+    def update(self, section: str, text: str, done: bool = True):
+        """
+        Record a section's text so far; `done` marks it complete.
+        """
+        with self._lock:
+            self._texts[section] = text
+            if done:
+                self._done.setdefault(section, time.time())
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            texts = dict(self._texts)
+            done = dict(self._done)
+        end = self.finished or time.time()
+        return {
+            "id": self.id,
+            "label": self.label,
+            "status": self.status,
+            "sections": {section: section in done for section in self.sections},
+            "done": len(done),
+            "total": len(self.sections),
+            "texts": texts,
+            "finished_at": done,
+            "error": self.error,
+            "elapsed": end - (self.started or end),
+        }
+
+
+class JobRunner:
+    """
+    Process-wide pool that runs analysis jobs outside the Streamlit script
+    run, so reruns (widget changes, history browsing) neither block nor
+    abandon them. Jobs are looked up by id from any session.
+    """
+
+    def __init__(self, workers: int = DEFAULT_JOB_WORKERS, keep: int = FINISHED_JOBS_KEPT):
+        self.workers = workers
+        self.keep = keep
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, fn, sections, label: str = "") -> str:
+        """
+        Queue `fn(job)`; its return value becomes `job.result`. Returns the job id.
+        """
+        job = Job(sections, label)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._pool.submit(self._run, job, fn)
+        return job.id
+
+    def get(self, job_id: str):
+        if job_id is None:
+            return None
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str):
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+
+    def active(self) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.status in ACTIVE)
+
+    def _run(self, job: Job, fn):
+        if job.cancelled:
+            job.status, job.finished = CANCELLED, time.time()
+            return
+        job.status, job.started = RUNNING, time.time()
+        try:
+            job.result = fn(job)
+            job.status = CANCELLED if job.cancelled else DONE
+        except Exception as exc:
+            logger.exception("Job %s (%s) failed", job.id, job.label)
+            job.error = f"{type(exc).__name__}: {exc}"
+            job.status = FAILED
+        finally:
+            job.finished = time.time()
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status not in ACTIVE]
+        for job_id in finished[:max(len(finished) - self.keep, 0)]:
+            del self._jobs[job_id]
+
+
+@st.cache_resource(show_spinner=False)
+def _job_runner(workers: int) -> JobRunner:
+    return JobRunner(workers)
+
+
+def get_job_runner() -> JobRunner:
+    """
+    The job runner shared by every session, sized by JOB_WORKERS in secrets.
+    """
+    return _job_runner(int(get_setting("JOB_WORKERS", DEFAULT_JOB_WORKERS)))
@@ -0,0 +1,289 @@
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from settings import get_setting
+
+# USD per 1M tokens (input, output); unknown models are costed at zero
+PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+}
+
+METRICS_PATH = os.path.join("logs", "metrics.jsonl")
+PROMETHEUS_PATH = os.path.join("logs", "rain_check.prom")
+METRICS_FORMAT = "jsonl"   # "jsonl", "prometheus", "both" or "off"
+
+# The section record API calls on this thread are charged to
+_current_section = ContextVar("rain_check_section", default=None)
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    price_in, price_out = PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * price_in + completion_tokens * price_out) / 1_000_000
+
+
+def record_usage(model: str, usage):
+    """
+    Charge one API response's token usage to the section being measured
+    on this thread, if any. Called by the analysis layer after every call.
+    """
+    record = _current_section.get()
+    if record is None or usage is None:
+        return
+    record["calls"] += 1
+    record["prompt_tokens"] += usage.prompt_tokens or 0
+    record["completion_tokens"] += usage.completion_tokens or 0
+    record["cost_usd"] += estimate_cost(model, usage.prompt_tokens or 0, usage.completion_tokens or 0)
+
+
+def record_event(name: str):
+    """
+    Count an event (e.g. a deadline fallback) on the section being measured.
+    """
+    record = _current_section.get()
+    if record is not None:
+        record[name] = record.get(name, 0) + 1
+
+
+def record_wait(seconds: float):
+    """
+    Charge time spent waiting for rate-limit admission to the section
+    being measured on this thread, if any.
+    """
+    record = _current_section.get()
+    if record is not None:
+        record["queued_seconds"] += seconds
+
+
+class ReportMetrics:
+    """
+    Timing and token usage for one report: a wall time per pipeline stage
+    and, per section, wall time, API calls, tokens and estimated cost.
+    Sections are measured on the worker threads that run them.
+    """
+
+    def __init__(self, label: str = ""):
+        self.report_id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.started = time.time()
+        self.stages = {}
+        self.sections = {}
+        self.speculation = {}   # section -> seconds saved by speculative analysis
+        self._lock = threading.Lock()
+
+    def add_stage(self, name: str, seconds: float):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - start)
+
+    @contextmanager
+    def section(self, name: str):
+        record = {"section": name, "seconds": 0.0, "queued_seconds": 0.0, "calls": 0,
+                  "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+        token = _current_section.set(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            # Abandoned attempts (deadline fallbacks) never report usage
+            record["cached"] = record["calls"] == 0 and not record.get("fallbacks")
+            _current_section.reset(token)
+            with self._lock:
+                self.sections[name] = record
+
+    def add_speculation(self, saved: dict):
+        """
+        Record the sections that speculative analysis (speculation.py) had
+        started before the report was requested, with the seconds saved.
+        """
+        with self._lock:
+            self.speculation.update(saved)
+
+    def measured(self, name: str, fn):
+        """
+        Wrap a zero-argument callable so it runs as section `name`.
+        """
+        def run():
+            with self.section(name):
+                return fn()
+        return run
+
+    def totals(self) -> dict:
+        with self._lock:
+            sections = list(self.sections.values())
+            stages = dict(self.stages)
+            speculation = dict(self.speculation)
+        return {
+            "seconds": sum(stages.values()),
+            "queued_seconds": sum(s["queued_seconds"] for s in sections),
+            "calls": sum(s["calls"] for s in sections),
+            "prompt_tokens": sum(s["prompt_tokens"] for s in sections),
+            "completion_tokens": sum(s["completion_tokens"] for s in sections),
+            "cost_usd": sum(s["cost_usd"] for s in sections),
+            "slowest_section": max(sections, key=lambda s: s["seconds"])["section"] if sections else None,
+            "speculative_sections": len(speculation),
+            # Speculated sections start together, so the last one's saving is the group's
+            "speculation_saved_seconds": max(speculation.values(), default=0.0),
+        }
+
+    def records(self) -> list:
+        """
+        Flat records (one per stage, one per section, one report summary)
+        for the JSONL export.
+        """
+        base = {"ts": self.started, "report_id": self.report_id, "label": self.label}
+        with self._lock:
+            stages = dict(self.stages)
+            sections = [dict(s) for s in self.sections.values()]
+            speculation = dict(self.speculation)
+        rows = [{**base, "kind": "stage", "stage": name, "seconds": seconds} for name, seconds in stages.items()]
+        rows += [{**base, "kind": "section", **section} for section in sections]
+        rows += [{**base, "kind": "speculation", "section": name, "saved_seconds": saved}
+                 for name, saved in speculation.items()]
+        rows.append({**base, "kind": "report", **self.totals()})
+        return rows
+
+    def breakdown(self) -> list:
+        """
+        Rows for the UI breakdown table.
+        """
+        with self._lock:
+            stages = dict(self.stages)
+            sections = [dict(s) for s in self.sections.values()]
+            speculation = set(self.speculation)
+        rows = [{"step": f"stage: {name}", "seconds": round(seconds, 2)} for name, seconds in stages.items()]
+        for s in sorted(sections, key=lambda s: s["seconds"], reverse=True):
+            served = " (speculative)" if s["section"] in speculation else " (cached)" if s["cached"] else ""
+            rows.append({
+                "step": s["section"] + served + (" (fallback)" if s.get("fallbacks") else ""),
+                "seconds": round(s["seconds"], 2),
+                "queued (s)": round(s["queued_seconds"], 2),
+                "prompt tokens": s["prompt_tokens"],
+                "completion tokens": s["completion_tokens"],
+                "cost (USD)": round(s["cost_usd"], 5),
+            })
+        return rows
+
+
+class _PrometheusTotals:
+    """
+    Process-wide counters behind the Prometheus textfile export.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sections = {}   # section -> [count, seconds, prompt, completion, cost]
+        self.stages = {}     # stage -> [count, seconds]
+        self.reports = 0
+        self.speculation = [0, 0.0]   # reports helped by speculative analysis, seconds saved
+        self.collectors = []   # callables returning extra exposition lines
+
+    def add(self, metrics: ReportMetrics):
+        with self.lock:
+            self.reports += 1
+            for name, seconds in metrics.stages.items():
+                entry = self.stages.setdefault(name, [0, 0.0])
+                entry[0] += 1
+                entry[1] += seconds
+            for name, s in metrics.sections.items():
+                entry = self.sections.setdefault(name, [0, 0.0, 0, 0, 0.0])
+                entry[0] += 1
+                entry[1] += s["seconds"]
+                entry[2] += s["prompt_tokens"]
+                entry[3] += s["completion_tokens"]
+                entry[4] += s["cost_usd"]
+            if metrics.speculation:
+                self.speculation[0] += 1
+                self.speculation[1] += max(metrics.speculation.values())
+
+    def render(self) -> str:
+        def label(value):
+            return value.replace("\\", "\\\\").replace('"', '\\"')
+
+        lines = [
+            "# HELP rain_check_reports_total Reports generated.",
+            "# TYPE rain_check_reports_total counter",
+            f"rain_check_reports_total {self.reports}",
+            "# HELP rain_check_stage_seconds Wall time per pipeline stage.",
+            "# TYPE rain_check_stage_seconds summary",
+        ]
+        with self.lock:
+            for name, (count, seconds) in sorted(self.stages.items()):
+                lines.append(f'rain_check_stage_seconds_sum{{stage="{label(name)}"}} {seconds:.6f}')
+                lines.append(f'rain_check_stage_seconds_count{{stage="{label(name)}"}} {count}')
+            lines += ["# HELP rain_check_section_seconds Wall time per analysis section.",
+                      "# TYPE rain_check_section_seconds summary"]
+            for name, (count, seconds, _, _, _) in sorted(self.sections.items()):
+                lines.append(f'rain_check_section_seconds_sum{{section="{label(name)}"}} {seconds:.6f}')
+                lines.append(f'rain_check_section_seconds_count{{section="{label(name)}"}} {count}')
+            lines += ["# HELP rain_check_tokens_total Tokens used per section.",
+                      "# TYPE rain_check_tokens_total counter"]
+            for name, (_, _, prompt, completion, _) in sorted(self.sections.items()):
+                lines.append(f'rain_check_tokens_total{{section="{label(name)}",type="prompt"}} {prompt}')
+                lines.append(f'rain_check_tokens_total{{section="{label(name)}",type="completion"}} {completion}')
+            lines += ["# HELP rain_check_cost_usd_total Estimated API cost per section.",
+                      "# TYPE rain_check_cost_usd_total counter"]
+            for name, (_, _, _, _, cost) in sorted(self.sections.items()):
+                lines.append(f'rain_check_cost_usd_total{{section="{label(name)}"}} {cost:.6f}')
+            lines += ["# HELP rain_check_speculation_saved_seconds Latency saved by speculative analysis per report.",
+                      "# TYPE rain_check_speculation_saved_seconds summary",
+                      f"rain_check_speculation_saved_seconds_sum {self.speculation[1]:.6f}",
+                      f"rain_check_speculation_saved_seconds_count {self.speculation[0]}"]
+            collectors = list(self.collectors)
+        for collect in collectors:
+            lines += collect()
+        return "\n".join(lines) + "\n"
+
+
+_prometheus = _PrometheusTotals()
+_write_lock = threading.Lock()
+
+
+def register_collector(collect):
+    """
+    Add process-wide gauges (e.g. the request scheduler's) to the
+    Prometheus export; `collect()` returns exposition lines.
+    """
+    with _prometheus.lock:
+        _prometheus.collectors.append(collect)
+
+
+def export_metrics(metrics: ReportMetrics):
+    """
+    Append the report's records to the JSONL file and/or rewrite the
+    Prometheus textfile, depending on METRICS_FORMAT.
+    """
+    fmt = get_setting("METRICS_FORMAT", METRICS_FORMAT)
+    if fmt == "off":
+        return
+    with _write_lock:
+        if fmt in ("jsonl", "both"):
+            path = get_setting("METRICS_PATH", METRICS_PATH)
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                for record in metrics.records():
+                    f.write(json.dumps(record) + "\n")
+        if fmt in ("prometheus", "both"):
+            _prometheus.add(metrics)
+            path = get_setting("PROMETHEUS_PATH", PROMETHEUS_PATH)
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            # Write-then-rename so a scraper never reads a half-written file
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(_prometheus.render())
+            os.replace(tmp, path)
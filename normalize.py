@@ -0,0 +1,86 @@
+import re
+from collections import defaultdict
+
+# Page numbers ("12", "12.", "Page 12", "12 of 110", "- 12 -"); a bare
+# "12" or "12." could also be a line of dialogue
+PAGE_NUMBER = re.compile(r"^\s*(?:page\s+)?[-–]?\s*\d{1,4}\s*[-–]?\.?\s*(?:of\s+\d{1,4})?\s*$", re.IGNORECASE)
+BARE_NUMBER = re.compile(r"^\d{1,4}\.?$")
+# Page-break markers that carry no content
+CONTINUED_LINE = re.compile(r"^\s*\(?\s*(?:CONTINUED|CONT'D|CONT’D|CONT\.?)\s*\)?\s*:?\s*$", re.IGNORECASE)
+MORE_LINE = re.compile(r"^\s*\(\s*MORE\s*\)\s*$", re.IGNORECASE)
+CONTD_MARKER = re.compile(r"\s*\(\s*CONT(?:'|’)?D\.?\s*\)|\s*\(\s*CONTINUING\s*\)", re.IGNORECASE)
+# Scene numbers on either side of a heading: "12  INT. HOUSE - DAY  12"
+NUMBERED_HEADING = re.compile(r"^\s*\d+[A-Z]?\.?\s+((?:INT|EXT|I/E)\b.*?)(?:\s+\d+[A-Z]?\.?)?\s*$")
+RUNS_OF_SPACE = re.compile(r"[ \t\u00a0]+")
+
+HEADER_WINDOW = 2          # lines around a page number searched for running headers
+HEADER_MIN_SHARE = 0.3     # share of pages a line must repeat on to count as a header
+# Never treated as headers: character cues and scene headings
+_PROTECTED = re.compile(r"^(?:[A-Z][A-Z .'\-]{0,30}(?:\s*\([^)]*\))*|(?:INT|EXT|I/E)\b.*)$")
+CHARACTER_CUE = re.compile(r"^(?!(?:INT|EXT|I/E)\b)[A-Z][A-Z .'\-]{0,30}(?:\s*\([^)]*\))*$")
+PARENTHETICAL = re.compile(r"^\(.*\)$")
+
+
+def _running_headers(lines: list, page_lines: list) -> set:
+    """
+    Lines repeated next to the page numbers of many pages (draft dates,
+    titles, revision marks). Only lines within HEADER_WINDOW non-empty
+    lines of a page number are candidates, so repeated dialogue is safe.
+    """
+    if len(page_lines) < 3:
+        return set()
+    seen = defaultdict(set)
+    for page, at in enumerate(page_lines):
+        for step in (-1, 1):
+            i, count = at + step, 0
+            while 0 <= i < len(lines) and count < HEADER_WINDOW:
+                if lines[i]:
+                    if not _PROTECTED.match(lines[i]):
+                        seen[re.sub(r"\d+", "#", lines[i])].add(page)
+                    count += 1
+                i += step
+    needed = max(3, HEADER_MIN_SHARE * len(page_lines))
+    return {key for key, pages in seen.items() if len(pages) >= needed}
+
+
+def _is_page_number(lines: list, i: int) -> bool:
+    """
+    Whether line `i` is a page number. A bare number right after a
+    character cue (and its parenthetical, if any) is a line of dialogue.
+    """
+    if not PAGE_NUMBER.match(lines[i]):
+        return False
+    if not BARE_NUMBER.match(lines[i]):
+        return True
+    previous = [line for line in lines[max(0, i - 4):i] if line][-2:]
+    if previous and PARENTHETICAL.match(previous[-1]) and not (
+            MORE_LINE.match(previous[-1]) or CONTINUED_LINE.match(previous[-1])):
+        previous.pop()
+    return not (previous and CHARACTER_CUE.match(previous[-1]))
+
+
+def normalize_screenplay(text: str) -> str:
+    """
+    Remove layout noise from extracted screenplay text before it is sent
+    to the model: page numbers, (CONT'D)/(MORE)/CONTINUED markers, running
+    headers, scene numbers around headings, indentation and runs of
+    whitespace. Dialogue and action text are kept word for word.
+    """
+    lines = [RUNS_OF_SPACE.sub(" ", line).strip() for line in text.splitlines()]
+    page_lines = [i for i, line in enumerate(lines) if line and _is_page_number(lines, i)]
+    headers = _running_headers(lines, page_lines)
+    page_line_set = set(page_lines)
+
+    out = []
+    for i, line in enumerate(lines):
+        if i in page_line_set or CONTINUED_LINE.match(line) or MORE_LINE.match(line):
+            continue
+        if line and re.sub(r"\d+", "#", line) in headers:
+            continue
+        heading = NUMBERED_HEADING.match(line)
+        if heading:
+            line = heading.group(1)
+        line = CONTD_MARKER.sub("", line)
+        if line or (out and out[-1]):
+            out.append(line)   # at most one blank line in a row
+    return "\n".join(out).strip()
@@ -0,0 +1,91 @@
+import threading
+
+import streamlit as st
+
+from settings import get_setting, openai_api_key
+
+# Keep-alive pool shared by every session and section in the process.
+# Sized for a few concurrent reports of nine sections each.
+MAX_CONNECTIONS = 32
+MAX_KEEPALIVE_CONNECTIONS = 16
+KEEPALIVE_EXPIRY = 120.0  # seconds an idle connection stays open
+# Retries (with backoff and Retry-After) are done by rate_limit.RequestScheduler,
+# which also re-admits them against the rate limits; the SDK's own would double them
+SDK_MAX_RETRIES = 0
+
+
+class ConnectionStats:
+    """
+    Counts HTTP requests and newly opened TCP connections on the shared
+    client, so connection reuse can be checked at runtime.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+
+    def _trace(self, event_name, info):
+        # httpcore reports a TCP connect only when the pool has no idle
+        # connection to hand out
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self.new_connections += 1
+
+    def on_request(self, request):
+        request.extensions["trace"] = self._trace
+        with self._lock:
+            self.requests += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            requests, new_connections = self.requests, self.new_connections
+        reused = max(requests - new_connections, 0)
+        return {
+            "requests": requests,
+            "new_connections": new_connections,
+            "reused": reused,
+            "reuse_ratio": reused / requests if requests else 0.0,
+        }
+
+
+@st.cache_resource(show_spinner=False)
+def _pooled_client(api_key: str, base_url: str):
+    # The SDK is the slowest import in the app; load it with the first client
+    import httpx
+    import openai
+
+    stats = ConnectionStats()
+    http_client = openai.DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        event_hooks={"request": [stats.on_request]},
+    )
+    client = openai.OpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=SDK_MAX_RETRIES)
+    return client, stats
+
+
+def _client_settings(api_key, base_url):
+    # OPENAI_BASE_URL points the app at a compatible server (e.g. the benchmark mock)
+    return api_key or openai_api_key(), base_url or get_setting("OPENAI_BASE_URL")
+
+
+def get_openai_client(api_key: str = None, base_url: str = None) -> "openai.OpenAI":
+    """
+    Return the process-wide OpenAI client for `api_key` (default: the
+    OPENAI_API_KEY setting), created once and reused across calls, sections
+    and Streamlit reruns.
+    """
+    client, _ = _pooled_client(*_client_settings(api_key, base_url))
+    return client
+
+
+def get_connection_stats(api_key: str = None, base_url: str = None) -> dict:
+    """
+    Request and connection counters for the pooled client of `api_key`.
+    """
+    _, stats = _pooled_client(*_client_settings(api_key, base_url))
+    return stats.snapshot()
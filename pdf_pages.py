@@ -0,0 +1,25 @@
+"""
+PDF page access for extraction.py, kept free of Streamlit so the
+extraction worker processes import only this module and PyMuPDF.
+"""
+
+
+def open_pdf(source):
+    """
+    Open a PDF given as a file path or as raw bytes.
+    """
+    # PyMuPDF takes a noticeable share of app start-up; load it on first use
+    import fitz  # pymupdf
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source)
+
+
+def extract_page_range(source, start: int, stop: int) -> list:
+    """
+    Text of pages `start` to `stop` (exclusive). Runs in an extraction
+    worker process, which opens its own copy of the document.
+    """
+    with open_pdf(source) as doc:
+        return [doc[i].get_text() for i in range(start, stop)]
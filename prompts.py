@@ -0,0 +1,160 @@
+# Prompt templates for each report section. Every template has a single
+# {screenplay_text} placeholder and is rendered with str.format.
+
+# Sections whose answers are short (a few lines)
+SHORT_SECTIONS = ("Genre", "Top Keywords", "Location Setting")
+
+# Full instructions used by app.py / app2.py
+DETAILED_PROMPTS = {
+    "Logline": """Write a Hollywood-style logline for my screenplay. It should only contain the logline, making it engaging and high-concept.
+
+Screenplay:
+\"\"\"{screenplay_text}\"\"\"
+""",
+
+    "Genre": """Suggest the genre for the provided screenplay. By genre, we mean a particular type or style of literature, art, film, or music recognizable by its special characteristics.
+
+Screenplay:
+\"\"\"{screenplay_text}\"\"\"
+""",
+
+    "Top Keywords": """Give the top 10 keywords of the attached movie screenplay without any explanation.
+
+Screenplay:
+\"\"\"{screenplay_text}\"\"\"
+""",
+
+    "Location Setting": """Give the location setting of the attached movie screenplay, considering only the primary location.
+
+Screenplay:
+\"\"\"{screenplay_text}\"\"\"
+""",
+
+    "Synopsis": """Give only the synopsis of the attached screenplay.
+
+Screenplay:
+\"\"\"{screenplay_text}\"\"\"
+""",
+
+    "Script Score": """Analyze the attached screenplay and give it a script score out of 10, including:
+- Character development score (out of 10) with 1-2 lines explanation
+- Plot construction (out of 10) with 1-2 lines explanation
+- Dialogue (out of 10) with 1-2 lines explanation
+- Originality (out of 10) with 1-2 lines explanation
+- Emotional engagement (out of 10) with 1-2 lines explanation
+- Theme and message (out of 10) with 1-2 lines explanation
+- Overall rating out of 10 with explanation
+
+Screenplay:
+\"\"\"{screenplay_text}\"\"\"
+""",
+
+    "Plot Assessment": """Analyze the attached screenplay and give the plot assessment and enhancement, including:
+- 5 points of what is working well (positive aspects)
+- 5 points where the screenplay lacks
+- 5 points of improvements that may be made
+- An overall review of the screenplay
+
+Screenplay:
+\"\"\"{screenplay_text}\"\"\"
+""",
+
+    "Character Profiling": """Analyze the attached screenplay and return character profiling for the main characters, including:
+- Brief description of each main character
+- What is working well for each character
+- Areas for improvement
+- The archetype for each
+
+Screenplay:
+\"\"\"{screenplay_text}\"\"\"
+""",
+
+    "Box Office Collection": """Analyze the attached screenplay and give its box office prediction with the following fields:
+- Opening day (global and local)
+- Opening week (global and local)
+- Opening month (global and local)
+
+Screenplay:
+\"\"\"{screenplay_text}\"\"\"
+"""
+}
+
+# Completion budget per section for DETAILED_PROMPTS
+DETAILED_MAX_TOKENS = {
+    section: 200 if section in SHORT_SECTIONS else 700 for section in DETAILED_PROMPTS
+}
+
+# Condensed instructions used by app4.py
+BRIEF_PROMPTS = {
+    "Logline": """Write a Hollywood-style logline for my screenplay.\n\nScreenplay:\n\"\"\"{screenplay_text}\"\"\"""",
+    "Genre": """Suggest the genre for the provided screenplay.\n\nScreenplay:\n\"\"\"{screenplay_text}\"\"\"""",
+    "Top Keywords": """Give the top 10 keywords of the attached movie screenplay without any explanation.\n\nScreenplay:\n\"\"\"{screenplay_text}\"\"\"""",
+    "Location Setting": """Give the location setting of the attached movie screenplay.\n\nScreenplay:\n\"\"\"{screenplay_text}\"\"\"""",
+    "Synopsis": """Give only the synopsis of the attached screenplay.\n\nScreenplay:\n\"\"\"{screenplay_text}\"\"\"""",
+    "Script Score": """Analyze the screenplay and give it a script score out of 10, including multiple components.\n\nScreenplay:\n\"\"\"{screenplay_text}\"\"\"""",
+    "Plot Assessment": """Analyze the screenplay and give the plot assessment and enhancements.\n\nScreenplay:\n\"\"\"{screenplay_text}\"\"\"""",
+    "Character Profiling": """Analyze the screenplay and return character profiling for the main characters.\n\nScreenplay:\n\"\"\"{screenplay_text}\"\"\"""",
+    "Box Office Collection": """Analyze the screenplay and give its box office prediction.\n\nScreenplay:\n\"\"\"{screenplay_text}\"\"\"""",
+}
+
+BRIEF_MAX_TOKENS = {section: 1200 for section in BRIEF_PROMPTS}
+
+
+def render_prompt(template: str, screenplay_text: str) -> str:
+    return template.format(screenplay_text=screenplay_text)
+
+
+# Map step of the digest pipeline for screenplays too long to send whole
+# (see analysis.prepare_analysis_input). Parts are numbered when merged.
+DIGEST_PROMPT = """The text below is one consecutive part of a longer screenplay. Write a dense, scene-by-scene digest of it for a script analyst who will not see the original. Keep, in order:
+- every scene heading (location and time of day)
+- every named character who appears, and what they want or do
+- each plot event, reveal and turning point
+- short quotes of any lines that define a character or the theme
+Do not evaluate the writing and do not add anything that is not in the text.
+
+Screenplay part:
+\"\"\"{screenplay_text}\"\"\"
+"""
+
+
+# Short sections that can share one structured (JSON) request instead of
+# each resending the screenplay (see analysis.analyze_sections)
+COMBINED_SECTIONS = ("Logline", "Genre", "Top Keywords", "Location Setting")
+
+
+def section_instruction(template: str) -> str:
+    """
+    The instruction part of a section template, without the embedded screenplay.
+    """
+    return template.split("Screenplay:", 1)[0].strip()
+
+
+def combined_template(templates: dict, sections) -> str:
+    """
+    One template asking for several sections at once, answered as a JSON
+    object with one string field per section.
+    """
+    items = "\n".join(f'- "{section}": {section_instruction(templates[section])}' for section in sections)
+    return f"""Answer each item below about the attached screenplay. Reply with a JSON object that has exactly one string field per item, named as given.
+{items}
+
+Screenplay:
+\"\"\"{{screenplay_text}}\"\"\"
+"""
+
+
+def section_schema(sections) -> dict:
+    """
+    Strict JSON schema for a combined_template response.
+    """
+    return {
+        "name": "screenplay_sections",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {section: {"type": "string"} for section in sections},
+            "required": list(sections),
+            "additionalProperties": False,
+        },
+    }
@@ -0,0 +1,221 @@
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import streamlit as st
+
+from metrics import record_wait, register_collector
+from settings import get_setting
+
+logger = logging.getLogger(__name__)
+
+# Account limits for the default model; set OPENAI_RPM / OPENAI_TPM in
+# secrets to match the organization's tier
+DEFAULT_RPM = 500
+DEFAULT_TPM = 200_000
+DEFAULT_MAX_RETRIES = 5
+BASE_BACKOFF = 1.0    # seconds before the first retry, doubled per attempt
+MAX_BACKOFF = 60.0
+
+RETRYABLE_STATUS = {408, 409, 429}   # plus every 5xx
+
+
+class TokenBucket:
+    """
+    Continuously refilled bucket of `per_minute` units holding at most one
+    minute's worth. Reservations may drive the level negative; the debt is
+    how long the reserving caller has to wait, which keeps admission FIFO.
+    """
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float, now: float) -> float:
+        """
+        Take `amount` units; returns the seconds until they are covered.
+        """
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        # A request larger than the bucket would never fit; let it drain a full bucket
+        self.level -= min(amount, self.capacity)
+        return max(0.0, -self.level / self.rate)
+
+
+def retry_after(exc: Exception):
+    """
+    Seconds the server asked us to wait (Retry-After / retry-after-ms), or None.
+    """
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(exc: Exception) -> bool:
+    import openai   # already loaded by the request that raised
+
+    if isinstance(exc, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in RETRYABLE_STATUS or exc.status_code >= 500
+    return False
+
+
+class RequestScheduler:
+    """
+    Process-wide admission control for chat-completion requests. Every call
+    reserves one request from the RPM bucket and its estimated tokens (the
+    prompt plus max_tokens, as the API counts them) from the TPM bucket, and
+    waits until both are covered. 429s and 5xx responses are retried with
+    jittered exponential backoff; a Retry-After pauses admission for every
+    session, not just the caller.
+    """
+
+    def __init__(self, rpm: int = DEFAULT_RPM, tpm: int = DEFAULT_TPM,
+                 max_retries: int = DEFAULT_MAX_RETRIES):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self.waiting = 0
+        self.admitted = 0
+        self.wait_seconds = 0.0
+        self.max_wait = 0.0
+        self.retries = {}   # status (or "connection") -> count
+        self.failures = 0
+
+    def admit(self, tokens: int) -> float:
+        """
+        Block until a request of `tokens` may be sent; returns the wait.
+        """
+        with self._lock:
+            now = time.monotonic()
+            delay = max(
+                self.requests.reserve(1, now),
+                self.tokens.reserve(tokens, now),
+                self._paused_until - now,
+            )
+            self.waiting += 1
+        try:
+            if delay > 0:
+                time.sleep(delay)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+                self.admitted += 1
+                self.wait_seconds += delay
+                self.max_wait = max(self.max_wait, delay)
+        record_wait(delay)
+        return delay
+
+    def call(self, fn, tokens: int, on_admitted=None, stop=None):
+        """
+        Run `fn()` (one API request) once admitted, retrying transient errors.
+        `on_admitted()` is called after the first admission. Once the `stop`
+        event is set (the caller gave up), errors are no longer retried.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.admit(tokens)
+            if on_admitted is not None and attempt == 0:
+                on_admitted()
+            try:
+                return fn()
+            except Exception as exc:
+                if not is_retryable(exc) or attempt == self.max_retries or (stop is not None and stop.is_set()):
+                    if is_retryable(exc):
+                        with self._lock:
+                            self.failures += 1
+                    raise
+                delay = self._backoff(attempt, exc)
+                logger.warning("Retrying request in %.1fs after %s", delay, exc)
+                if stop is None:
+                    time.sleep(delay)
+                elif stop.wait(delay):
+                    raise
+
+    def _backoff(self, attempt: int, exc: Exception) -> float:
+        # Full jitter spreads the retries of many sections hit at once
+        delay = random.uniform(0, min(MAX_BACKOFF, BASE_BACKOFF * 2 ** attempt))
+        server = retry_after(exc)
+        status = getattr(exc, "status_code", "connection")
+        with self._lock:
+            self.retries[status] = self.retries.get(status, 0) + 1
+            if server is not None:
+                delay = max(delay, server)
+                if status == 429:
+                    self._paused_until = max(self._paused_until, time.monotonic() + server)
+        return delay
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "waiting": self.waiting,
+                "admitted": self.admitted,
+                "wait_seconds": self.wait_seconds,
+                "mean_wait": self.wait_seconds / self.admitted if self.admitted else 0.0,
+                "max_wait": self.max_wait,
+                "retries": dict(self.retries),
+                "failures": self.failures,
+            }
+
+    def prometheus_lines(self) -> list:
+        s = self.snapshot()
+        lines = [
+            "# HELP rain_check_scheduler_waiting Requests waiting for rate-limit admission.",
+            "# TYPE rain_check_scheduler_waiting gauge",
+            f"rain_check_scheduler_waiting {s['waiting']}",
+            "# HELP rain_check_scheduler_wait_seconds Time requests spent waiting for admission.",
+            "# TYPE rain_check_scheduler_wait_seconds summary",
+            f"rain_check_scheduler_wait_seconds_sum {s['wait_seconds']:.6f}",
+            f"rain_check_scheduler_wait_seconds_count {s['admitted']}",
+            "# HELP rain_check_scheduler_retries_total Retried requests by HTTP status.",
+            "# TYPE rain_check_scheduler_retries_total counter",
+        ]
+        for status, count in sorted(s["retries"].items(), key=str):
+            lines.append(f'rain_check_scheduler_retries_total{{status="{status}"}} {count}')
+        return lines
+
+
+@st.cache_resource(show_spinner=False)
+def _scheduler(rpm: int, tpm: int, max_retries: int) -> RequestScheduler:
+    scheduler = RequestScheduler(rpm, tpm, max_retries)
+    register_collector(scheduler.prometheus_lines)
+    return scheduler
+
+
+def get_scheduler() -> RequestScheduler:
+    """
+    The scheduler shared by every session, sized by OPENAI_RPM, OPENAI_TPM
+    and OPENAI_MAX_RETRIES in secrets.
+    """
+    return _scheduler(
+        int(get_setting("OPENAI_RPM", DEFAULT_RPM)),
+        int(get_setting("OPENAI_TPM", DEFAULT_TPM)),
+        int(get_setting("OPENAI_MAX_RETRIES", DEFAULT_MAX_RETRIES)),
+    )
+
+
+def format_scheduler_stats(stats: dict) -> str:
+    retries = sum(stats["retries"].values())
+    return (
+        f"🚦 Rate limiter: {stats['admitted']} requests admitted, mean wait {stats['mean_wait']:.2f}s "
+        f"(max {stats['max_wait']:.2f}s), {stats['waiting']} queued now, {retries} retried"
+    )
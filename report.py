@@ -0,0 +1,117 @@
+import copy
+import os
+import pickle
+import re
+import threading
+from datetime import datetime, timezone
+from io import BytesIO
+
+import streamlit as st
+
+FONT_REGULAR = "DejaVuSans.ttf"
+FONT_BOLD = "DejaVuSans-Bold.ttf"
+REPORT_TITLE = "Screenplay Analysis Report"
+
+# Font tables fontTools decompiles for every report (glyph names, widths
+# and outlines), parsed once per process
+PARSED_TABLES = ("cmap", "post", "hmtx", "loca", "glyf")
+
+_template_lock = threading.Lock()
+
+
+@st.cache_resource(show_spinner=False)
+def _report_template() -> "FPDF":
+    """
+    First page of every report, built once per process: both DejaVu fonts
+    parsed and registered, and the title block drawn. fpdf2 is imported
+    here rather than at module level, so the apps render before it loads.
+    """
+    from fpdf import FPDF
+
+    if not os.path.isfile(FONT_REGULAR) or not os.path.isfile(FONT_BOLD):
+        raise FileNotFoundError("DejaVu font files not found. Make sure DejaVu fonts are in the app folder.")
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.add_font("DejaVu", "", FONT_REGULAR, uni=True)
+    pdf.add_font("DejaVu", "B", FONT_BOLD, uni=True)
+
+    pdf.set_font("DejaVu", "B", 16)
+    pdf.cell(0, 10, REPORT_TITLE, ln=True, align="C")
+    pdf.ln(10)
+    return pdf
+
+
+@st.cache_resource(show_spinner=False)
+def _parsed_tables(path: str, font_number: int) -> bytes:
+    """
+    PARSED_TABLES of a font and its glyph order (which reading "post"
+    moves onto the font), decompiled once per process and pickled.
+    Unpickling gives each report its own deep copy several times faster
+    than copy.deepcopy or decompiling the tables again.
+    """
+    from fontTools import ttLib
+
+    font = ttLib.TTFont(path, recalcTimestamp=False, fontNumber=font_number, lazy=True)
+    tables = {tag: font[tag] for tag in PARSED_TABLES if tag in font}
+    return pickle.dumps((tables, font.getGlyphOrder()), pickle.HIGHEST_PROTOCOL)
+
+
+def new_report() -> "FPDF":
+    """
+    A fresh document positioned just below the title block. Copying the
+    template reuses the parsed font metrics instead of re-reading the TTFs.
+    """
+    from fontTools import ttLib
+
+    with _template_lock:
+        pdf = copy.deepcopy(_report_template())
+    # fpdf2 shares the fontTools object between copies, and subsetting on
+    # output modifies it in place; give each report its own, with copies of
+    # the parsed tables and the rest loaded lazily. These are fpdf2 internals
+    # (ttfont, ttffile, collection_font_number) of the version pinned in
+    # requirements.txt; tests/test_report.py compares the output with a
+    # report rendered from scratch
+    for font in pdf.fonts.values():
+        font.ttfont = ttLib.TTFont(
+            font.ttffile, recalcTimestamp=False, fontNumber=font.collection_font_number, lazy=True
+        )
+        tables, glyph_order = pickle.loads(_parsed_tables(str(font.ttffile), font.collection_font_number))
+        font.ttfont.tables.update(tables)
+        font.ttfont.setGlyphOrder(glyph_order)
+    pdf.set_creation_date(datetime.now(timezone.utc))
+    return pdf
+
+
+def clean_markdown(text: str) -> str:
+    """
+    Strip common Markdown syntax (bold, headings, inline code) for the PDF.
+    """
+    text = re.sub(r"(\*\*|__)", "", text)         # bold
+    text = re.sub(r"(#+\s*)", "", text)           # headings like #, ##, ###
+    text = re.sub(r"`", "", text)                 # inline code
+    text = re.sub(r"\n{3,}", "\n\n", text)        # excessive line breaks
+    return text.strip()
+
+
+def render_report(data: dict, clean, section_gap: float = 10) -> BytesIO:
+    """
+    Render the analysis dict (section -> text) as a PDF. `clean` turns each
+    section's Markdown into plain text; `section_gap` is the space after
+    each section.
+    """
+    pdf = new_report()
+
+    for section, content in data.items():
+        pdf.set_font("DejaVu", "B", 14)
+        pdf.cell(0, 10, section, ln=True)
+        pdf.ln(2)
+
+        pdf.set_font("DejaVu", "", 12)
+        pdf.multi_cell(0, 8, clean(content))
+        pdf.ln(section_gap)
+
+    buffer = BytesIO()
+    pdf.output(buffer)
+    buffer.seek(0)
+    return buffer
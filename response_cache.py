@@ -0,0 +1,164 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import streamlit as st
+
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "responses.sqlite3")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024   # total size of cached section texts
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600     # a week
+
+
+def cache_key(screenplay_text: str, template: str, model: str, temperature: float, max_tokens: int) -> str:
+    """
+    Content address of one section result: SHA-256 over the screenplay
+    text, the section's prompt template and the generation parameters.
+    """
+    digest = hashlib.sha256()
+    for part in (screenplay_text, template, model, repr(float(temperature)), str(int(max_tokens))):
+        data = part.encode("utf-8")
+        # Length prefix keeps ("ab", "c") and ("a", "bc") apart
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent SQLite store of LLM section results.
+
+    Entries older than `ttl_seconds` are treated as missing. When the total
+    size of stored texts exceeds `max_bytes`, the least recently used
+    entries are evicted. Concurrent misses for the same key are coalesced
+    (`flight`), so identical requests from several sessions cost one call.
+
+    The file may be shared with other processes (batch.py), so a database
+    error on lookup counts as a miss and one on store is logged and
+    skipped: the cache never fails the section it serves.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.flight = SingleFlight()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key      TEXT PRIMARY KEY,
+                value    TEXT NOT NULL,
+                size     INTEGER NOT NULL,
+                created  REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+    def get(self, key: str, count: bool = True):
+        """
+        Return the cached text for `key`, or None if missing or expired.
+        `count=False` leaves the hit/miss counters alone.
+        """
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    "SELECT value, created FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[1] > self.ttl_seconds:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    row = None
+                if row is not None:
+                    self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            except sqlite3.Error as exc:
+                self.errors += 1
+                logger.warning("Response cache lookup failed, treating it as a miss: %s", exc)
+                row = None
+            if row is None:
+                self.misses += count
+                return None
+            self.hits += count
+        return row[0]
+
+    def put(self, key: str, value: str):
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                    (key, value, size, now, now),
+                )
+                self._evict(now)
+            except sqlite3.Error as exc:
+                self.errors += 1
+                logger.warning("Response cache store failed, result not cached: %s", exc)
+
+    def get_or_compute(self, key: str, compute) -> str:
+        """
+        Return the cached text for `key`, calling `compute()` and storing
+        its result on a miss. Exceptions from `compute` are not cached.
+        Callers missing on a key that is already being computed wait for
+        that computation instead of starting their own.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        def lead():
+            # A call that finished between our miss and claiming the key is already stored
+            value = self.get(key, count=False)
+            if value is None:
+                value = compute()
+                self.put(key, value)
+            return value
+
+        return self.flight.do(key, lead)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def _evict(self, now: float):
+        self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        stale = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+
+@st.cache_resource(show_spinner=False)
+def get_response_cache(path: str = DEFAULT_CACHE_PATH,
+                       max_bytes: int = DEFAULT_MAX_BYTES,
+                       ttl_seconds: float = DEFAULT_TTL_SECONDS) -> ResponseCache:
+    """
+    Process-wide response cache, opened once and shared by all sessions.
+    """
+    return ResponseCache(path, max_bytes, ttl_seconds)
@@ -0,0 +1,125 @@
+"""
+Per-section scene retrieval: the sections that only need part of the
+screenplay are sent the local structure summary plus the scenes that
+score highest for the section's query, instead of the whole text.
+"""
+from functools import lru_cache
+
+from chunking import count_tokens
+from screenplay_index import ScreenplayIndex
+
+# Query per section: words scored with BM25, how many of the characters
+# with the most dialogue count as query terms, and how many opening and
+# closing scenes are always included
+SECTION_QUERIES = {
+    "Character Profiling": {
+        "words": "love hate afraid fear angry cry tears smile laugh father mother brother sister son "
+                 "daughter wife husband friend family secret past remember dream want need trust lie "
+                 "feel sorry forgive promise kiss hug alone",
+        "characters": 8,
+        "anchors": (1, 1),
+    },
+    "Plot Assessment": {
+        "words": "suddenly reveals realizes discovers truth plan escape fight kill dead dies death "
+                 "chase gun attack run stop help please decision choice must never finally end begins "
+                 "wedding funeral arrives leaves returns",
+        "characters": 3,
+        "anchors": (2, 2),
+    },
+    "Box Office Collection": {
+        "words": "explosion crash chase fight battle crowd city army fire gun war storm ship car police "
+                 "world monster magic song dance stadium concert party spectacular massive thousands",
+        "characters": 3,
+        "anchors": (1, 1),
+    },
+}
+RETRIEVAL_TOKENS = 6_000   # scene budget per section, on top of the structure summary
+
+OMITTED = "[...]"
+
+
+def scene_scores(index: ScreenplayIndex, query: dict):
+    """
+    Relevance of every scene to `query`: BM25 over the query words plus
+    the presence of its characters weighted by how rarely they appear,
+    each scaled to [0, 1] so neither swamps the other.
+    """
+    import numpy as np
+
+    scores = index.bm25(query["words"].split())
+    cast = [name for name, _ in index.dialogue.most_common(query.get("characters", 0))]
+    if cast:
+        n_scenes = len(index.scenes)
+        weights = np.log1p(n_scenes / np.asarray([index.character_scenes[name] or 1 for name in cast], dtype=float))
+        present = np.asarray([[name in scene["characters"] for name in cast] for scene in index.scenes], dtype=float)
+        scores = _scaled(scores) + _scaled(present.reshape(n_scenes, len(cast)) @ weights)
+    return scores
+
+
+def _scaled(values):
+    top = values.max() if len(values) else 0.0
+    return values / top if top > 0 else values
+
+
+def select_scenes(index: ScreenplayIndex, query: dict, max_tokens: int = RETRIEVAL_TOKENS,
+                  model: str = "gpt-4o-mini", normalize=None) -> dict:
+    """
+    The scenes to send, as {scene index: text} in screenplay order: the
+    anchor scenes, then the best-scoring ones that still fit in
+    `max_tokens`. Scene texts are counted after `normalize`, if given.
+    """
+    import numpy as np
+
+    n_scenes = len(index.scenes)
+    first, last = query.get("anchors", (0, 0))
+    scores = scene_scores(index, query)
+    anchors = [i for i in range(n_scenes) if i < first or i >= n_scenes - last]
+    order = anchors + [int(i) for i in np.argsort(-scores, kind="stable") if i not in anchors]
+
+    chosen, used = {}, 0
+    for i in order:
+        text = index.scene_text(i)
+        if normalize is not None:
+            text = normalize(text)
+        tokens = count_tokens(text, model)
+        if used + tokens <= max_tokens:
+            chosen[i] = text
+            used += tokens
+    return dict(sorted(chosen.items()))
+
+
+def excerpt(index: ScreenplayIndex, section: str, max_tokens: int = RETRIEVAL_TOKENS, model: str = "gpt-4o-mini",
+            normalize=None) -> str:
+    """
+    The text sent for `section`: the structure summary and the selected
+    scenes, with omitted stretches of the screenplay marked.
+    """
+    chosen = select_scenes(index, SECTION_QUERIES[section], max_tokens, model, normalize)
+    parts, previous = [], -1
+    for i, text in chosen.items():
+        if i != previous + 1:
+            parts.append(OMITTED)
+        parts.append(text)
+        previous = i
+    if previous != len(index.scenes) - 1:
+        parts.append(OMITTED)
+    return (
+        index.context()
+        + f"\nExcerpt: the {len(chosen)} of {len(index.scenes)} scenes most relevant to this analysis, "
+        f"in screenplay order; {OMITTED} marks omitted scenes.\n\n"
+        + "\n\n".join(parts)
+    )
+
+
+def section_texts(index: ScreenplayIndex, sections, max_tokens: int = RETRIEVAL_TOKENS, model: str = "gpt-4o-mini",
+                  normalize=None) -> dict:
+    """
+    Retrieved texts for the SECTION_QUERIES among `sections`; the others
+    are left to the full text.
+    """
+    if len(index.scenes) < 2:
+        return {}
+    if normalize is not None:
+        normalize = lru_cache(maxsize=None)(normalize)   # scenes are shared between sections
+    return {section: excerpt(index, section, max_tokens, model, normalize)
+            for section in sections if section in SECTION_QUERIES}
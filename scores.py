@@ -0,0 +1,205 @@
+"""
+Numeric script scores: the sub-scores of the "Script Score" section parsed
+from its text, and a columnar table of them for comparing many analyzed
+screenplays at once.
+"""
+import re
+import warnings
+
+SCORE_SECTION = "Script Score"
+SCORE_FIELDS = ("character", "plot", "dialogue", "originality", "emotional", "theme", "overall")
+SCORE_LABELS = {
+    "character": "Character development",
+    "plot": "Plot construction",
+    "dialogue": "Dialogue",
+    "originality": "Originality",
+    "emotional": "Emotional engagement",
+    "theme": "Theme and message",
+    "overall": "Overall",
+}
+PERCENTILES = (10, 25, 50, 75, 90)
+
+# How each sub-score is introduced in the section text; the label that
+# starts earliest in a line decides which score the line carries
+_LABELS = {
+    "character": re.compile(r"charact", re.I),
+    "plot": re.compile(r"\bplot\b|\bstructure\b|\bstory\b", re.I),
+    "dialogue": re.compile(r"dialog", re.I),
+    "originality": re.compile(r"original", re.I),
+    "emotional": re.compile(r"emotion", re.I),
+    "theme": re.compile(r"\btheme|\bmessage\b", re.I),
+    "overall": re.compile(r"overall|final (?:score|rating)", re.I),
+    # A headline score, used as the overall one when there is no "overall" line
+    "headline": re.compile(r"script score|total score", re.I),
+}
+_SCALE = re.compile(r"\(?\s*(?:out of|/)\s*10\s*\)?", re.I)   # "Dialogue (out of 10): 7"
+_OUT_OF_TEN = re.compile(r"(?<![\d.])(\d{1,2}(?:\.\d+)?)\s*(?:/|out of)\s*10\b", re.I)
+_AFTER_LABEL = re.compile(r"^[^\d]{0,40}?[:\-–—]\s*\**\s*(\d{1,2}(?:\.\d+)?)(?![\d.]*\s*%)")
+
+
+def _score(line: str, after_label: str = None):
+    match = _OUT_OF_TEN.search(line)
+    if match is None and after_label is not None:
+        match = _AFTER_LABEL.match(_SCALE.sub("", after_label))
+    if match is None:
+        return None
+    value = float(match.group(1))
+    return value if 0 <= value <= 10 else None
+
+
+def parse_script_score(text: str) -> dict:
+    """
+    Field -> score out of 10 for every SCORE_FIELDS entry found in the
+    section text, e.g. "**Dialogue: 7/10** – sharp but..." or "Plot
+    construction (out of 10): 6". A label on its own line may have its
+    score on the next line. Fields not found are left out.
+    """
+    scores, pending = {}, None
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        found = [(match.start(), match.end(), field) for field, pattern in _LABELS.items()
+                 for match in [pattern.search(line)] if match]
+        if found:
+            start, end, field = min(found)
+            value = _score(line, line[end:])
+            if field not in scores:
+                if value is not None:
+                    scores[field] = value
+                    pending = None
+                else:
+                    pending = field
+                continue
+        if pending is not None:
+            value = _score(line, line)
+            if value is not None and pending not in scores:
+                scores[pending] = value
+            pending = None
+    headline = scores.pop("headline", None)
+    if headline is not None:
+        scores.setdefault("overall", headline)
+    return scores
+
+
+class ScoreTable:
+    """
+    Script scores of many analyses, one numpy array per column: movie,
+    content hash, creation time, and a (rows, SCORE_FIELDS) float matrix
+    with NaN for missing scores. Filtering, sorting and percentiles are
+    single vectorized passes and return new tables or arrays.
+    """
+
+    def __init__(self, movies, hashes, created, values):
+        import numpy as np
+
+        self.movies = np.asarray(movies, dtype=str)
+        self.hashes = np.asarray(hashes, dtype=str)
+        self.created = np.asarray(created, dtype=np.float64)
+        self.values = np.asarray(values, dtype=np.float32).reshape(len(self.movies), len(SCORE_FIELDS))
+
+    @classmethod
+    def from_rows(cls, rows) -> "ScoreTable":
+        """
+        Table from (movie, content hash, created, *scores) rows; None scores are missing.
+        """
+        import numpy as np
+
+        rows = list(rows)
+        if not rows:
+            return cls([], [], [], np.empty((0, len(SCORE_FIELDS))))
+        movies, hashes, created, *values = zip(*rows)
+        # float arrays read None as NaN
+        return cls(movies, hashes, created, np.array(values, dtype=np.float32).T)
+
+    def __len__(self) -> int:
+        return len(self.movies)
+
+    def column(self, field: str):
+        return self.values[:, SCORE_FIELDS.index(field)]
+
+    def take(self, rows) -> "ScoreTable":
+        return ScoreTable(self.movies[rows], self.hashes[rows], self.created[rows], self.values[rows])
+
+    def filter(self, minimums: dict = None, movie: str = None, hashes=None) -> "ScoreTable":
+        """
+        Rows with every field in `minimums` at least its value (missing
+        scores fail), if given `movie` in the name (case-insensitive), and
+        if given a content hash among `hashes`.
+        """
+        import numpy as np
+
+        mask = np.ones(len(self), dtype=bool)
+        for field, low in (minimums or {}).items():
+            mask &= self.column(field) >= low
+        if movie:
+            mask &= np.char.find(np.char.lower(self.movies), movie.lower()) >= 0
+        if hashes is not None:
+            mask &= np.isin(self.hashes, list(hashes))
+        return self.take(mask)
+
+    def sort(self, field: str, descending: bool = True) -> "ScoreTable":
+        """
+        Rows ordered by `field`, missing scores last; ties keep the order.
+        """
+        import numpy as np
+
+        column = self.column(field)
+        order = np.argsort(-column if descending else column, kind="stable")   # NaN sorts last
+        return self.take(order)
+
+    def percentiles(self, qs=PERCENTILES):
+        """
+        (len(qs), SCORE_FIELDS) array of score percentiles over the rows,
+        ignoring missing scores; NaN where a field has no scores.
+        """
+        import numpy as np
+
+        if not len(self):
+            return np.full((len(qs), len(SCORE_FIELDS)), np.nan)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)   # all-NaN columns
+            return np.nanpercentile(self.values, qs, axis=0)
+
+    def percentile_records(self, qs=PERCENTILES) -> list:
+        """
+        percentiles() as one dict per percentile, for display.
+        """
+        import numpy as np
+
+        return [
+            {"percentile": f"p{q}", **{SCORE_LABELS[field]: None if np.isnan(v) else round(float(v), 1)
+                                       for field, v in zip(SCORE_FIELDS, row)}}
+            for q, row in zip(qs, self.percentiles(qs))
+        ]
+
+    def percentile_ranks(self, field: str):
+        """
+        Percentile rank (0-100) of each row's `field` among the rows'
+        scores: the share scored at or below it. NaN for missing scores.
+        """
+        import numpy as np
+
+        column = self.column(field)
+        scored = np.sort(column[~np.isnan(column)])
+        if not len(scored):
+            return np.full(len(self), np.nan)
+        ranks = np.searchsorted(scored, column, side="right") / len(scored) * 100
+        return np.where(np.isnan(column), np.nan, ranks)
+
+    def records(self, limit: int = None, rank_by: str = None) -> list:
+        """
+        The first `limit` rows as dicts for display, with the percentile
+        rank of `rank_by` when given.
+        """
+        import numpy as np
+
+        ranks = self.percentile_ranks(rank_by) if rank_by else None
+        rows = []
+        for i in range(len(self) if limit is None else min(limit, len(self))):
+            row = {"movie": str(self.movies[i])}
+            row.update({SCORE_LABELS[field]: None if np.isnan(v) else round(float(v), 1)
+                        for field, v in zip(SCORE_FIELDS, self.values[i])})
+            if ranks is not None:
+                row[f"{SCORE_LABELS[rank_by]} percentile"] = None if np.isnan(ranks[i]) else round(float(ranks[i]))
+            rows.append(row)
+        return rows
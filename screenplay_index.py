@@ -0,0 +1,281 @@
+import re
+import string
+from collections import Counter
+
+from chunking import SCENE_HEADING
+
+# Sections answered from the index instead of the model
+LOCAL_SECTIONS = ("Top Keywords", "Location Setting")
+
+_HEADING = re.compile(
+    r"^\s*(?:\d+[A-Z]?\.?\s+)?"
+    r"(?P<setting>INT\.?/EXT\.?|EXT\.?/INT\.?|I/E\.?|INT\.|EXT\.)\s*"
+    r"(?P<rest>.*?)\s*(?:\d+[A-Z]?\.?)?\s*$"
+)
+_TIMES = {"DAY", "NIGHT", "MORNING", "EVENING", "AFTERNOON", "DAWN", "DUSK", "LATER",
+          "CONTINUOUS", "MOMENTS LATER", "SAME", "SAME TIME", "SUNSET", "SUNRISE"}
+# A character cue: an upper-case name, optionally with (V.O.), (O.S.), (CONT'D)...
+_CUE = re.compile(r"^\s*(?P<name>[A-Z][A-Z0-9 .'\-&]{0,38}?)\s*(?:\([^)]*\)\s*)*$")
+_NOT_CUES = re.compile(r"(?:\bTO:$|^FADE\b|^THE END$|^CONTINUED|^\(?MORE\)?$|^TITLE|^SUPER\b|^INTERCUT|^BACK TO)")
+_WORD = re.compile(r"[a-z][a-z']+")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are aren't as at be because been before being
+below between both but by can can't cannot could couldn't did didn't do does doesn't doing don't down
+during each few for from further get gets got had hadn't has hasn't have haven't having he he'd he'll
+he's her here here's hers herself him himself his how how's i i'd i'll i'm i've if in into is isn't it
+it's its itself just let's like me more most mustn't my myself no nor not now of off on once only or
+other ought our ours ourselves out over own same shan't she she'd she'll she's should shouldn't so some
+such than that that's the their theirs them themselves then there there's these they they'd they'll
+they're they've this those through to too under until up very was wasn't we we'd we'll we're we've were
+weren't what what's when when's where where's which while who who's whom why why's will with won't would
+wouldn't you you'd you'll you're you've your yours yourself yourselves yeah okay oh hey well gonna
+wanna know go going come comes back look looks looking see sees turns one two right think
+want still even yes re ll ve takes
+int ext day night cont'd cont continued cut fade angle pov beat moment moments later room door scene
+""".split())
+# Never keywords, though retrieval still matches them: function words left
+# out of STOPWORDS, and words common to any screenplay's dialogue (said,
+# told, need, last...) and stage directions (crosses, turns, stops...)
+KEYWORD_STOPWORDS = STOPWORDS | frozenset("""
+across afterwards ago almost along already although always among another anybody anyone anything anyway
+anywhere around away became become becomes behind beside besides beyond either else elsewhere enough
+ever every everybody everyone everything everywhere except first former found full hence however indeed
+instead last least less many may maybe meanwhile might mine much must namely neither never nevertheless
+next nobody none nothing nowhere often onto otherwise perhaps please rather really several since somebody
+someone something sometime sometimes somewhere soon sure though three thus today together tomorrow
+tonight toward towards upon whatever whenever whereas wherever whether whoever whole whose within
+without yet yesterday
+say says said saying tell tells told telling ask asks asked asking answer answers answered call calls
+called talk talks talked need needs needed know knows knew known keep keeps kept leave leaves leaving
+left gone went goes make makes made making let lets put puts give gives gave given gotten think thinks
+thought mean means meant guess feel feels felt try tries tried trying happen happens happened stay stays
+stayed wait waits waited remember remembers remembered understand understood believe believed tried
+thing things way lot little good great fine time times sorry thanks thank sir mr mrs ms gotta
+hmm uh um huh yep nope alright
+crosses cross walks walk walked enters enter exits exit stops stop stopped turns turn turned looks
+looked stares stare glances nods nod smiles smile sits sit sat stands stand stood pauses pause moves
+move reaches reach grabs steps heads watches holds pulls pushes opens closes begins starts continues
+""".split())
+DIALOGUE_ONLY_WEIGHT = 0.5   # keyword score of terms never used outside dialogue
+
+
+class ScreenplayIndex:
+    """
+    Scene and character index of a screenplay, built in one pass over the
+    extracted text: scene headings (INT./EXT., location, time of day),
+    speaking characters per scene, and the term occurrences behind the
+    TF-IDF keyword ranking and BM25 scene retrieval, each marked as
+    dialogue or not.
+    """
+
+    def __init__(self, text: str):
+        self.scenes = []            # dicts: heading, setting, location, time, characters, line
+        self.dialogue = Counter()   # character -> dialogue blocks
+        self.character_scenes = Counter()
+        doc_ids, words, spoken = [], [], []
+
+        lines = self._lines = text.splitlines()
+        scene = None
+        # A speech runs from a cue to a blank line, or to a line indented
+        # less than its first line (parentheticals aside)
+        speaking, speech_indent = False, None
+        for i, line in enumerate(lines):
+            stripped = line.strip()
+            if not stripped:
+                speaking = False
+                continue
+            if SCENE_HEADING.match(line):
+                scene = self._start_scene(stripped, i)
+                speaking = False
+                continue
+            cue = _CUE.match(stripped)
+            if cue and self._is_cue(stripped, lines, i):
+                name = cue.group("name").strip()
+                self.dialogue[name] += 1
+                if scene is None:
+                    scene = self._start_scene("", i)
+                if name not in scene["characters"]:
+                    scene["characters"].add(name)
+                    self.character_scenes[name] += 1
+                speaking, speech_indent = True, None
+                continue
+            if speaking and not stripped.startswith("("):
+                indent = len(line) - len(line.lstrip())
+                if speech_indent is None:
+                    speech_indent = indent
+                elif indent < speech_indent:
+                    speaking = False
+            if scene is None:
+                continue   # title page
+            for word in _WORD.findall(stripped.lower()):
+                if word not in STOPWORDS:
+                    doc_ids.append(len(self.scenes) - 1)
+                    words.append(word)
+                    spoken.append(speaking)
+
+        # Term ids index into the sorted vocabulary; numpy is loaded on the
+        # first upload rather than when the app starts
+        import numpy as np
+
+        self._doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        self._spoken = np.asarray(spoken, dtype=bool)
+        self._vocab, self._term_ids = np.unique(np.asarray(words, dtype=str), return_inverse=True)
+        self._postings = None
+
+    def _start_scene(self, heading: str, line: int) -> dict:
+        match = _HEADING.match(heading)
+        setting, location, time = "", heading, ""
+        if match:
+            setting = match.group("setting").rstrip(".").replace(".", "").upper()
+            parts = [p.strip() for p in re.split(r"\s+[-–—]+\s+", match.group("rest")) if p.strip()]
+            if parts and parts[-1].upper() in _TIMES:
+                time = parts.pop().upper()
+            location = parts[0] if parts else ""
+        scene = {"heading": heading, "setting": setting, "location": location.upper(),
+                 "time": time, "characters": set(), "line": line}
+        self.scenes.append(scene)
+        return scene
+
+    @staticmethod
+    def _is_cue(stripped: str, lines: list, i: int) -> bool:
+        # Dialogue (or a parenthetical) must follow, and the cue itself must not be a transition
+        if _NOT_CUES.search(stripped) or not any(c.isalpha() for c in stripped):
+            return False
+        for following in lines[i + 1:i + 3]:
+            following = following.strip()
+            if following:
+                return following != following.upper() or following.startswith("(")
+        return False
+
+    def keywords(self, k: int = 10) -> list:
+        """
+        Top `k` terms by TF-IDF summed over scenes, excluding character
+        names and KEYWORD_STOPWORDS; terms only ever spoken count
+        DIALOGUE_ONLY_WEIGHT as much. Computed on flat arrays of (scene,
+        term) occurrences.
+        """
+        import numpy as np
+
+        if not len(self._term_ids):
+            return []
+        n_docs, n_terms = len(self.scenes), len(self._vocab)
+        docs, terms, counts, doc_len, df = self._term_stats()
+        idf = np.log((1 + n_docs) / (1 + df)) + 1
+        scores = np.bincount(terms, weights=counts / doc_len[docs] * idf[terms], minlength=n_terms)
+        outside_dialogue = np.bincount(self._term_ids[~self._spoken], minlength=n_terms)
+        scores = np.where(outside_dialogue > 0, scores, scores * DIALOGUE_ONLY_WEIGHT)
+
+        names = {part.lower() for name in self.dialogue for part in _WORD.findall(name.lower())}
+        ranked = []
+        for term in np.argsort(-scores, kind="stable"):
+            word = self._vocab[term]
+            if word not in names and word not in KEYWORD_STOPWORDS and len(word) > 2:
+                ranked.append(str(word))
+                if len(ranked) == k:
+                    break
+        return ranked
+
+    def _term_stats(self):
+        """
+        Sparse scene-term matrix as parallel arrays of (scene, term, count)
+        for every nonzero cell, plus terms per scene and scenes per term.
+        Computed once and shared by the keyword ranking and retrieval.
+        """
+        import numpy as np
+
+        if self._postings is None:
+            n_docs, n_terms = len(self.scenes), len(self._vocab)
+            pairs, counts = np.unique(self._doc_ids * n_terms + self._term_ids, return_counts=True)
+            docs, terms = pairs // n_terms, pairs % n_terms
+            doc_len = np.bincount(self._doc_ids, minlength=n_docs)
+            df = np.bincount(terms, minlength=n_terms)
+            self._postings = (docs, terms, counts, doc_len, df)
+        return self._postings
+
+    def bm25(self, query, k1: float = 1.5, b: float = 0.75):
+        """
+        BM25 score of every scene for the query words (an array with one
+        score per scene). Unknown words and stopwords are ignored.
+        """
+        import numpy as np
+
+        n_docs = len(self.scenes)
+        words = np.unique(np.asarray([w for w in query if w not in STOPWORDS], dtype=str))
+        if not n_docs or not len(self._vocab) or not len(words):
+            return np.zeros(n_docs)
+        ids = np.searchsorted(self._vocab, words)
+        ids = ids[(ids < len(self._vocab)) & (self._vocab[np.minimum(ids, len(self._vocab) - 1)] == words)]
+        docs, terms, counts, doc_len, df = self._term_stats()
+        hit = np.isin(terms, ids)
+        docs, terms, tf = docs[hit], terms[hit], counts[hit]
+        idf = np.log(1 + (n_docs - df[terms] + 0.5) / (df[terms] + 0.5))
+        norm = k1 * (1 - b + b * doc_len[docs] / max(doc_len.mean(), 1))
+        return np.bincount(docs, weights=idf * tf * (k1 + 1) / (tf + norm), minlength=n_docs)
+
+    def scene_text(self, i: int) -> str:
+        """
+        The text of scene `i`, from its heading to the next scene's.
+        """
+        end = self.scenes[i + 1]["line"] if i + 1 < len(self.scenes) else len(self._lines)
+        return "\n".join(self._lines[self.scenes[i]["line"]:end]).strip()
+
+    def locations(self, k: int = 5) -> list:
+        """
+        The `k` locations with the most scenes, as (location, scene count,
+        Counter of INT/EXT, Counter of time of day).
+        """
+        counts = Counter(s["location"] for s in self.scenes if s["location"])
+        result = []
+        for location, count in counts.most_common(k):
+            scenes = [s for s in self.scenes if s["location"] == location]
+            result.append((location, count, Counter(s["setting"] for s in scenes if s["setting"]),
+                           Counter(s["time"] for s in scenes if s["time"])))
+        return result
+
+    def context(self, characters: int = 10, locations: int = 5) -> str:
+        """
+        Compact summary of the index, to prepend to model prompts.
+        """
+        interiors = sum(1 for s in self.scenes if s["setting"].startswith("INT"))
+        cast = ", ".join(f"{name} ({n} speeches)" for name, n in self.dialogue.most_common(characters))
+        places = ", ".join(f"{loc} ({n} scenes)" for loc, n, _, _ in self.locations(locations))
+        return (
+            "Screenplay structure (computed locally):\n"
+            f"- Scenes: {len(self.scenes)} ({interiors} interior, {len(self.scenes) - interiors} exterior)\n"
+            f"- Speaking characters: {len(self.dialogue)}; most dialogue: {cast or 'n/a'}\n"
+            f"- Most used locations: {places or 'n/a'}\n"
+        )
+
+
+def _format_keywords(index: ScreenplayIndex) -> str:
+    keywords = index.keywords(10)
+    if not keywords:
+        return "No keywords could be extracted from the screenplay text."
+    return "\n".join(f"{i}. {word.capitalize()}" for i, word in enumerate(keywords, start=1))
+
+
+def _format_locations(index: ScreenplayIndex) -> str:
+    locations = index.locations(5)
+    if not locations:
+        return "No scene headings were found, so the location setting could not be determined."
+    (primary, count, settings, times), others = locations[0], locations[1:]
+    lines = [f"Primary location: {string.capwords(primary.lower())} ({count} of {len(index.scenes)} scenes)"]
+    detail = ", ".join(f"{n} {s}" for s, n in settings.most_common())
+    if times:
+        detail += ("; " if detail else "") + "mostly " + times.most_common(1)[0][0].lower()
+    if detail:
+        lines[0] += f" — {detail}"
+    if others:
+        lines.append("Other recurring locations: " + ", ".join(f"{string.capwords(loc.lower())} ({n})" for loc, n, _, _ in others))
+    return "\n".join(lines)
+
+
+_FORMATTERS = {"Top Keywords": _format_keywords, "Location Setting": _format_locations}
+
+
+def local_sections(index: ScreenplayIndex, sections) -> dict:
+    """
+    Texts for the LOCAL_SECTIONS among `sections`, computed from the index.
+    """
+    return {section: _FORMATTERS[section](index) for section in sections if section in _FORMATTERS}
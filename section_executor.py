@@ -0,0 +1,90 @@
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+logger = logging.getLogger(__name__)
+
+# Nine sections per report, so by default every section goes out at once
+DEFAULT_MAX_CONCURRENCY = 9
+
+# Notes closing a section answered only in part (see partial_result)
+PARTIAL_NOTES = ("Cut short at", "Shortened answer:")
+
+
+class SectionCancelled(Exception):
+    """
+    Raised in place of a section that had not started when its run was cancelled.
+    """
+
+
+def section_error_message(section: str, exc: BaseException) -> str:
+    """
+    Text placed in the results for a section whose call raised.
+    """
+    return f"⚠️ {section} could not be generated ({type(exc).__name__}: {exc})"
+
+
+def partial_result(text: str, note: str) -> str:
+    """
+    Text of a section answered only in part (cut at its deadline, or a
+    shortened fallback answer), closed by `note`, which starts with one of
+    the PARTIAL_NOTES.
+    """
+    return f"{text}\n\n_({note}.)_"
+
+
+def is_complete(text: str) -> bool:
+    """
+    False for an error message or a partial_result: texts shown for this
+    run only, never carried into another analysis.
+    """
+    if text.startswith("⚠️"):
+        return False
+    _, _, note = text.rpartition("\n\n_(")
+    return not (note.endswith(".)_") and note.startswith(PARTIAL_NOTES))
+
+
+def run_sections(tasks: dict, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 on_done=None, cancel=None) -> dict:
+    """
+    Run one zero-argument callable per section on a bounded thread pool.
+
+    `tasks` maps section name -> callable returning the section text.
+    Results come back in the same order as `tasks`. A section that raises
+    is logged and replaced by an error message so the other sections
+    are kept. Each task runs in a copy of the caller's context, so context
+    variables (such as the metrics section being measured) carry over.
+
+    `on_done(section, result)` is called on the caller's thread as each
+    section finishes. Once `cancel` (a threading.Event) is set, sections
+    that have not started are skipped and reported as cancelled.
+    """
+    if not tasks:
+        return {}
+
+    def guarded(fn):
+        def run():
+            if cancel is not None and cancel.is_set():
+                raise SectionCancelled("cancelled before it started")
+            return fn()
+        return run
+
+    workers = max(1, min(int(max_concurrency), len(tasks)))
+    outcomes = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="section") as pool:
+        futures = {
+            pool.submit(contextvars.copy_context().run, guarded(fn)): section for section, fn in tasks.items()
+        }
+        for future in as_completed(futures):
+            section = futures[future]
+            try:
+                outcomes[section] = future.result()
+            except SectionCancelled as exc:
+                outcomes[section] = section_error_message(section, exc)
+            except Exception as exc:
+                logger.exception("Section %r failed", section)
+                outcomes[section] = section_error_message(section, exc)
+            if on_done is not None:
+                on_done(section, outcomes[section])
+
+    return {section: outcomes[section] for section in tasks}
@@ -0,0 +1,39 @@
+import os
+
+import streamlit as st
+
+_TRUE = {"1", "true", "yes", "on"}
+
+
+def _coerce(value, default):
+    # Environment variables are strings; convert to the type of the default
+    if default is None or not isinstance(value, str):
+        return value
+    if isinstance(default, bool):
+        return value.strip().lower() in _TRUE
+    if isinstance(default, (int, float)):
+        return type(default)(value)
+    return value
+
+
+def get_setting(name: str, default=None):
+    """
+    Look up a configuration value in Streamlit secrets, then in the
+    environment, then fall back to `default`. Works without a secrets file
+    (benchmarks, command-line runs).
+    """
+    try:
+        if name in st.secrets:
+            return st.secrets[name]
+    except FileNotFoundError:
+        pass
+    if name in os.environ:
+        return _coerce(os.environ[name], default)
+    return default
+
+
+def openai_api_key() -> str:
+    key = get_setting("OPENAI_API_KEY")
+    if not key:
+        raise KeyError("OPENAI_API_KEY is not set in Streamlit secrets or the environment.")
+    return key
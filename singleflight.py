@@ -0,0 +1,61 @@
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller (the
+    leader) does the work, later callers wait on the leader's future and
+    get the same result or exception. Nothing is remembered once the
+    call completes; pair it with a cache for that.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}   # key -> Future of the in-flight call
+        self.leaders = 0
+        self.followers = 0
+
+    def claim(self, key):
+        """
+        Returns `(leader, future)`. A leader must call `release` with the
+        outcome; a follower waits on `future.result()`.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.followers += 1
+                return False, future
+            future = Future()
+            self._calls[key] = future
+            self.leaders += 1
+            return True, future
+
+    def release(self, key, future: Future, value=None, exc: BaseException = None):
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        if exc is not None:
+            future.set_exception(exc)
+        else:
+            future.set_result(value)
+
+    def do(self, key, fn):
+        """
+        Run `fn()` for `key` unless a call for it is already in flight, in
+        which case wait for that call's outcome instead.
+        """
+        leader, future = self.claim(key)
+        if not leader:
+            return future.result()
+        try:
+            value = fn()
+        except BaseException as exc:
+            self.release(key, future, exc=exc)
+            raise
+        self.release(key, future, value)
+        return value
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
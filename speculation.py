@@ -0,0 +1,107 @@
+"""
+Speculative analysis: as soon as a screenplay is extracted, its short
+sections are analyzed in the background, before the report is requested.
+
+Nothing is handed over explicitly. The speculative run fills the shared
+response cache, so the report's requests for the same sections are cache
+hits, or wait on the speculative request still in flight (see
+singleflight.py). Speculation has its own small worker pool, so it never
+delays a requested report, and is cancelled when another file is
+uploaded. Off unless SPECULATIVE_ANALYSIS is set in secrets.
+"""
+from functools import partial
+
+import streamlit as st
+
+from analysis import analyze_sections, prepare_analysis_input
+from jobs import JobRunner
+from metrics import ReportMetrics, export_metrics
+from prompts import COMBINED_SECTIONS
+from screenplay_index import LOCAL_SECTIONS
+from settings import get_setting
+
+SPECULATIVE_ANALYSIS = False
+SPECULATIVE_WORKERS = 2   # speculative runs at once across all sessions
+
+
+def speculative_templates(templates: dict) -> dict:
+    """
+    The short sections of `templates` that need the model.
+    """
+    local = LOCAL_SECTIONS if get_setting("LOCAL_SECTIONS", True) else ()
+    return {section: t for section, t in templates.items() if section in COMBINED_SECTIONS and section not in local}
+
+
+def _speculate(job, screenplay_text, templates, max_tokens, index, label):
+    metrics = ReportMetrics(f"{label} (speculative)")
+    with metrics.stage("prepare"):
+        prompt_text, _ = prepare_analysis_input(screenplay_text, templates, metrics=metrics)
+    with metrics.stage("analyze"):
+        analyze_sections(prompt_text, templates, max_tokens, metrics=metrics, index=index,
+                         on_section=job.update, cancel=job.cancel_event)
+    # Exported whether or not the report is requested, so wasted speculation shows up too
+    export_metrics(metrics)
+
+
+def start_speculation(screenplay_text: str, templates: dict, max_tokens: dict, index=None, label: str = ""):
+    """
+    Start analyzing the short sections of `templates` in the background,
+    exactly as the report will request them. Returns the speculation's job
+    id, or None when SPECULATIVE_ANALYSIS is off or there is nothing to do.
+    """
+    templates = speculative_templates(templates)
+    if not get_setting("SPECULATIVE_ANALYSIS", SPECULATIVE_ANALYSIS) or not templates:
+        return None
+    return get_speculation_runner().submit(
+        partial(_speculate, screenplay_text=screenplay_text, templates=templates, max_tokens=max_tokens,
+                index=index, label=label),
+        templates,
+        label=label,
+    )
+
+
+def cancel_speculation(job_id):
+    """
+    Cancel a speculation whose screenplay is no longer the current upload.
+    Sections not yet sent are skipped; requests already sent finish.
+    """
+    get_speculation_runner().cancel(job_id)
+
+
+def speculation_savings(job_id, requested: float, results: dict) -> dict:
+    """
+    Seconds of latency the speculation saved each section of a report
+    requested at `requested` (time.time()) that came out with `results`.
+    A section counts if the report got the speculative text; it saved the
+    time the speculation had been working on it, from when it started
+    until it finished or the report was requested.
+    """
+    job = get_speculation_runner().get(job_id)
+    if job is None or job.started is None:
+        return {}
+    snapshot = job.snapshot()
+    return {
+        section: max(0.0, min(finished, requested) - job.started)
+        for section, finished in snapshot["finished_at"].items()
+        if results.get(section) == snapshot["texts"][section] and not results[section].startswith("⚠️")
+    }
+
+
+def format_speculation(saved: dict) -> str:
+    return (
+        f"⚡ Speculative analysis: {', '.join(saved)} started at upload and were ready "
+        f"{max(saved.values()):.1f}s sooner"
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def _speculation_runner(workers: int) -> JobRunner:
+    return JobRunner(workers)
+
+
+def get_speculation_runner() -> JobRunner:
+    """
+    The speculation pool shared by every session, sized by
+    SPECULATIVE_WORKERS in secrets; separate from the report job runner.
+    """
+    return _speculation_runner(int(get_setting("SPECULATIVE_WORKERS", SPECULATIVE_WORKERS)))
@@ -0,0 +1,18 @@
+import re
+
+import streamlit as st
+
+_COMMENT = re.compile(r"/\*.*?\*/", re.DOTALL)
+_SPACE = re.compile(r"\s+")
+_AROUND_PUNCTUATION = re.compile(r"\s*([{};:,>])\s*")
+
+
+@st.cache_resource(show_spinner=False)
+def style_block(css: str) -> str:
+    """
+    `css` as a <style> element for st.markdown, minified once per process
+    instead of on every rerun; the smaller block is what each rerun sends.
+    """
+    css = _COMMENT.sub("", css)
+    css = _AROUND_PUNCTUATION.sub(r"\1", _SPACE.sub(" ", css)).strip()
+    return f"<style>{css}</style>"
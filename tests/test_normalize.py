@@ -0,0 +1,13 @@
+from normalize import normalize_screenplay
+
+
+def test_numeric_dialogue_is_kept():
+    assert normalize_screenplay("MARY (CONT'D)\n 42.\n") == "MARY\n42."
+    assert normalize_screenplay("MARY\n 1984") == "MARY\n1984"
+    assert normalize_screenplay("MARY\n(quietly)\n42.") == "MARY\n(quietly)\n42."
+
+
+def test_page_numbers_are_removed():
+    assert normalize_screenplay("She leaves.\n\n42.\n\nINT. HOUSE - DAY") == "She leaves.\n\nINT. HOUSE - DAY"
+    assert normalize_screenplay("MARY\nHello.\n(MORE)\n42.\nMARY (CONT'D)\nBye.") == "MARY\nHello.\nMARY\nBye."
+    assert normalize_screenplay("Page 7 of 110\nJOHN\n- 8 -\nHi.") == "JOHN\nHi."
@@ -0,0 +1,54 @@
+import os
+from datetime import datetime, timezone
+from io import BytesIO
+
+import pytest
+from fpdf import FPDF
+
+import report
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXED_DATE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def fresh_report(data: dict) -> bytes:
+    # create_pdf_report as it was before the cached template
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.add_font("DejaVu", "", report.FONT_REGULAR, uni=True)
+    pdf.add_font("DejaVu", "B", report.FONT_BOLD, uni=True)
+    pdf.set_font("DejaVu", "B", 16)
+    pdf.cell(0, 10, report.REPORT_TITLE, ln=True, align="C")
+    pdf.ln(10)
+    for section, content in data.items():
+        pdf.set_font("DejaVu", "B", 14)
+        pdf.cell(0, 10, section, ln=True)
+        pdf.ln(2)
+        pdf.set_font("DejaVu", "", 12)
+        pdf.multi_cell(0, 8, report.clean_markdown(content))
+        pdf.ln(10)
+    pdf.set_creation_date(FIXED_DATE)
+    buffer = BytesIO()
+    pdf.output(buffer)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def pinned(monkeypatch):
+    monkeypatch.chdir(ROOT)  # fonts are looked up relative to the app folder
+    new_report = report.new_report
+
+    def pinned_new_report():
+        pdf = new_report()
+        pdf.set_creation_date(FIXED_DATE)
+        return pdf
+
+    monkeypatch.setattr(report, "new_report", pinned_new_report)
+
+
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")  # uni=True, ln=True
+def test_templated_report_matches_fresh_render(pinned):
+    # The second report checks that subsetting the first left the cached fonts alone
+    for data in ({"Logline": "A **storm** – and a choice.", "Genre": "# Drama\n\nThriller"},
+                 {"Synopsis": "Ünïcode, `code` and glyphs the first report never used: ΩЖ№"}):
+        assert report.render_report(data, report.clean_markdown).getvalue() == fresh_report(data)
@@ -0,0 +1,163 @@
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from extraction import DEFAULT_WORKERS, extract_text, get_text_cache
+from settings import get_setting
+
+# Defaults for the MAX_UPLOAD_MB / MAX_PAGES secrets
+MAX_UPLOAD_MB = 50
+MAX_PAGES = 400
+COPY_CHUNK_BYTES = 1024 * 1024
+
+
+class UploadRejected(ValueError):
+    """
+    Raised when an upload exceeds the configured byte or page limit.
+    """
+
+
+def _current_rss() -> int:
+    """
+    Resident set size of this process in bytes.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is None:
+        return 0
+    # No procfs: fall back to the lifetime peak (bytes on macOS, KiB elsewhere)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class PeakRSSMonitor:
+    """
+    Samples the process RSS on a background thread while the `with` block
+    runs and records the peak. All sessions share one process, so the
+    figure includes whatever else ran concurrently.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.baseline = 0
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _current_rss())
+
+    def __enter__(self):
+        self.baseline = self.peak = _current_rss()
+        self._thread = threading.Thread(target=self._sample, name="rss-monitor", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _current_rss())
+        return False
+
+
+@contextmanager
+def spool_upload(fileobj, max_bytes: int):
+    """
+    Copy an uploaded file to a temporary file in fixed-size chunks, hashing
+    it on the way, and yield `(path, sha256, size)`. The byte limit is
+    checked before copying when the size is known, and again while copying.
+    The temporary file is removed afterwards.
+    """
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    if size > max_bytes:
+        raise UploadRejected(f"File is {size / 2**20:.1f} MB; the limit is {max_bytes / 2**20:.0f} MB.")
+
+    digest = hashlib.sha256()
+    fd, path = tempfile.mkstemp(suffix=".pdf", prefix="rain-check-")
+    try:
+        with os.fdopen(fd, "wb") as spool:
+            copied = 0
+            for block in iter(lambda: fileobj.read(COPY_CHUNK_BYTES), b""):
+                copied += len(block)
+                if copied > max_bytes:
+                    raise UploadRejected(f"File exceeds the {max_bytes / 2**20:.0f} MB limit.")
+                digest.update(block)
+                spool.write(block)
+        fileobj.seek(0)
+        yield path, digest.hexdigest(), copied
+    finally:
+        os.remove(path)
+
+
+def load_upload(fileobj, separator: str = "", workers: int = None,
+                max_bytes: int = None, max_pages: int = None) -> dict:
+    """
+    Extract text from an uploaded PDF without holding a second copy of it
+    in memory: the upload is spooled to disk and PyMuPDF opens it by path.
+    Byte and page limits are enforced before any page is parsed, and text
+    is served from the shared cache when the same content was seen before.
+
+    Returns a dict with the text, its content hash and an upload report
+    (size, pages, cache hit, peak and added RSS, wall time).
+    """
+    if max_bytes is None:
+        max_bytes = int(float(get_setting("MAX_UPLOAD_MB", MAX_UPLOAD_MB)) * 2**20)
+    if max_pages is None:
+        max_pages = int(get_setting("MAX_PAGES", MAX_PAGES))
+    if workers is None:
+        workers = int(get_setting("EXTRACTION_WORKERS", DEFAULT_WORKERS))
+
+    cache = get_text_cache()
+    pages = None
+    start = time.perf_counter()
+    with PeakRSSMonitor() as rss:
+        with spool_upload(fileobj, max_bytes) as (path, digest, size):
+            key = (digest, separator)
+            text = cache.get(key)
+            cache_hit = text is not None
+            if not cache_hit:
+                import fitz  # pymupdf; loaded on the first upload, not at app start
+
+                with fitz.open(path) as doc:
+                    pages = doc.page_count
+                if pages > max_pages:
+                    raise UploadRejected(f"PDF has {pages} pages; the limit is {max_pages}.")
+                text = extract_text(path, separator=separator, workers=workers)
+                cache.put(key, text)
+
+    return {
+        "text": text,
+        "digest": digest,
+        "size": size,
+        "pages": pages,
+        "cache_hit": cache_hit,
+        "peak_rss": rss.peak,
+        "rss_growth": max(rss.peak - rss.baseline, 0),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def format_upload_report(upload: dict) -> str:
+    """
+    One-line summary of load_upload's report for the UI.
+    """
+    source = "cached text" if upload["cache_hit"] else f"{upload['pages']} pages parsed"
+    return (
+        f"📦 {upload['size'] / 2**20:.1f} MB · {source} in {upload['seconds']:.2f}s · "
+        f"peak RSS {upload['peak_rss'] / 2**20:.0f} MB (+{upload['rss_growth'] / 2**20:.0f} MB)"
+    )